@@ -0,0 +1,210 @@
+"""
+Loopback benchmarks for chadlib.io connections.
+
+Runs real connection pairs over 127.0.0.1 and measures throughput across
+payload sizes, round trip latency, and connect/close time.  Results are
+printed and written as JSON so runs can be compared.
+
+Usage:  python -m benchmarks.io_loopback [-o results.json] [--quick]
+"""
+
+
+from argparse       import ArgumentParser
+from json           import dump
+from platform       import platform, python_version
+from queue          import Queue
+from socket         import socket
+from threading      import Thread
+from time           import perf_counter, sleep, time
+
+from chadlib.io     import AsyncConnection, Connection
+
+
+CONNECTION_CLASSES = {"thread" : Connection, "async" : AsyncConnection}
+
+PAYLOAD_SIZES = [16, 256, 4096, 65536, 1048576]
+THROUGHPUT_BYTES = 64 * 1048576
+THROUGHPUT_MAX_MESSAGES = 200000
+PING_COUNT = 2000
+CONNECT_COUNT = 50
+
+CONNECT_TIMEOUT = 10
+
+
+class _Controller:
+    """
+    Minimal controller satisfying what a connection calls back on.
+    """
+
+    def start_processing_receive_queue(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+def _get_free_port():
+    with socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class ConnectionPair:
+    """
+    A host and peer connected over loopback.
+    """
+
+    def __init__(self, connection_class):
+        port = _get_free_port()
+        self.host = connection_class(_Controller(), Queue(), Queue())
+        self.peer = connection_class(_Controller(), Queue(), Queue())
+        end = perf_counter() + CONNECT_TIMEOUT
+        self.host.startup_accept(port)
+        while self.host.listener is None and perf_counter() < end:
+            sleep(0.0001)
+        sleep(0.001)    # the listener is set just before it starts listening
+        self.peer.startup_connect(port, "127.0.0.1")
+        while not (self.host.active and self.peer.active):
+            if perf_counter() > end:
+                self.close()
+                raise RuntimeError("Loopback connection was not established.")
+            sleep(0.001)
+
+    def close(self):
+        self.peer.close()
+        self.host.close()
+
+
+def benchmark_throughput(connection_class, payload_size, total_bytes,
+                            max_messages):
+    """
+    Time one-way delivery of a stream of equal sized messages.
+    """
+    count = max(1, min(max_messages, total_bytes // payload_size))
+    payload = bytes(payload_size)
+    pair = ConnectionPair(connection_class)
+    try:
+        start = perf_counter()
+        for _ in range(count):
+            pair.peer.send_queue.put(payload)
+        for _ in range(count):
+            pair.host.receive_queue.get()
+        elapsed = perf_counter() - start
+    finally:
+        pair.close()
+    return {"payload_size" : payload_size,
+            "messages" : count,
+            "seconds" : elapsed,
+            "messages_per_second" : count / elapsed,
+            "mb_per_second" : count * payload_size / elapsed / 1048576}
+
+def benchmark_latency(connection_class, count, payload_size = 64):
+    """
+    Time round trips of single messages echoed back by the host.
+    """
+    pair = ConnectionPair(connection_class)
+    def echo():
+        while True:
+            data = pair.host.receive_queue.get()
+            if data is None:
+                break
+            pair.host.send_queue.put(data)
+    Thread(target = echo, daemon = True).start()
+
+    payload = bytes(payload_size)
+    round_trips = []
+    try:
+        for _ in range(count):
+            start = perf_counter()
+            pair.peer.send_queue.put(payload)
+            pair.peer.receive_queue.get()
+            round_trips.append(perf_counter() - start)
+    finally:
+        pair.close()
+    return {"round_trips" : count,
+            "p50_ms" : _percentile(round_trips, 50) * 1000,
+            "p99_ms" : _percentile(round_trips, 99) * 1000,
+            "max_ms" : max(round_trips) * 1000}
+
+def benchmark_connect(connection_class, count):
+    """
+    Time establishing and closing connection pairs.
+    """
+    connects = []
+    closes = []
+    for _ in range(count):
+        start = perf_counter()
+        pair = ConnectionPair(connection_class)
+        connects.append(perf_counter() - start)
+        start = perf_counter()
+        pair.close()
+        closes.append(perf_counter() - start)
+    return {"connections" : count,
+            "connect_p50_ms" : _percentile(connects, 50) * 1000,
+            "connect_p99_ms" : _percentile(connects, 99) * 1000,
+            "close_p50_ms" : _percentile(closes, 50) * 1000,
+            "close_p99_ms" : _percentile(closes, 99) * 1000}
+
+def run(connection_names, payload_sizes = PAYLOAD_SIZES,
+        total_bytes = THROUGHPUT_BYTES,
+        max_messages = THROUGHPUT_MAX_MESSAGES, ping_count = PING_COUNT,
+        connect_count = CONNECT_COUNT):
+    """
+    Run every benchmark for each named connection class, returning the
+    results as a dictionary ready for JSON.
+    """
+    results = {"timestamp" : time(),
+                "python" : python_version(),
+                "platform" : platform(),
+                "connections" : {}}
+    for name in connection_names:
+        connection_class = CONNECTION_CLASSES[name]
+        results["connections"][name] = {
+            "throughput" : [benchmark_throughput(connection_class, size,
+                                                total_bytes, max_messages)
+                            for size in payload_sizes],
+            "latency" : benchmark_latency(connection_class, ping_count),
+            "connect" : benchmark_connect(connection_class, connect_count)}
+    return results
+
+def _print_results(results):
+    for name, result in results["connections"].items():
+        print(name)
+        for row in result["throughput"]:
+            print("  {payload_size:>8} B  {messages_per_second:>12.0f} msg/s"
+                    "  {mb_per_second:>9.2f} MB/s".format(**row))
+        print("  round trip  p50 {p50_ms:.3f} ms  p99 {p99_ms:.3f} ms"
+                .format(**result["latency"]))
+        print("  connect  p50 {connect_p50_ms:.3f} ms  "
+                "close  p50 {close_p50_ms:.3f} ms".format(**result["connect"]))
+
+def main():
+    parser = ArgumentParser(prog = "io_loopback",
+                            description = "Loopback chadlib.io benchmarks")
+    parser.add_argument("-o", "--output", action = "store",
+                        default = "bench_output.json",
+                        help = "File to write the JSON results to")
+    parser.add_argument("-c", "--connection", action = "append",
+                        choices = sorted(CONNECTION_CLASSES),
+                        help = "Connection type to run, repeatable, "
+                                "defaults to all")
+    parser.add_argument("--quick", action = "store_true",
+                        help = "Run reduced sizes for a fast sanity check")
+    args = parser.parse_args()
+
+    names = args.connection or sorted(CONNECTION_CLASSES)
+    if args.quick:
+        results = run(names, PAYLOAD_SIZES[:3], 1048576, 10000, 200, 5)
+    else:
+        results = run(names)
+    _print_results(results)
+    with open(args.output, "w") as f:
+        dump(results, f, indent = 2)
+
+
+if __name__ == "__main__":
+    main()
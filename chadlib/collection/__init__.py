@@ -1 +1,2 @@
+from .hex_grid import HexGrid
 from .stack import Stack
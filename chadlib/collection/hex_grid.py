@@ -0,0 +1,255 @@
+from array          import array
+from bisect         import bisect_right
+from mmap           import mmap
+from struct         import calcsize
+
+from chadlib.utility.hex_math   import ADJACENT_DIRECTIONS, AXIAL_DIRECTIONS
+
+
+ADJACENT_CHANGES = tuple(AXIAL_DIRECTIONS[name]
+                            for name in ADJACENT_DIRECTIONS)
+
+
+class HexGrid:
+    """
+    Dense storage of per-hex values over a fixed map shape, indexed by axial
+    (col, slant) coordinates.
+
+    The cells of each column are stored contiguously, so a coordinate maps
+    to its index with a little arithmetic and no hashing.  Build grids with
+    parallelogram, rectangle or hexagon, or describe any shape made of whole
+    columns to the constructor.
+
+    Each layer holds one typed value per cell, named in layers with its
+    struct/array type code, for example {"terrain" : "B", "height" : "f"}.
+    Layers live in one buffer, in memory or, given a path, in a file mapped
+    into memory so maps larger than RAM are paged in as they are used and
+    persist between runs.  Every layer is a memoryview, see layer, or a NumPy
+    array sharing the same memory, see array.
+    """
+
+    DEFAULT_LAYERS = {"value" : "i"}
+    ALIGNMENT = 8
+
+    def __init__(self, first_col, columns, layers = None, path = None):
+        """
+        columns gives the (first slant, count) of the cells in each column,
+        starting from first_col.
+        """
+        self.first_col = first_col
+        self._first_slants = [first for first, _ in columns]
+        self._counts = [count for _, count in columns]
+        self._offsets = []
+        total = 0
+        for count in self._counts:
+            self._offsets.append(total)
+            total += count
+        self._size = total
+        self._neighbor_indices = None
+
+        layers = self.DEFAULT_LAYERS if layers is None else layers
+        self.default_layer = next(iter(layers))
+        placement = {}
+        nbytes = 0
+        for name, typecode in layers.items():
+            placement[name] = (typecode, nbytes)
+            nbytes += total * calcsize(typecode)
+            nbytes += -nbytes % self.ALIGNMENT
+        self.path = path
+        self._file = None
+        if path is None:
+            self._buffer = bytearray(nbytes)
+        else:
+            self._buffer = self._map_file(path, nbytes)
+        view = memoryview(self._buffer)
+        self.layers = {name : view[offset:offset +
+                                    total * calcsize(typecode)].cast(typecode)
+                        for name, (typecode, offset) in placement.items()}
+
+    @classmethod
+    def parallelogram(cls, width, height, layers = None, path = None):
+        """
+        Cells with 0 <= col < width and 0 <= slant < height.
+        """
+        return cls(0, [(0, height)] * width, layers, path)
+
+    @classmethod
+    def rectangle(cls, width, height, layers = None, path = None):
+        """
+        Cells in width columns of height hexes, each column shifted half a
+        hex from the last so the map's edges are straight, with (0, 0) at
+        the north west corner.
+        """
+        return cls(0, [(-(col // 2), height) for col in range(width)],
+                    layers, path)
+
+    @classmethod
+    def hexagon(cls, radius, layers = None, path = None):
+        """
+        Cells within radius steps of (0, 0).
+        """
+        columns = []
+        for col in range(-radius, radius + 1):
+            first = max(-radius, -col - radius)
+            last = min(radius, -col + radius)
+            columns.append((first, last - first + 1))
+        return cls(-radius, columns, layers, path)
+
+    def _map_file(self, path, nbytes):
+        """
+        Map the file at path into memory, creating it if it is missing or
+        empty.  An existing file must be the size of these layers, it was
+        written with another shape or other layers otherwise.
+        """
+        if not nbytes:
+            raise ValueError("A file backed grid needs at least one cell.")
+        try:
+            f = open(path, "r+b")
+        except FileNotFoundError:
+            f = open(path, "w+b")
+        f.seek(0, 2)
+        size = f.tell()
+        if size and size != nbytes:
+            f.close()
+            raise ValueError("{} holds {} bytes, these layers need {}."
+                                .format(path, size, nbytes))
+        if not size:
+            f.truncate(nbytes)
+        self._file = f
+        return mmap(f.fileno(), nbytes)
+
+    def close(self):
+        """
+        Write a file backed grid to disk and unmap it.  Any NumPy arrays from
+        array must be released first.
+        """
+        for view in self.layers.values():
+            view.release()
+        self.layers = {}
+        if self._file is not None:
+            self._buffer.flush()
+            self._buffer.close()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, coord):
+        col, slant = coord
+        i = col - self.first_col
+        return (0 <= i < len(self._counts) and
+                0 <= slant - self._first_slants[i] < self._counts[i])
+
+    def index(self, col, slant):
+        """
+        Position of a cell in every layer, raises KeyError for coordinates
+        outside the grid.
+        """
+        i = col - self.first_col
+        if 0 <= i < len(self._counts):
+            j = slant - self._first_slants[i]
+            if 0 <= j < self._counts[i]:
+                return self._offsets[i] + j
+        raise KeyError((col, slant))
+
+    def coord(self, index):
+        """
+        Axial coordinate of the cell at index.
+        """
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        i = bisect_right(self._offsets, index) - 1
+        return (self.first_col + i,
+                self._first_slants[i] + index - self._offsets[i])
+
+    def coords(self):
+        """
+        Generate the axial coordinate of every cell, in index order.
+        """
+        col = self.first_col
+        for first, count in zip(self._first_slants, self._counts):
+            for slant in range(first, first + count):
+                yield col, slant
+            col += 1
+
+    def layer(self, name = None):
+        """
+        The memoryview holding a layer's values, by index.
+        """
+        return self.layers[self.default_layer if name is None else name]
+
+    def array(self, name = None):
+        """
+        A layer as a NumPy array sharing the grid's memory, requires NumPy.
+        """
+        import numpy
+        return numpy.frombuffer(self.layer(name),
+                                dtype = self.layer(name).format)
+
+    def get(self, col, slant, layer = None):
+        return self.layer(layer)[self.index(col, slant)]
+
+    def set(self, col, slant, value, layer = None):
+        self.layer(layer)[self.index(col, slant)] = value
+
+    def __getitem__(self, coord):
+        return self.layers[self.default_layer][self.index(*coord)]
+
+    def __setitem__(self, coord, value):
+        self.layers[self.default_layer][self.index(*coord)] = value
+
+    def fill(self, value, layer = None):
+        view = self.layer(layer)
+        view[:] = array(view.format, [value]) * len(view)
+
+    def neighbors(self, col, slant):
+        """
+        Generate the coordinates of the adjacent cells inside the grid,
+        clockwise from north.
+        """
+        for dcol, dslant in ADJACENT_CHANGES:
+            coord = (col + dcol, slant + dslant)
+            if coord in self:
+                yield coord
+
+    def neighbor_indices(self):
+        """
+        Table of the indices of every cell's six adjacent cells, clockwise
+        from north, with -1 for those outside the grid.  Cell i's neighbours
+        are at 6 * i to 6 * i + 5.  Built once and kept, numpy.asarray
+        reshapes it without copying.
+        """
+        if self._neighbor_indices is None:
+            self._neighbor_indices = self._build_neighbor_indices()
+        return self._neighbor_indices
+
+    def _build_neighbor_indices(self):
+        """
+        Fill the table a column and direction at a time, the neighbours of a
+        column in one direction being a run of consecutive indices.
+        """
+        table = array("l", [-1]) * (6 * self._size)
+        columns = len(self._counts)
+        for i in range(columns):
+            first = self._first_slants[i]
+            count = self._counts[i]
+            base = self._offsets[i]
+            for k, (dcol, dslant) in enumerate(ADJACENT_CHANGES):
+                other = i + dcol
+                if not 0 <= other < columns:
+                    continue
+                shift = first + dslant - self._first_slants[other]
+                low = max(0, -shift)
+                high = min(count, self._counts[other] - shift)
+                if low < high:
+                    start = self._offsets[other] + low + shift
+                    table[6 * (base + low) + k:6 * (base + high):6] = array(
+                                    "l", range(start, start + high - low))
+        return table
@@ -9,7 +9,13 @@ from .dialog            import TextEntryDialog
 
 class ConnComponent:
     
-    def __init__(self, controller, default_port, send_queue, receive_queue):
+    def __init__(self, controller, default_port, send_queue, receive_queue, 
+                    connection_class = Connection, dispatcher = None):
+        """
+        Received data is passed to the controller's process_received_data on 
+        one thread, or submitted to dispatcher, a chadlib.io.Dispatcher, to 
+        be processed in parallel.
+        """
         self.controller = controller
         if not isinstance(self.controller, ConnController):
             raise RuntimeError("Controller does not implement the required "
@@ -17,8 +23,10 @@ class ConnComponent:
 
         self.default_port = default_port
         self.receive_queue = receive_queue
+        self.dispatcher = dispatcher
 
-        self.connection = Connection(self, send_queue, self.receive_queue)
+        self.connection = connection_class(self, send_queue, 
+                                            self.receive_queue)
 
     def startup_listening(self):
         self.connection.startup_accept(self.default_port)
@@ -42,15 +50,24 @@ class ConnComponent:
         queue.
         """
         self.controller.connection_start()
+        process = self.controller.process_received_data
+        if self.dispatcher is not None:
+            process = self.dispatcher.submit
         def f():
             getLogger(__name__).debug("Process thread starting.")
-            while self.connection.active:
+            data = self.receive_queue.get()
+            while data is not None:     # put by the connection as it closes
+                process(data)
                 data = self.receive_queue.get()
-                if data is not None:
-                    self.controller.process_received_data(data)
             getLogger(__name__).debug("Process thread done.")
         Thread(target = f).start()
 
+    def session_reset(self):
+        """
+        Pass on that a resumable connection had to start a new session.
+        """
+        self.controller.session_reset()
+
     def get_menu_data(self, menu_setup):
         """
         Get the default menu setup data, add network control commands.
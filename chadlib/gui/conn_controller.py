@@ -28,3 +28,11 @@ class ConnController(ABC):
         disconnects itself or is disconnected from.
         """
         pass
+
+    def session_reset(self):
+        """
+        Can be overridden by subclass as a hook to resynchronize state when a 
+        resumable connection could not resume its session, so messages may 
+        have been lost.
+        """
+        pass
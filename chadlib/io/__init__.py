@@ -1 +1,17 @@
-from .connection    import Connection
+from .async_connection     import AsyncConnection, LoopQueue
+from .bounded_queue        import BoundedQueue
+from .channels             import ChannelRouter, ChannelScheduler
+from .connection           import Connection
+from .connection_server    import ConnectionServer
+from .datagram_connection  import DatagramConnection, Reliable
+from .dispatcher           import Dispatcher
+from .file_transfer        import FileReceiver, FileSender
+from .frame_codec          import Codec, FrameCodec, register_codec
+from .local_connection     import LocalConnection
+from .message              import MessageRegistry, MessageType
+from .metrics              import ConnectionMetrics, Histogram
+from .rpc                  import RpcEndpoint, RpcError, RpcTimeout
+from .server_controller    import ServerController
+from .session_connection   import SessionConnection
+from .simulated_connection import SimulatedConnection, SimulatedNetwork
+from .state_sync           import StateReceiver, StateSender
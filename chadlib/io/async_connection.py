@@ -0,0 +1,350 @@
+from asyncio    import (Event, IncompleteReadError, get_running_loop, 
+                        new_event_loop, open_connection, 
+                        run_coroutine_threadsafe, sleep, start_server)
+from concurrent.futures import ThreadPoolExecutor
+from logging    import getLogger
+from queue      import Empty, Queue
+from struct     import unpack
+from threading  import Event as FutureEvent, Lock, Thread
+from time       import monotonic
+
+from .connection    import Connection
+from .frame_codec   import FrameCodec
+
+
+class LoopQueue(Queue):
+    """
+    Thread-safe queue that also wakes any registered asyncio events when an
+    item is put, so an event loop can consume it without blocking a thread on
+    get.
+    """
+
+    def __init__(self, maxsize = 0):
+        super().__init__(maxsize)
+        self._waiters = []
+
+    def add_waiter(self, loop, event):
+        """
+        Set the event on the given loop every time an item is put.
+        """
+        with self.mutex:
+            self._waiters.append((loop, event))
+
+    def remove_waiter(self, loop, event):
+        with self.mutex:
+            if (loop, event) in self._waiters:
+                self._waiters.remove((loop, event))
+
+    def _put(self, item):
+        super()._put(item)
+        for loop, event in self._waiters:
+            loop.call_soon_threadsafe(event.set)
+
+
+class AsyncConnection(Connection):
+    """
+    Provides the Connection interface on top of asyncio streams.
+
+    Every AsyncConnection shares a single event loop, run in one background
+    thread, unless a loop is given explicitly.  The send queue is best given
+    as a LoopQueue, other queue types, plain queue.Queue objects included, 
+    fall back to a blocking get in a dedicated thread per connection.  The 
+    given queues are used as they are, never modified.
+
+    Heartbeat pings from the peer are echoed, but none are sent, so rtt is
+    not measured and a silent peer is only noticed when the stream closes.
+    """
+
+    CLOSE_TIMEOUT = 1.0
+    PAUSE_POLL_INTERVAL = 0.01
+
+    _shared_loop = None
+    _shared_loop_thread = None
+    _shared_loop_lock = Lock()
+
+    def __init__(self, controller, send_queue, receive_queue, loop = None):
+        """
+        Put the connection in an uninitialized, inactive, state.
+        """
+        super().__init__(controller, send_queue, receive_queue)
+        self.loop = loop if loop is not None else self.get_shared_loop()
+        self.reader = None
+        self.writer = None
+        self._tasks = []
+        self._send_executor = None
+
+    @classmethod
+    def get_shared_loop(cls):
+        """
+        Return the event loop shared by connections, starting its thread the
+        first time it is needed.
+        """
+        with cls._shared_loop_lock:
+            if cls._shared_loop is None:
+                cls._shared_loop = new_event_loop()
+                cls._shared_loop_thread = Thread(
+                                        target = cls._shared_loop.run_forever,
+                                        name = "AsyncConnectionLoop",
+                                        daemon = True)
+                cls._shared_loop_thread.start()
+        return cls._shared_loop
+
+    @property
+    def active(self):
+        """
+        Boolean property that is true if the stream has an active connection,
+        false otherwise.
+        """
+        return self.writer is not None
+
+    def startup_accept(self, port):
+        """
+        Start listening on the event loop for an incoming connection.
+        """
+        if not self.active:
+            future = run_coroutine_threadsafe(self._wait_for_connection(port),
+                                                self.loop)
+            future.add_done_callback(self._log_startup_failure)
+
+    def startup_connect(self, port, ip_address):
+        """
+        Start connecting to another socket on the event loop.
+        """
+        if not self.active:
+            future = run_coroutine_threadsafe(
+                                    self._connect_to_peer(port, ip_address),
+                                    self.loop)
+            future.add_done_callback(self._log_startup_failure)
+
+    def _log_startup_failure(self, future):
+        """
+        Report an exception raised while accepting or connecting, which would 
+        otherwise be lost with the discarded future.
+        """
+        if not future.cancelled() and future.exception() is not None:
+            getLogger(__name__).warning(("No connection was established.\n"
+                                "Error: {}".format(future.exception())))
+
+    async def _wait_for_connection(self, port, *args):
+        """
+        Open a listening server that accepts the first peer to connect.
+        """
+        getLogger(__name__).info("Waiting for connection...")
+        getLogger(__name__).debug("Listening on port:  {}".format(port))
+        self.listener = await start_server(self._accept_peer, "", port,
+                                            reuse_address = True)
+
+    async def _accept_peer(self, reader, writer):
+        """
+        Server callback, the first peer becomes the connection and the
+        listener is closed.
+        """
+        if self.active or self.listener is None:
+            writer.close()
+            return
+        self.listener.close()
+        self.listener = None
+        self._set_streams(reader, writer)
+        self.controller.start_processing_receive_queue()
+        self.start()
+        getLogger(__name__).info("Connection accepted.")
+        addr = writer.get_extra_info("peername")
+        getLogger(__name__).debug("Connected to peer at {}:{}"
+                                    .format(addr[0], addr[1]))
+
+    async def _connect_to_peer(self, port, ip_address):
+        """
+        Attempt to open a stream to a waiting peer.
+        """
+        getLogger(__name__).info("Attempting to connect...")
+        getLogger(__name__).debug("Peer at {}:{}".format(ip_address, port))
+        streams = None
+        for i in range(self.CONNECT_ATTEMPTS):
+            try:
+                streams = await open_connection(ip_address, port)
+                break
+            except OSError:
+                getLogger(__name__).debug("Attempt {}/{} failed"
+                                        .format(i + 1, self.CONNECT_ATTEMPTS))
+                if i + 1 < self.CONNECT_ATTEMPTS:
+                    await sleep(i + 1)
+
+        if streams is not None and not self.active:
+            self._set_streams(*streams)
+            self.controller.start_processing_receive_queue()
+            self.start()
+            getLogger(__name__).info("Connection established.")
+        else:
+            getLogger(__name__).warning(("No connection was established."))
+
+    def _set_streams(self, reader, writer):
+        """
+        Store the streams used for sending and receiving.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.frame_codec = FrameCodec(self.COMPRESSION_CODECS)
+        self.frame_codec.on_heartbeat = self._echo_heartbeat
+
+    def _echo_heartbeat(self, kind, stamp):
+        if kind == FrameCodec.PING and self.writer is not None:
+            self.writer.writelines(self.frame_codec.heartbeat(FrameCodec.PONG,
+                                                                stamp))
+
+    def start(self):
+        """
+        Schedule the sending and receiving tasks on the event loop.
+        """
+        if self.active:
+            self._run_on_loop(self._start_tasks)
+
+    def _start_tasks(self):
+        self._tasks = [self.loop.create_task(self._send()),
+                        self.loop.create_task(self._receive())]
+
+    def close(self):
+        """
+        Release resources held by the connection, putting it back into an
+        uninitialized state.  Safe to call from any thread.
+        """
+        self._run_on_loop(self._close)
+
+    def _close(self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            getLogger(__name__).info("Listener closed.")
+
+        if self.active:
+            self.writer.close()
+            self.writer = None
+            self.reader = None
+            for task in self._tasks:
+                task.cancel()
+            self._tasks = []
+            self.metrics.stop_logging()
+            self.send_queue.put(None)       # release a blocked send get
+            self.receive_queue.put(None)    # release the processing thread
+            if self._send_executor is not None:
+                self._send_executor.shutdown(wait = False)
+                self._send_executor = None
+
+            getLogger(__name__).info("Connection closed.")
+
+    def _run_on_loop(self, function):
+        """
+        Call the function on the loop's thread, waiting for it to finish when 
+        called from any other thread.
+        """
+        try:
+            running = get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self.loop or not self.loop.is_running():
+            function()
+        else:
+            done = FutureEvent()
+            def f():
+                try:
+                    function()
+                finally:
+                    done.set()
+            self.loop.call_soon_threadsafe(f)
+            done.wait(self.CLOSE_TIMEOUT)
+
+    async def _send(self):
+        """
+        Loop retrieving data from the send queue and writing it to the stream.
+        """
+        getLogger(__name__).debug("Send task starting.")
+        ready = Event()
+        notifying = hasattr(self.send_queue, "add_waiter")
+        if notifying:
+            self.send_queue.add_waiter(self.loop, ready)
+        try:
+            self.writer.writelines(self.frame_codec.handshake())
+            while self.active:
+                if notifying:
+                    items = self._drain_send_queue()
+                    if not items:
+                        ready.clear()
+                        items = self._drain_send_queue()
+                        if not items:
+                            await ready.wait()
+                            continue
+                else:
+                    items = [await self.loop.run_in_executor(
+                                                    self._get_send_executor(),
+                                                    self.send_queue.get)]
+                taken = monotonic()
+                writer = self.writer
+                if writer is not None:
+                    buffers = []
+                    written = 0
+                    for data in items:
+                        if data is not None:
+                            buffers.extend(self.frame_codec.encode(data))
+                            written += 1
+                    writer.writelines(buffers)
+                    self.metrics.messages_out += written
+                    self.metrics.record_send(sum(len(b) for b in buffers))
+                    await writer.drain()
+                    if written:
+                        self.metrics.record_written(taken, written)
+        except (ConnectionError, OSError) as err:
+            getLogger(__name__).warning("Send task stopped:  {}".format(err))
+        finally:
+            if notifying:
+                self.send_queue.remove_waiter(self.loop, ready)
+        getLogger(__name__).debug("Send task done.")
+
+    def _get_send_executor(self):
+        """
+        Single thread used to block on a send queue that cannot notify the 
+        loop, kept apart from the default executor that open_connection 
+        needs for name resolution.
+        """
+        if self._send_executor is None:
+            self._send_executor = ThreadPoolExecutor(1, 
+                                            "AsyncConnectionSendQueue")
+        return self._send_executor
+
+    def _drain_send_queue(self):
+        """
+        Take every item currently on the send queue without blocking.
+        """
+        items = []
+        try:
+            while True:
+                items.append(self.send_queue.get_nowait())
+        except Empty:
+            pass
+        return items
+
+    async def _receive(self):
+        """
+        Continuously read frames from the stream and put them on the receive
+        queue.
+        """
+        getLogger(__name__).debug("Receive task starting.")
+        try:
+            while self.active:
+                while getattr(self.receive_queue, "paused", False):
+                    await sleep(self.PAUSE_POLL_INTERVAL)
+                header = unpack(self.HEADER_PACK_STR, 
+                        await self.reader.readexactly(self.HEADER_SIZE))
+                payload = await self.reader.readexactly(header[-1])
+                self.metrics.record_receive(self.HEADER_SIZE + len(payload), 1)
+                data = self.frame_codec.decode(header, payload)
+                if data is not None:
+                    self.metrics.messages_in += 1
+                    self._put_received(data)
+        except (IncompleteReadError, OSError):
+            if self.active:     # connection closed from other end
+                self.controller.disconnect()
+        except ValueError as err:
+            getLogger(__name__).warning(("Unreadable frame from peer, "
+                                "disconnecting\nError: {}".format(err)))
+            self.controller.disconnect()
+        getLogger(__name__).debug("Receive task done.")
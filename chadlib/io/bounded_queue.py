@@ -0,0 +1,112 @@
+from queue      import Full, Queue
+
+
+class BoundedQueue(Queue):
+    """
+    Thread-safe queue limited by message count and total bytes, with
+    watermark-based backpressure.
+
+    Reaching either limit, the high watermark, pauses the queue until it
+    drains to the low watermark, a fraction of each limit.  While paused a
+    put follows the queue's policy:  BLOCK waits for the queue to resume,
+    DROP_OLDEST discards the oldest messages to make room, and RAISE raises
+    queue.Full.  Connections also stop reading from their socket while their
+    receive queue is paused.
+
+    None, used by connections to release waiting threads, is never limited.
+    """
+
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    RAISE = "raise"
+
+    def __init__(self, max_messages = 0, max_bytes = 0, policy = BLOCK,
+                    low_watermark = 0.5):
+        """
+        A limit of 0 disables that limit, low_watermark is the fraction of
+        each limit the queue must drain to before it resumes.
+        """
+        if policy not in (self.BLOCK, self.DROP_OLDEST, self.RAISE):
+            raise ValueError("Unknown queue policy:  {}".format(policy))
+        super().__init__()
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.low_messages = int(max_messages * low_watermark)
+        self.low_bytes = int(max_bytes * low_watermark)
+        self.bytes = 0
+        self.paused = False
+        self.dropped = 0
+
+    def put(self, item, block = True, timeout = None):
+        """
+        Put an item on the queue, applying the policy while paused.
+        """
+        with self.not_full:
+            if item is not None and self.paused:
+                if self.policy == self.DROP_OLDEST:
+                    self._drop_for(item)
+                elif self.policy == self.RAISE or not block:
+                    raise Full
+                elif not self.not_full.wait_for(lambda: not self.paused,
+                                                timeout):
+                    raise Full
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def force_put(self, item):
+        """
+        Put an item regardless of the limits, used where blocking or dropping
+        would lose data that is already received.
+        """
+        with self.not_full:
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def wait_until_resumed(self, timeout = None):
+        """
+        Block while the queue is paused, returns True once it is not.
+        """
+        with self.not_full:
+            return self.not_full.wait_for(lambda: not self.paused, timeout)
+
+    def _put(self, item):
+        super()._put(item)
+        self.bytes += self._item_size(item)
+        if ((self.max_messages and self._qsize() >= self.max_messages) or
+                (self.max_bytes and self.bytes >= self.max_bytes)):
+            self.paused = True
+
+    def _get(self):
+        item = super()._get()
+        self.bytes -= self._item_size(item)
+        if self.paused and self._below_low_watermark():
+            self.paused = False
+            self.not_full.notify_all()
+        return item
+
+    def _below_low_watermark(self):
+        return ((not self.max_messages or self._qsize() <= self.low_messages)
+                and (not self.max_bytes or self.bytes <= self.low_bytes))
+
+    def _drop_for(self, item):
+        """
+        Discard the oldest messages until the item fits under the limits.
+        """
+        size = self._item_size(item)
+        while self.queue and (
+                (self.max_messages and
+                    self._qsize() + 1 > self.max_messages) or
+                (self.max_bytes and self.bytes + size > self.max_bytes)):
+            self.bytes -= self._item_size(self.queue.popleft())
+            self.unfinished_tasks -= 1
+            self.dropped += 1
+        self.paused = False
+
+    def _item_size(self, item):
+        try:
+            return len(item)
+        except TypeError:
+            return 0
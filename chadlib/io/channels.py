@@ -0,0 +1,200 @@
+from collections    import deque
+from queue          import Empty
+from struct         import Struct
+from threading      import Condition
+from time           import monotonic
+
+
+CHUNK_HEADER = Struct("!HB")    # channel, flags
+FINAL = 0x1                     # last chunk of a message
+
+
+class _Channel:
+
+    def __init__(self, channel_id, priority, weight):
+        self.channel_id = channel_id
+        self.priority = priority
+        self.weight = weight
+        self.messages = deque()
+        self.offset = 0                 # into the first message
+        self.credit = weight
+        self.bytes = 0
+
+
+class ChannelScheduler:
+    """
+    Send queue multiplexing prioritized channels over one connection.
+
+    Pass it to a connection as its send_queue.  Messages put on a channel are
+    split into chunks of at most chunk_size bytes, and the connection's send
+    thread takes them one chunk at a time:  always from the highest priority
+    channel with data, sharing between channels of equal priority by weight,
+    in chunks per turn.  A large message therefore only delays a more urgent
+    one by a chunk, plus whatever the connection has already batched, see
+    Connection.SEND_BATCH_MAX_BYTES.
+
+    Each chunk starts with a CHUNK_HEADER naming its channel, a
+    ChannelRouter reassembles them on the receiving side.
+    """
+
+    DEFAULT_CHUNK_SIZE = 16384
+
+    def __init__(self, chunk_size = DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.channels = {}
+        self._levels = {}               # priority -> deque of busy channels
+        self._wakeups = 0               # None puts waiting to be returned
+        self._count = 0
+        self._bytes = 0
+        self._not_empty = Condition()
+        self.add_channel(0)
+
+    def add_channel(self, channel_id, priority = 0, weight = 1):
+        """
+        Declare a channel, higher priorities are always sent first.
+        """
+        if weight < 1:
+            raise ValueError("Channel weight must be at least 1.")
+        with self._not_empty:
+            if channel_id in self.channels:
+                raise ValueError("Channel {} already exists."
+                                    .format(channel_id))
+            self.channels[channel_id] = _Channel(channel_id, priority, weight)
+
+    def send(self, channel_id, data):
+        """
+        Queue a message on a channel.
+        """
+        with self._not_empty:
+            channel = self.channels[channel_id]
+            if not channel.messages:
+                self._levels.setdefault(channel.priority,
+                                        deque()).append(channel)
+            channel.messages.append(data)
+            channel.bytes += len(data)
+            self._count += 1
+            self._bytes += len(data)
+            self._not_empty.notify()
+
+    def put(self, item, block = True, timeout = None):
+        """
+        Queue a message on channel 0.  None, put by a closing connection, is
+        handed back by the next get ahead of any data.
+        """
+        if item is None:
+            with self._not_empty:
+                self._wakeups += 1
+                self._not_empty.notify()
+        else:
+            self.send(0, item)
+
+    def get(self, block = True, timeout = None):
+        """
+        Return the next chunk to send.
+        """
+        with self._not_empty:
+            if block:
+                deadline = None if timeout is None else monotonic() + timeout
+                while not (self._wakeups or self._levels):
+                    remaining = (None if deadline is None
+                                    else deadline - monotonic())
+                    if remaining is not None and remaining <= 0:
+                        raise Empty
+                    self._not_empty.wait(remaining)
+            elif not (self._wakeups or self._levels):
+                raise Empty
+            if self._wakeups:
+                self._wakeups -= 1
+                return None
+            return self._next_chunk()
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def qsize(self):
+        """
+        Number of messages with chunks still to send.
+        """
+        return self._count
+
+    def empty(self):
+        return not self._levels
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def _next_chunk(self):
+        """
+        Cut the next chunk from the highest busy priority level, with the
+        lock held.
+        """
+        priority = max(self._levels)
+        level = self._levels[priority]
+        channel = level[0]
+        message = channel.messages[0]
+        end = min(len(message), channel.offset + self.chunk_size)
+        final = end == len(message)
+        header = CHUNK_HEADER.pack(channel.channel_id, FINAL if final else 0)
+        chunk = header + memoryview(message)[channel.offset:end]
+        channel.bytes -= end - channel.offset
+        self._bytes -= end - channel.offset
+        channel.offset = end
+
+        if final:
+            channel.messages.popleft()
+            channel.offset = 0
+            self._count -= 1
+        channel.credit -= 1
+        if not channel.messages or not channel.credit:
+            channel.credit = channel.weight
+            level.popleft()
+            if channel.messages:
+                level.append(channel)
+            elif not level:
+                del self._levels[priority]
+        return chunk
+
+
+class ChannelRouter:
+    """
+    Reassembles chunks from a ChannelScheduler and routes each channel's
+    messages to its own queue or handler.
+
+    process_received_data can be used directly as a controller's
+    process_received_data.  Messages for channels without a route are
+    dropped.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self._partial = {}              # channel -> bytearray
+
+    def route(self, channel_id, target):
+        """
+        Deliver the channel's messages to target, a queue, anything with a
+        put method, or a callable taking the message.
+        """
+        self.routes[channel_id] = getattr(target, "put", target)
+
+    def process_received_data(self, data):
+        """
+        Add one chunk, delivering its message once complete.
+        """
+        channel_id, flags = CHUNK_HEADER.unpack_from(data)
+        body = memoryview(data)[CHUNK_HEADER.size:]
+        partial = self._partial.get(channel_id)
+        if flags & FINAL:
+            if partial is None:
+                message = bytes(body)
+            else:
+                partial += body
+                message = bytes(partial)
+                del self._partial[channel_id]
+            deliver = self.routes.get(channel_id)
+            if deliver is not None:
+                deliver(message)
+        elif partial is None:
+            self._partial[channel_id] = bytearray(body)
+        else:
+            partial += body
@@ -1,23 +1,86 @@
+from collections import deque
 from logging    import getLogger
-from selectors  import DefaultSelector, EVENT_READ
-from socket     import socket, SO_REUSEADDR, SOL_SOCKET
-from struct     import calcsize, pack, unpack
-from threading  import Lock, Thread
-from time       import sleep
+from random     import uniform
+from queue      import Empty
+from selectors  import DefaultSelector, EVENT_READ, EVENT_WRITE
+from socket     import (socket, socketpair, SHUT_RDWR, SO_REUSEADDR, 
+                        SOL_SOCKET)
+from threading  import Lock, Thread, current_thread
+from time       import monotonic, sleep
+
+from .frame_buffer  import FrameBuffer
+from .frame_codec   import FrameCodec
+from .metrics       import ConnectionMetrics
+
+
+SENDMSG_MAX_BUFFERS = 1024     # conservative IOV_MAX
+
+
+def send_buffers(sock, buffers):
+    """
+    Write as many of the buffers as the socket accepts in one call, returning 
+    the number of bytes sent.  Uses scatter/gather sendmsg where the platform 
+    has it, so the buffers are never joined into one copy.
+    """
+    if hasattr(sock, "sendmsg"):
+        return sock.sendmsg(buffers[:SENDMSG_MAX_BUFFERS])
+    return sock.send(buffers[0])
+
+def advance_buffers(buffers, sent):
+    """
+    Return the buffers still to be written after sent bytes went out.
+    """
+    i = 0
+    while i < len(buffers) and sent >= len(buffers[i]):
+        sent -= len(buffers[i])
+        i += 1
+    buffers = buffers[i:]
+    if sent:
+        buffers[0] = memoryview(buffers[0])[sent:]
+    return buffers
 
 
 class Connection:
     """
     Provides an interface to a multi-threaded socket that handles network I/O 
     without blocking the execution of the main program.
+
+    Queued messages are sent in batches, bounded by the SEND_BATCH_* 
+    settings, with a header per message written by a single vectored send.  
+    Override the settings on a subclass or instance to tune batching.
+
+    Payloads are compressed with the first of COMPRESSION_CODECS that the 
+    peer also offers during the handshake, see FrameCodec.
+
+    Traffic and queue statistics are kept in metrics, a ConnectionMetrics.
+
+    The send and receive threads share no lock, each sleeps in its own 
+    selector alongside a wakeup socket that close uses to stop them at once.
+
+    Every HEARTBEAT_INTERVAL seconds a ping frame is sent, which the peer 
+    echoes, to measure the round trip time exposed as rtt and rtt_variance.  
+    A peer that sends nothing, not even its own pings, for 
+    HEARTBEAT_MISSED_LIMIT intervals is treated as gone, as if it had closed 
+    the connection.  Set HEARTBEAT_INTERVAL to None to disable heartbeats.
     """
 
-    HEADER_VERSION = 1
-    HEADER_PACK_STR = "II"      # version, length
-    HEADER_SIZE = calcsize(HEADER_PACK_STR)
+    HEADER_VERSION = FrameCodec.HEADER_VERSION
+    HEADER_PACK_STR = FrameCodec.HEADER_PACK_STR
+    HEADER_SIZE = FrameCodec.HEADER_SIZE
+
+    COMPRESSION_CODECS = ()     # codec names in order of preference
 
     CONNECT_ATTEMPTS = 3
-    SELECT_TIMEOUT_INTERVAL = 0.3
+    CONNECT_BACKOFF_BASE = 0.5
+    CONNECT_BACKOFF_MAX = 8.0
+    SELECT_TIMEOUT_INTERVAL = 0.3     # poll while receive queue is paused
+
+    SEND_BATCH_MAX_BYTES = 262144
+    SEND_BATCH_MAX_MESSAGES = 256
+    SEND_BATCH_MAX_DELAY = 0
+
+    HEARTBEAT_INTERVAL = 5.0
+    HEARTBEAT_MISSED_LIMIT = 3
 
     def __init__(self, controller, send_queue, receive_queue):
         """
@@ -25,11 +88,21 @@ class Connection:
         """
         self.socket = None
         self.listener = None
-        self.socket_lock = None
+        self._wakeup_receiver = None
+        self._wakeup_sender = None
+        self._threads = []
+        self._threads_lock = Lock()
+        self._heartbeats = deque()      # frames for the send thread
+        self._last_received = 0.0
+        self._next_ping = 0.0
+        self._batch_taken = 0.0         # when the batch being sent was taken
 
         self.controller = controller
         self.send_queue = send_queue
         self.receive_queue = receive_queue
+        self.frame_codec = FrameCodec(self.COMPRESSION_CODECS)
+        self.metrics = ConnectionMetrics()
+        self.metrics.watch_queues(send_queue, receive_queue)
 
     @property
     def active(self):
@@ -39,6 +112,20 @@ class Connection:
         """
         return self.socket is not None
 
+    @property
+    def rtt(self):
+        """
+        Smoothed round trip time in seconds, None until measured.
+        """
+        return self.metrics.rtt
+
+    @property
+    def rtt_variance(self):
+        """
+        Mean deviation of the round trip time in seconds, None until measured.
+        """
+        return self.metrics.rtt_variance
+
     def startup_accept(self, port):
         """
         Start a listening thread to wait on an incoming connection.
@@ -68,25 +155,47 @@ class Connection:
         closed while waiting for a connection.  I should have some mechanism in 
         close to force this to end.
         """
+        self._listen(port)
+        self._accept()
+
+    def _listen(self, port):
+        """
+        Open the listening socket.
+        """
         getLogger(__name__).info("Waiting for connection...")
         getLogger(__name__).debug("Listening on port:  {}".format(port))
         self.listener = self._create_new_socket()
-        self.listener.bind(("", port))
+        self.listener.bind(self._listen_address(port))
         self.listener.listen(1)
+
+    def _listen_address(self, port):
+        return ("", port)
+
+    def _peer_address(self, port, ip_address):
+        return (ip_address, port)
+
+    def _format_address(self, addr):
+        return "{}:{}".format(addr[0], addr[1])
+
+    def _accept(self):
+        """
+        Wait on the listening socket for the peer to connect.
+        """
         conn = None
-        try:
-            conn, addr = self.listener.accept()
-        except OSError as err:  # expected error if the listener socket is
-            pass                # closed during the accept call
+        listener = self.listener
+        if listener is not None:            # None if closed before accept
+            try:
+                conn, addr = listener.accept()
+            except OSError:                 # expected if the listener is
+                pass                        # closed during accept
 
         if conn is not None:
             self._set_socket(conn)
         if self.active:
-            self.controller.start_processing_receive_queue()
-            self.start()
+            self._connection_made()
             getLogger(__name__).info("Connection accepted.")
-            getLogger(__name__).debug("Connected to peer at {}:{}"
-                                        .format(addr[0], addr[1]))
+            getLogger(__name__).debug("Connected to peer at {}"
+                                        .format(self._format_address(addr)))
         else:
             getLogger(__name__).warning(("No connection was established."))
             
@@ -97,36 +206,61 @@ class Connection:
         """
         getLogger(__name__).info("Attempting to connect...")
         getLogger(__name__).debug("Peer at {}:{}".format(ip_address, port))
-        conn = self._create_new_socket()
-        connected = False
-
-        for i in range(self.CONNECT_ATTEMPTS):
-            try:
-                conn.connect((ip_address, port))
-                connected = True
-                break
-            except (ConnectionRefusedError, OSError):
-                getLogger(__name__).debug("Attempt {}/{} failed"
-                                        .format(i + 1, self.CONNECT_ATTEMPTS))
-                if i < self.CONNECT_ATTEMPTS:
-                    sleep(i + 1)
-
-        if connected:
+        conn = self._connect_with_backoff(port, ip_address, 
+                                            self.CONNECT_ATTEMPTS)
+        if conn is not None:
             self._set_socket(conn)
-            self.controller.start_processing_receive_queue()
-            self.start()
+            self._connection_made()
             getLogger(__name__).info("Connection established.")
         else:
             getLogger(__name__).warning(("No connection was established."))
 
+    def _connect_with_backoff(self, port, ip_address, attempts):
+        """
+        Try to connect up to attempts times, sleeping a jittered, 
+        exponentially growing delay between tries.  Returns the connected 
+        socket, or None.
+        """
+        for i in range(attempts):
+            conn = self._create_new_socket()
+            try:
+                conn.connect(self._peer_address(port, ip_address))
+                return conn
+            except OSError:
+                conn.close()
+                getLogger(__name__).debug("Attempt {}/{} failed"
+                                            .format(i + 1, attempts))
+                if i + 1 < attempts:
+                    sleep(self._backoff_delay(i))
+        return None
+
+    def _backoff_delay(self, attempt):
+        """
+        Delay before the next connection attempt, full exponential backoff 
+        capped at CONNECT_BACKOFF_MAX with up to half of it removed as jitter.
+        """
+        delay = min(self.CONNECT_BACKOFF_MAX, 
+                    self.CONNECT_BACKOFF_BASE * 2 ** attempt)
+        return delay * uniform(0.5, 1.0)
+
+    def _connection_made(self):
+        """
+        Start processing once a socket has been set.
+        """
+        self.controller.start_processing_receive_queue()
+        self.start()
+
     def _set_socket(self, socket):
         """
         Change any options needed to the socket and initialize the other data 
         structures needed for sending and receiving.
         """
         socket.setblocking(False)
+        self._wakeup_receiver, self._wakeup_sender = socketpair()
+        self._wakeup_receiver.setblocking(False)
+        self._wakeup_sender.setblocking(False)
         self.socket = socket
-        self.socket_lock = Lock()
+        self.frame_codec = FrameCodec(self.COMPRESSION_CODECS)
 
     def _create_new_socket(self):
         """
@@ -140,29 +274,65 @@ class Connection:
         """
         Begin the sending and receiving threads for normal operation.
         """
-        if self.active:
-            Thread(target = self._send).start()
-            Thread(target = self._receive).start()
+        with self._threads_lock:
+            if self.active:
+                now = monotonic()
+                self._heartbeats.clear()
+                self._last_received = now
+                self._next_ping = now
+                self.frame_codec.on_heartbeat = self._heartbeat_received
+                self._threads = [Thread(target = self._send, 
+                                        args = (self.socket,)),
+                                Thread(target = self._receive, 
+                                        args = (self.socket,))]
+                for t in self._threads:
+                    t.start()
 
     def close(self):
         """
         Release resources held by the connection, putting it back into an 
         uninitialized state.
         """
-        if self.listener is not None:
-            self.listener.close()
+        self._close_listener()
+        if self._close_socket():
+            self.metrics.stop_logging()
+            self.receive_queue.put(None)    # release the processing thread
+
+            getLogger(__name__).info("Connection closed.")
+
+    def _close_listener(self):
+        with self._threads_lock:
+            listener = self.listener
             self.listener = None
+        if listener is not None:
+            try:
+                listener.shutdown(SHUT_RDWR)    # wakes a blocked accept
+            except OSError:
+                pass
+            listener.close()
             getLogger(__name__).info("Listener closed.")
 
-        if self.active:
-            with self.socket_lock:
-                self.socket.close()
-                self.socket = None
-            self.socket_lock = None
-            self.send_queue.put(None)       # release the send thread
-            self.receive_queue.put(None)    # release the processing thread
+    def _close_socket(self):
+        """
+        Stop the send and receive threads and close the socket, returns True 
+        if there was an active socket to close.
+        """
+        with self._threads_lock:
+            sock = self.socket
+            self.socket = None
+            threads = self._threads
+            self._threads = []
 
-            getLogger(__name__).info("Connection closed.")
+        if sock is not None:
+            self._wake()                    # release selecting threads
+            self.send_queue.put(None)       # release the send thread
+            for t in threads:
+                if t is not current_thread():
+                    t.join()
+            sock.close()
+            self._wakeup_receiver.close()
+            self._wakeup_sender.close()
+        return sock is not None
 
     def get_incoming_data(self):
         """
@@ -174,78 +344,244 @@ class Connection:
             result = self.receive_queue.get()
         return result
 
-    def _send(self):
+    def _wake(self):
         """
-        Loop retrieving data from the send queue and sending it on the socket.
+        Interrupt the threads waiting on the connection's selectors.
         """
+        try:
+            self._wakeup_sender.send(b"\0")
+        except OSError:     # already pending
+            pass
+
+    def _send(self, sock):
+        """
+        Loop retrieving batches of data from the send queue and writing them 
+        to the socket, each message keeping its own header.
+        """
+        selector = DefaultSelector()
+        selector.register(sock, EVENT_WRITE)
+        selector.register(self._wakeup_receiver, EVENT_READ)
+
         getLogger(__name__).debug("Send thread starting.")
-        while self.active:
+        buffers = self._opening_buffers()
+        written = 0             # messages in buffers
+        while self.socket is sock:
             try:
-                data = self._get_data_from_send_queue()
-                if self.socket is not None:
-                    header = self._create_data_header(data)
-                    with self.socket_lock:
-                        self.socket.sendall(header + data)
+                self._send_buffers(sock, buffers, selector)
+                if written and self.socket is sock:
+                    self.metrics.record_written(self._batch_taken, written)
+                batch = self._get_batch_from_send_queue()
+                buffers = self._take_heartbeats()
+                for data in batch:
+                    buffers.extend(self.frame_codec.encode(data))
+                self.metrics.messages_out += len(batch)
+                written = len(batch)
             except Exception as err:
                 getLogger(__name__).warning(("Unexpected exception occurred,"
                                 " send thread may be in a corrupted state\n"
                                 "Error: {}".format(err)))
+        selector.close()
         getLogger(__name__).debug("Send thread done.")
 
-    def _get_data_from_send_queue(self):
+    def _opening_buffers(self):
         """
-        Retrieve data from the queue.  If there is more than a single item, 
-        retrieve multiple pieces of data to improve throughput.
+        Buffers sent before anything from the send queue.
+        """
+        return self.frame_codec.handshake()
 
-        The queue is not guaranteed to be empty after this method, because of 
-        multi-processing new items could be enqueued between the size check 
-        and the creation of the data list.
+    def _get_batch_from_send_queue(self):
         """
-        size = self.send_queue.qsize()
-        if size > 1:
-            data = b''.join([self.send_queue.get() for _ in range(size)])
-        else:
-            data = self.send_queue.get()
-        return data
+        Block for one message, then keep taking messages until the queue is 
+        empty or the batch reaches SEND_BATCH_MAX_MESSAGES or 
+        SEND_BATCH_MAX_BYTES.  With a SEND_BATCH_MAX_DELAY, wait up to that 
+        many seconds after the first message for more to arrive.
+
+        The None put by close is dropped, leaving a possibly empty batch.  
+        The time the first message was taken is kept for the metrics.
+        """
+        batch = []
+        size = 0
+        data = self.send_queue.get()
+        self._batch_taken = monotonic()
+        deadline = self._batch_taken + self.SEND_BATCH_MAX_DELAY
+        while data is not None:
+            batch.append(data)
+            size += len(data)
+            if (len(batch) >= self.SEND_BATCH_MAX_MESSAGES or 
+                    size >= self.SEND_BATCH_MAX_BYTES):
+                break
+            try:
+                remaining = deadline - monotonic()
+                if remaining > 0:
+                    data = self.send_queue.get(timeout = remaining)
+                else:
+                    data = self.send_queue.get_nowait()
+            except Empty:
+                break
+        return batch
+
+    def _send_buffers(self, sock, buffers, selector):
+        """
+        Write every buffer to the non-blocking socket, waiting on the selector 
+        whenever the socket cannot take more, until done or closed.
+        """
+        while buffers and self.socket is sock:
+            try:
+                sent = send_buffers(sock, buffers)
+            except BlockingIOError:
+                sent = 0
+            if sent:
+                self.metrics.record_send(sent)
+            buffers = advance_buffers(buffers, sent)
+            if buffers and not sent:
+                selector.select()
 
-    def _receive(self):
+    def _receive(self, sock):
         """
-        Continuously read data from the socket and put it on the receive queue.
+        Continuously read data from the socket and put every complete message 
+        on the receive queue, sleeping in the selector until there is data or 
+        a wakeup.
         """
         selector = DefaultSelector()
-        selector.register(self.socket, EVENT_READ)
+        selector.register(sock, EVENT_READ)
+        selector.register(self._wakeup_receiver, EVENT_READ)
+        frame_buffer = FrameBuffer(self.HEADER_PACK_STR)
 
         getLogger(__name__).debug("Receive thread starting.")
-        while self.active:
+        while self.socket is sock:
             try:
-                val = selector.select(self.SELECT_TIMEOUT_INTERVAL)
-                if val:
-                    with self.socket_lock:
-                        header = None       # protecting against close error
-                        if self.socket is not None: 
-                            header = self.socket.recv(self.HEADER_SIZE)
-                    if header and header is not None:
-                        data = self._read_data(header)
-                        self.receive_queue.put(data)
-                    else:           # connection closed from other end
-                        self.controller.disconnect()
+                paused = self._receive_paused()
+                self._check_heartbeat(paused)
+                if paused:
+                    continue
+                for key, _ in selector.select(self._heartbeat_wait()):
+                    if key.fileobj is self._wakeup_receiver:
+                        self._drain_wakeups(sock)
+                    elif self.socket is sock:
+                        self._read_frames(sock, frame_buffer)
             except Exception as err:
                 getLogger(__name__).warning(("Unexpected exception occurred,"
                             " receive thread may be in a corrupted state\n"
                             "Error: {}".format(err)))
+        selector.close()
         getLogger(__name__).debug("Receive thread done.")
 
-    def _create_data_header(self, data):
+    def _drain_wakeups(self, sock):
+        try:
+            while self.socket is sock and self._wakeup_receiver.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _read_frames(self, sock, frame_buffer):
+        """
+        Read what the socket has and handle every complete frame.
+        """
+        try:
+            count = frame_buffer.recv_from(sock)
+        except BlockingIOError:
+            return
+        except ConnectionError:     # reset by the other end
+            count = 0
+        if count:
+            self._last_received = monotonic()
+            frames = frame_buffer.frames()
+            self.metrics.record_receive(count, len(frames))
+            self._decode_frames(frames)
+        else:
+            self._peer_closed()
+
+    def _check_heartbeat(self, paused):
+        """
+        Ping the peer when an interval has passed, and give up on it once
+        nothing has arrived for HEARTBEAT_MISSED_LIMIT intervals.  While
+        reads are paused the peer's silence is our own doing, not its.
+        """
+        interval = self.HEARTBEAT_INTERVAL
+        if not interval:
+            return
+        now = monotonic()
+        if paused:
+            self._last_received = now
+        elif now - self._last_received >= (interval *
+                                            self.HEARTBEAT_MISSED_LIMIT):
+            getLogger(__name__).warning("Peer missed {} heartbeats"
+                                        .format(self.HEARTBEAT_MISSED_LIMIT))
+            self._last_received = now
+            self._peer_closed()
+            return
+        if now >= self._next_ping:
+            self._next_ping = now + interval
+            self._send_heartbeat(FrameCodec.PING, now)
+
+    def _heartbeat_wait(self):
+        """
+        Seconds the receive thread may sleep before the next heartbeat check.
+        """
+        interval = self.HEARTBEAT_INTERVAL
+        if not interval:
+            return None
+        deadline = min(self._next_ping, self._last_received +
+                        interval * self.HEARTBEAT_MISSED_LIMIT)
+        return max(0, deadline - monotonic())
+
+    def _heartbeat_received(self, kind, stamp):
+        """
+        Echo the peer's pings, and time the echoes of ours.
+        """
+        if kind == FrameCodec.PING:
+            self._send_heartbeat(FrameCodec.PONG, stamp)
+        elif kind == FrameCodec.PONG:
+            self.metrics.record_rtt(monotonic() - stamp)
+
+    def _send_heartbeat(self, kind, stamp):
+        self._heartbeats.append(self.frame_codec.heartbeat(kind, stamp))
+        getattr(self.send_queue, "force_put", self.send_queue.put)(None)
+
+    def _take_heartbeats(self):
+        """
+        Buffers of the heartbeat frames waiting to be sent.
+        """
+        buffers = []
+        while self._heartbeats:
+            buffers.extend(self._heartbeats.popleft())
+        return buffers
+
+    def _peer_closed(self):
+        """
+        React to the connection being closed from the other end.
+        """
+        self.controller.disconnect()
+
+    def _decode_frames(self, frames):
+        """
+        Put the data of each received frame on the receive queue, 
+        disconnecting from a peer that sends frames we cannot read.
+        """
+        for header, payload in frames:
+            try:
+                data = self.frame_codec.decode(header, payload)
+            except Exception as err:
+                getLogger(__name__).warning(("Unreadable frame from peer, "
+                                "disconnecting\nError: {}".format(err)))
+                self.controller.disconnect()
+                return
+            if data is not None:
+                self.metrics.messages_in += 1
+                self._put_received(data)
+
+    def _receive_paused(self):
         """
-        Create a bytes header for variable-sized data messages.
+        Wait briefly while a bounded receive queue is paused, returning True 
+        if it still is so the socket is not read.  Leaving data unread lets 
+        TCP flow control push back on the peer.
         """
-        return pack(self.HEADER_PACK_STR, self.HEADER_VERSION, len(data))
+        wait = getattr(self.receive_queue, "wait_until_resumed", None)
+        return wait is not None and not wait(self.SELECT_TIMEOUT_INTERVAL)
 
-    def _read_data(self, header):
+    def _put_received(self, data):
         """
-        Use the header to read the body of the message from the socket.
+        Put received data on the receive queue without blocking or dropping 
+        it, reads are paused instead to respect the queue's limits.
         """
-        _, msg_size = unpack(self.HEADER_PACK_STR, header)
-        with self.socket_lock:
-            data = self.socket.recv(msg_size)
-        return data
+        getattr(self.receive_queue, "force_put", self.receive_queue.put)(data)
@@ -0,0 +1,369 @@
+from collections    import deque
+from functools      import partial
+from itertools      import count, islice
+from logging        import getLogger
+from queue          import Queue
+from selectors      import DefaultSelector, EVENT_READ, EVENT_WRITE
+from socket         import socket, socketpair, SO_REUSEADDR, SOL_SOCKET
+from threading      import Lock, Thread, current_thread
+
+from .connection    import (Connection, SENDMSG_MAX_BUFFERS, advance_buffers, 
+                            send_buffers)
+from .frame_buffer  import FrameBuffer
+from .frame_codec   import FrameCodec
+from .server_controller import ServerController
+
+
+class _Peer:
+    """
+    Per-peer socket and buffer state owned by the server's I/O thread.
+    """
+
+    def __init__(self, peer_id, sock, address, codecs):
+        self.peer_id = peer_id
+        self.socket = sock
+        self.address = address
+        self.receive_queue = Queue()
+        self.inbound = FrameBuffer(Connection.HEADER_PACK_STR)
+        self.frame_codec = FrameCodec(codecs)
+        self.outbound = deque(self.frame_codec.handshake())
+
+
+class ConnectionServer:
+    """
+    Accepts and serves any number of peers on a single port, multiplexing the
+    listener and every peer socket through one selector in one I/O thread.
+
+    Each accepted peer gets an integer peer ID.  Received messages are either
+    passed to receive_callback(peer_id, data) on the I/O thread, or put on a
+    per-peer receive queue when no callback is given.  The controller, if
+    given, must implement ServerController and is told as peers connect and
+    disconnect.  Frames use the same format as Connection, and heartbeat
+    pings from peers are echoed so they can measure the round trip time.
+    """
+
+    HEADER_VERSION = Connection.HEADER_VERSION
+    HEADER_PACK_STR = Connection.HEADER_PACK_STR
+    HEADER_SIZE = Connection.HEADER_SIZE
+
+    COMPRESSION_CODECS = Connection.COMPRESSION_CODECS
+
+    LISTEN_BACKLOG = 128
+    RECV_SIZE = 65536
+
+    def __init__(self, controller = None, receive_callback = None):
+        """
+        Put the server in an uninitialized, inactive, state.
+        """
+        self.controller = controller
+        if (self.controller is not None and 
+                not isinstance(self.controller, ServerController)):
+            raise RuntimeError("Controller does not implement the required "
+                                "ServerController interface.")
+        self.receive_callback = receive_callback
+
+        self.listener = None
+        self.selector = None
+        self.peers = {}
+        self.peers_lock = Lock()
+        self._peer_ids = count(1)
+        self._pending_writes = set()
+        self._pending_calls = []
+        self._wakeup_receiver = None
+        self._wakeup_sender = None
+        self._thread = None
+
+    @property
+    def active(self):
+        """
+        Boolean property that is true if the server is listening for peers,
+        false otherwise.
+        """
+        return self.listener is not None
+
+    @property
+    def peer_ids(self):
+        """
+        List of the IDs of every currently connected peer.
+        """
+        with self.peers_lock:
+            return list(self.peers)
+
+    def startup_accept(self, port):
+        """
+        Open the listening socket and start the I/O thread.
+        """
+        if self.active:
+            return
+        getLogger(__name__).info("Serving peers...")
+        getLogger(__name__).debug("Listening on port:  {}".format(port))
+        listener = socket()
+        try:
+            listener.setsockopt(SOL_SOCKET, SO_REUSEADDR, True)
+            listener.bind(("", port))
+            listener.listen(self.LISTEN_BACKLOG)
+            listener.setblocking(False)
+        except OSError:
+            listener.close()
+            raise
+
+        self._wakeup_receiver, self._wakeup_sender = socketpair()
+        self._wakeup_receiver.setblocking(False)
+        self._wakeup_sender.setblocking(False)
+
+        self.selector = DefaultSelector()
+        self.selector.register(listener, EVENT_READ)
+        self.selector.register(self._wakeup_receiver, EVENT_READ)
+        self.listener = listener
+
+        self._thread = Thread(target = self._serve, name = "ConnectionServer")
+        self._thread.start()
+
+    def send(self, peer_id, data):
+        """
+        Queue a message to the given peer, returns False if the peer is not
+        connected.
+        """
+        with self.peers_lock:
+            peer = self.peers.get(peer_id)
+        if peer is None:
+            return False
+        buffers = peer.frame_codec.encode(data)
+        with self.peers_lock:
+            peer.outbound.extend(buffers)
+            self._pending_writes.add(peer_id)
+        self._wake()
+        return True
+
+    def broadcast(self, data):
+        """
+        Queue a message to every connected peer.
+        """
+        for peer_id in self.peer_ids:
+            self.send(peer_id, data)
+
+    def get_receive_queue(self, peer_id):
+        """
+        Return the receive queue of the given peer, or None if not connected.
+        """
+        with self.peers_lock:
+            peer = self.peers.get(peer_id)
+        return peer.receive_queue if peer is not None else None
+
+    def get_incoming_data(self, peer_id):
+        """
+        Blocking get from the peer's receive queue, returns None if the peer
+        is not connected or disconnects while waiting.
+        """
+        receive_queue = self.get_receive_queue(peer_id)
+        result = None
+        if receive_queue is not None:
+            result = receive_queue.get()
+        return result
+
+    def disconnect_peer(self, peer_id):
+        """
+        Close the connection to a single peer.
+        """
+        with self.peers_lock:
+            peer = self.peers.get(peer_id)
+        if peer is not None:
+            self._run_on_io_thread(lambda: self._drop_peer(peer))
+
+    def close(self):
+        """
+        Stop the I/O thread and release every socket, putting the server back
+        into an uninitialized state.
+        """
+        if self.active:
+            self.listener = None
+            self._wake()
+            if self._thread is not current_thread():
+                self._thread.join()
+
+    def _run_on_io_thread(self, function):
+        """
+        Hand a function to the I/O thread, which owns the selector.
+        """
+        with self.peers_lock:
+            self._pending_calls.append(function)
+        self._wake()
+
+    def _wake(self):
+        """
+        Interrupt the selector so the I/O thread notices new work.
+        """
+        sender = self._wakeup_sender
+        if sender is not None:
+            try:
+                sender.send(b"\0")
+            except OSError:     # already pending, or the server just closed
+                pass
+
+    def _serve(self):
+        """
+        Single I/O loop for the listener and every peer.
+        """
+        getLogger(__name__).debug("Server thread starting.")
+        listener = self.listener
+        wakeup_receiver = self._wakeup_receiver
+        wakeup_sender = self._wakeup_sender
+        while self.listener is not None:
+            for key, events in self.selector.select():
+                try:
+                    if key.fileobj is listener:
+                        self._accept_peers(listener)
+                    elif key.fileobj is wakeup_receiver:
+                        self._drain_wakeups(wakeup_receiver)
+                    else:
+                        peer = key.data
+                        if events & EVENT_READ:
+                            self._read_from_peer(peer)
+                        if events & EVENT_WRITE and peer.peer_id in self.peers:
+                            self._write_to_peer(peer)
+                except Exception as err:
+                    getLogger(__name__).warning(("Unexpected exception "
+                                "occurred in the server thread\n"
+                                "Error: {}".format(err)))
+            self._run_pending_calls()
+            self._update_write_interest()
+
+        for peer in list(self.peers.values()):
+            self._drop_peer(peer)
+        self.selector.close()
+        listener.close()
+        self._wakeup_sender = None
+        wakeup_receiver.close()
+        wakeup_sender.close()
+        getLogger(__name__).info("Server closed.")
+
+    def _accept_peers(self, listener):
+        """
+        Accept every pending peer on the listener.
+        """
+        while True:
+            try:
+                conn, addr = listener.accept()
+            except BlockingIOError:
+                return
+            conn.setblocking(False)
+            peer = _Peer(next(self._peer_ids), conn, addr, 
+                            self.COMPRESSION_CODECS)
+            peer.frame_codec.on_heartbeat = partial(self._echo_heartbeat, peer)
+            with self.peers_lock:
+                self.peers[peer.peer_id] = peer
+                self._pending_writes.add(peer.peer_id)  # the handshake
+            self.selector.register(conn, EVENT_READ, peer)
+            getLogger(__name__).debug("Peer {} connected from {}:{}"
+                                .format(peer.peer_id, addr[0], addr[1]))
+            if self.controller is not None:
+                self.controller.peer_connected(peer.peer_id)
+
+    def _drain_wakeups(self, wakeup_receiver):
+        try:
+            while wakeup_receiver.recv(self.RECV_SIZE):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _run_pending_calls(self):
+        with self.peers_lock:
+            calls = self._pending_calls
+            self._pending_calls = []
+        for function in calls:
+            function()
+
+    def _update_write_interest(self):
+        """
+        Watch for writability on peers that have queued outbound data.
+        """
+        with self.peers_lock:
+            pending = [self.peers[peer_id] for peer_id in self._pending_writes
+                        if peer_id in self.peers]
+            self._pending_writes.clear()
+        for peer in pending:
+            self.selector.modify(peer.socket, EVENT_READ | EVENT_WRITE, peer)
+
+    def _read_from_peer(self, peer):
+        """
+        Read what is available and deliver every complete message.
+        """
+        try:
+            count = peer.inbound.recv_from(peer.socket)
+        except BlockingIOError:
+            return
+        except OSError:
+            count = 0
+        if not count:       # connection closed from other end
+            self._drop_peer(peer)
+            return
+
+        for header, payload in peer.inbound.frames():
+            try:
+                data = peer.frame_codec.decode(header, payload)
+            except Exception as err:
+                getLogger(__name__).warning(("Unreadable frame from peer {}, "
+                                "disconnecting\nError: {}"
+                                .format(peer.peer_id, err)))
+                self._drop_peer(peer)
+                return
+            if data is not None:
+                self._deliver(peer, data)
+
+    def _echo_heartbeat(self, peer, kind, stamp):
+        """
+        Answer a peer's ping, the server sends none of its own.
+        """
+        if kind == FrameCodec.PING:
+            buffers = peer.frame_codec.heartbeat(FrameCodec.PONG, stamp)
+            with self.peers_lock:
+                peer.outbound.extend(buffers)
+                self._pending_writes.add(peer.peer_id)
+
+    def _deliver(self, peer, data):
+        if self.receive_callback is not None:
+            self.receive_callback(peer.peer_id, data)
+        else:
+            peer.receive_queue.put(data)
+
+    def _write_to_peer(self, peer):
+        """
+        Write as much queued data as the socket accepts.
+        """
+        while True:
+            with self.peers_lock:
+                buffers = list(islice(peer.outbound, SENDMSG_MAX_BUFFERS))
+            if not buffers:
+                self.selector.modify(peer.socket, EVENT_READ, peer)
+                return
+            try:
+                sent = send_buffers(peer.socket, buffers)
+            except BlockingIOError:
+                return
+            except OSError:
+                self._drop_peer(peer)
+                return
+            remaining = advance_buffers(buffers, sent)
+            with self.peers_lock:
+                for _ in range(len(buffers) - len(remaining)):
+                    peer.outbound.popleft()
+                if remaining:
+                    peer.outbound[0] = remaining[0]
+            if remaining:
+                return
+
+    def _drop_peer(self, peer):
+        """
+        Unregister and close a peer, releasing anything waiting on it.
+        """
+        with self.peers_lock:
+            if self.peers.pop(peer.peer_id, None) is None:
+                return
+            self._pending_writes.discard(peer.peer_id)
+        self.selector.unregister(peer.socket)
+        peer.socket.close()
+        peer.receive_queue.put(None)
+        getLogger(__name__).debug("Peer {} disconnected."
+                                    .format(peer.peer_id))
+        if self.controller is not None:
+            self.controller.peer_disconnected(peer.peer_id)
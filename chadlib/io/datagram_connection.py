@@ -0,0 +1,353 @@
+from collections    import deque
+from logging        import getLogger
+from queue          import Empty
+from selectors      import DefaultSelector, EVENT_READ
+from socket         import (socket, timeout as SocketTimeout, AF_INET,
+                            SOCK_DGRAM, SO_REUSEADDR, SOL_SOCKET)
+from struct         import Struct
+from threading      import Lock
+from time           import monotonic
+
+from .connection    import Connection
+
+
+SEQ_MODULO = 2 ** 32    # sequence numbers wrap, compared as in RFC 1982
+
+def seq_after(seq, other):
+    """
+    Return True if sequence number seq comes after other, allowing for
+    wraparound.  Half of the sequence space ahead of other counts as after.
+    """
+    return 0 < (seq - other) % SEQ_MODULO < SEQ_MODULO // 2
+
+
+class Reliable(bytes):
+    """
+    Wrap data put on a DatagramConnection's send queue to have it delivered,
+    in order, rather than dropped when lost or superseded.
+    """
+    pass
+
+
+class DatagramConnection(Connection):
+    """
+    Connection over UDP, with the same controller and queue interface as
+    Connection, for real-time updates where the newest data matters more
+    than every piece of it.
+
+    Plain messages are numbered and delivered newest-wins:  a message lost
+    in the network is never resent, and one arriving after a newer message
+    is dropped as stale.  Messages wrapped in Reliable are acknowledged and
+    resent, with up to RELIABLE_WINDOW in flight, and delivered in order
+    among themselves.  Messages larger than MTU are fragmented, and a plain
+    message is lost if any of its fragments is.
+
+    Sequence numbers are 32 bits and wrap around, see seq_after.
+
+    The accepting side answers every hello from its peer, so a connecting
+    peer whose first answer was lost still connects when it retries.
+
+    Payloads are not compressed, FrameCodec is not used.
+    """
+
+    DATA = 0
+    RELIABLE = 1
+    ACK = 2
+    HELLO = 3
+    BYE = 4
+
+    PACKET_HEADER = Struct("!BIHH")     # kind, sequence, fragment, count
+
+    MTU = 1200      # payload that crosses IPv4 and IPv6 paths unfragmented
+    RELIABLE_WINDOW = 32
+    RETRANSMIT_TIMEOUT = 0.2
+    MAX_PARTIAL_MESSAGES = 64
+    MAX_DATAGRAM = 65535
+
+    def __init__(self, controller, send_queue, receive_queue):
+        """
+        Put the connection in an uninitialized, inactive, state.
+        """
+        super().__init__(controller, send_queue, receive_queue)
+        self.stale_dropped = 0
+        self.retransmitted = 0
+        self._accepted = False          # answers hellos from the peer
+        self._reliable_lock = Lock()
+        self._reset_streams()
+
+    def _reset_streams(self):
+        self._sent_seq = 0
+        self._newest_seq = 0
+        self._partials = {}             # sequence -> [fragments, remaining]
+        self._reliable_pending = deque()
+        self._reliable_seq = 0
+        self._unacked = {}              # sequence -> [packets, deadline]
+        self._expected_reliable = 1
+        self._reliable_partials = {}
+        self._reliable_received = {}    # out of order, sequence -> data
+
+    def _create_new_socket(self):
+        """
+        Return a UDP socket with the re-use option set.
+        """
+        sock = socket(AF_INET, SOCK_DGRAM)
+        sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, True)
+        return sock
+
+    def _listen(self, port):
+        getLogger(__name__).info("Waiting for connection...")
+        getLogger(__name__).debug("Listening on port:  {}".format(port))
+        listener = self._create_new_socket()
+        listener.bind(("", port))
+        listener.settimeout(self.SELECT_TIMEOUT_INTERVAL)
+        self.listener = listener
+
+    def _accept(self):
+        """
+        Wait for a peer's hello, then talk only to that peer.
+        """
+        listener = self.listener
+        hello = self._packet(self.HELLO, 0)
+        while listener is not None and self.listener is listener:
+            try:
+                data, addr = listener.recvfrom(self.MAX_DATAGRAM)
+            except SocketTimeout:
+                continue
+            except OSError:     # closed while waiting
+                break
+            if data == hello:
+                listener.connect(addr)
+                listener.send(hello)
+                self.listener = None
+                self._reset_streams()
+                self._accepted = True
+                self._set_socket(listener)
+                self._connection_made()
+                getLogger(__name__).info("Connection accepted.")
+                getLogger(__name__).debug("Connected to peer at {}:{}"
+                                            .format(addr[0], addr[1]))
+                return
+        getLogger(__name__).warning(("No connection was established."))
+
+    def _connect_with_backoff(self, port, ip_address, attempts):
+        """
+        Send hellos until the peer answers, waiting a growing, jittered,
+        time for each answer.
+        """
+        sock = self._create_new_socket()
+        sock.connect((ip_address, port))
+        hello = self._packet(self.HELLO, 0)
+        for i in range(attempts):
+            try:
+                sock.settimeout(self._backoff_delay(i))
+                sock.send(hello)
+                if sock.recv(self.MAX_DATAGRAM) == hello:
+                    self._reset_streams()
+                    self._accepted = False
+                    return sock
+            except OSError:     # timed out, or refused as nothing listens
+                getLogger(__name__).debug("Attempt {}/{} failed"
+                                            .format(i + 1, attempts))
+        sock.close()
+        return None
+
+    def close(self):
+        """
+        Tell the peer, then release resources held by the connection.
+        """
+        sock = self.socket
+        if sock is not None:
+            try:
+                sock.send(self._packet(self.BYE, 0))
+            except OSError:
+                pass
+        super().close()
+
+    def _packet(self, kind, seq, fragment = 0, count = 1, data = b""):
+        return self.PACKET_HEADER.pack(kind, seq, fragment, count) + data
+
+    def _fragments(self, kind, seq, data):
+        """
+        Split a message into packets of at most MTU bytes.
+        """
+        size = self.MTU - self.PACKET_HEADER.size
+        view = memoryview(data)
+        count = max(1, -(-len(view) // size))
+        return [self._packet(kind, seq, i, count, view[i * size:
+                                                        (i + 1) * size])
+                for i in range(count)]
+
+    def _send(self, sock):
+        """
+        Send queued messages as they arrive, resending unacknowledged
+        reliable messages when their time is up.
+        """
+        getLogger(__name__).debug("Send thread starting.")
+        while self.socket is sock:
+            try:
+                data = self.send_queue.get(timeout = self._next_deadline())
+            except Empty:
+                data = None
+            taken = monotonic()
+            try:
+                if isinstance(data, Reliable):
+                    with self._reliable_lock:
+                        self._reliable_pending.append(bytes(data))
+                elif data is not None:
+                    self._sent_seq = (self._sent_seq + 1) % SEQ_MODULO
+                    self._write(sock, self._fragments(self.DATA,
+                                                        self._sent_seq, data))
+                self._write(sock, self._reliable_packets_due())
+                if data is not None:
+                    self.metrics.messages_out += 1
+                    self.metrics.record_written(taken)
+            except Exception as err:
+                getLogger(__name__).warning(("Unexpected exception occurred,"
+                                " send thread may be in a corrupted state\n"
+                                "Error: {}".format(err)))
+        getLogger(__name__).debug("Send thread done.")
+
+    def _write(self, sock, packets):
+        for packet in packets:
+            try:
+                self.metrics.record_send(sock.send(packet))
+            except (BlockingIOError, ConnectionRefusedError):
+                pass    # lost like any datagram, resent if reliable
+
+    def _next_deadline(self):
+        """
+        Seconds until an unacknowledged message is due to be resent.
+        """
+        with self._reliable_lock:
+            if not self._unacked:
+                return None
+            deadline = min(d for _, d in self._unacked.values())
+        return max(0, deadline - monotonic())
+
+    def _reliable_packets_due(self):
+        """
+        Packets of new reliable messages that fit in the window, and of
+        those whose acknowledgement is overdue.
+        """
+        packets = []
+        now = monotonic()
+        with self._reliable_lock:
+            for entry in self._unacked.values():
+                if entry[1] <= now:
+                    packets.extend(entry[0])
+                    entry[1] = now + self.RETRANSMIT_TIMEOUT
+                    self.retransmitted += 1
+            while (self._reliable_pending and
+                    len(self._unacked) < self.RELIABLE_WINDOW):
+                self._reliable_seq = (self._reliable_seq + 1) % SEQ_MODULO
+                fragments = self._fragments(self.RELIABLE, self._reliable_seq,
+                                            self._reliable_pending.popleft())
+                self._unacked[self._reliable_seq] = [
+                                fragments, now + self.RETRANSMIT_TIMEOUT]
+                packets.extend(fragments)
+        return packets
+
+    def _receive(self, sock):
+        """
+        Read every datagram as it arrives, sleeping in the selector until
+        there is one or a wakeup.
+        """
+        selector = DefaultSelector()
+        selector.register(sock, EVENT_READ)
+        selector.register(self._wakeup_receiver, EVENT_READ)
+
+        getLogger(__name__).debug("Receive thread starting.")
+        while self.socket is sock:
+            try:
+                for key, _ in selector.select():
+                    if key.fileobj is self._wakeup_receiver:
+                        self._drain_wakeups(sock)
+                    elif self.socket is sock:
+                        self._read_packets(sock)
+            except Exception as err:
+                getLogger(__name__).warning(("Unexpected exception occurred,"
+                            " receive thread may be in a corrupted state\n"
+                            "Error: {}".format(err)))
+        selector.close()
+        getLogger(__name__).debug("Receive thread done.")
+
+    def _read_packets(self, sock):
+        while self.socket is sock:
+            try:
+                packet = sock.recv(self.MAX_DATAGRAM)
+            except (BlockingIOError, ConnectionRefusedError):
+                return
+            self.metrics.record_receive(len(packet), 1)
+            self._handle_packet(sock, packet)
+
+    def _handle_packet(self, sock, packet):
+        if len(packet) < self.PACKET_HEADER.size:
+            return
+        kind, seq, fragment, count = self.PACKET_HEADER.unpack_from(packet)
+        data = packet[self.PACKET_HEADER.size:]
+        if kind == self.DATA:
+            if not seq_after(seq, self._newest_seq):
+                self.stale_dropped += 1
+                return
+            message = self._add_fragment(self._partials, seq, fragment,
+                                            count, data)
+            if message is not None:
+                self._newest_seq = seq
+                for old in [s for s in self._partials if seq_after(seq, s)]:
+                    del self._partials[old]
+                self._deliver(message)
+        elif kind == self.RELIABLE:
+            if ((seq - self._expected_reliable) % SEQ_MODULO <
+                    self.RELIABLE_WINDOW):
+                message = self._add_fragment(self._reliable_partials, seq,
+                                                fragment, count, data)
+                if message is not None:
+                    self._reliable_received[seq] = message
+                    self._deliver_reliable()
+            self._write(sock, [self._packet(self.ACK,
+                            (self._expected_reliable - 1) % SEQ_MODULO)])
+        elif kind == self.ACK:
+            with self._reliable_lock:
+                for acked in [s for s in self._unacked
+                                if not seq_after(s, seq)]:
+                    del self._unacked[acked]
+                more = bool(self._reliable_pending)
+            if more:
+                self.send_queue.put(None)       # refill the window
+        elif kind == self.HELLO:
+            if self._accepted:          # our answer to the first was lost
+                self._write(sock, [self._packet(self.HELLO, 0)])
+        elif kind == self.BYE:
+            self._peer_closed()
+
+    def _add_fragment(self, partials, seq, fragment, count, data):
+        """
+        Store a fragment, returning the whole message once complete.
+        """
+        if count == 1:
+            return data
+        entry = partials.get(seq)
+        if entry is None:
+            if len(partials) >= self.MAX_PARTIAL_MESSAGES:
+                del partials[next(iter(partials))]      # the oldest
+            entry = partials[seq] = [[None] * count, count]
+        fragments = entry[0]
+        if fragment >= len(fragments) or fragments[fragment] is not None:
+            return None
+        fragments[fragment] = data
+        entry[1] -= 1
+        if entry[1]:
+            return None
+        del partials[seq]
+        return b"".join(fragments)
+
+    def _deliver_reliable(self):
+        while self._expected_reliable in self._reliable_received:
+            self._deliver(self._reliable_received.pop(
+                                                    self._expected_reliable))
+            self._expected_reliable = ((self._expected_reliable + 1) %
+                                        SEQ_MODULO)
+
+    def _deliver(self, message):
+        self.metrics.messages_in += 1
+        self._put_received(message)
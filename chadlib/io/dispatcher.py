@@ -0,0 +1,98 @@
+from collections        import deque
+from concurrent.futures import ThreadPoolExecutor
+from logging            import getLogger
+from threading          import BoundedSemaphore, Condition
+
+
+class Dispatcher:
+    """
+    Processes received messages on a pool of workers instead of one thread,
+    keeping order only where it matters.
+
+    key(data) names the ordering group of a message, for example its entity
+    or channel.  Messages with the same key are handled one at a time in the
+    order submitted, messages with different keys, or a key of None, run in
+    parallel.  Without a key function nothing is ordered.
+
+    The executor may be a ThreadPoolExecutor, the default, or a
+    ProcessPoolExecutor for CPU heavy decoding, in which case handler must
+    be picklable and its results come back through on_result(data, result),
+    called in this process and in key order.
+
+    At most max_in_flight messages are queued or running at once, submit
+    blocks beyond that so a slow handler pushes back on the connection.
+    """
+
+    def __init__(self, handler, key = None, executor = None,
+                    max_in_flight = 1024, on_result = None):
+        self.handler = handler
+        self.key = key
+        self.on_result = on_result
+        self._owns_executor = executor is None
+        self.executor = ThreadPoolExecutor() if executor is None else executor
+        self._slots = BoundedSemaphore(max_in_flight)
+        self._lock = Condition()
+        self._waiting = {}              # busy key -> deque of later messages
+        self._in_flight = 0
+
+    def submit(self, data):
+        """
+        Queue a message for processing, blocking while max_in_flight are.
+        """
+        self._slots.acquire()
+        key = None if self.key is None else self.key(data)
+        with self._lock:
+            self._in_flight += 1
+            if key is not None:
+                if key in self._waiting:
+                    self._waiting[key].append(data)
+                    return
+                self._waiting[key] = deque()
+        self._run(key, data)
+
+    def _run(self, key, data):
+        future = self.executor.submit(self.handler, data)
+        future.add_done_callback(lambda f: self._done(key, data, f))
+
+    def _done(self, key, data, future):
+        try:
+            result = future.result()
+            if self.on_result is not None:
+                self.on_result(data, result)
+        except Exception as err:
+            getLogger(__name__).warning("Message handler failed\nError: {}"
+                                        .format(err))
+        next_data = None
+        with self._lock:
+            if key is not None:
+                waiting = self._waiting[key]
+                if waiting:
+                    next_data = waiting.popleft()
+                else:
+                    del self._waiting[key]
+            self._in_flight -= 1
+            self._lock.notify_all()
+        self._slots.release()
+        if next_data is not None:
+            self._run(key, next_data)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def join(self, timeout = None):
+        """
+        Wait until every submitted message has been processed, returns False
+        on timeout.
+        """
+        with self._lock:
+            return self._lock.wait_for(lambda: not self._in_flight, timeout)
+
+    def close(self):
+        """
+        Finish the submitted messages, then shut down the executor if the
+        dispatcher created it.
+        """
+        self.join()
+        if self._owns_executor:
+            self.executor.shutdown()
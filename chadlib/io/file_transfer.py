@@ -0,0 +1,178 @@
+from hashlib        import sha1
+from logging        import getLogger
+from mmap           import mmap
+from os             import fstat, remove, replace
+from os.path        import basename, exists, getsize
+from socket         import create_connection
+from struct         import Struct
+
+
+OFFER = Struct("!4sQ16s")       # magic, file size, file token
+RESUME = Struct("!Q")           # offset the receiver already has
+DONE = Struct("!Q")             # bytes the receiver now has
+MAGIC = b"CHFT"
+
+DEFAULT_CHUNK_SIZE = 1048576
+
+PART_SUFFIX = ".part"
+OFFSET_SUFFIX = ".part.offset"
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Peer closed the file transfer.")
+        data += chunk
+    return bytes(data)
+
+
+class FileSender:
+    """
+    Sends one file over a dedicated, blocking, socket with socket.sendfile,
+    so the file is copied from the page cache to the socket by the kernel
+    rather than read into memory.
+
+    The receiver answers the offer with how much of the file it already has,
+    and only the rest is sent.  progress(sent, total) is called after every
+    chunk_size bytes.  Run it on its own thread, it blocks until the
+    receiver confirms it has the whole file.
+    """
+
+    def __init__(self, path, progress = None, chunk_size = DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.progress = progress
+        self.chunk_size = chunk_size
+
+    def send_to(self, port, ip_address):
+        """
+        Connect to a waiting FileReceiver and send the file.
+        """
+        with create_connection((ip_address, port)) as sock:
+            return self.send(sock)
+
+    def send(self, sock):
+        """
+        Send the file over a connected socket, returning how many bytes were
+        sent this time.
+        """
+        with open(self.path, "rb") as f:
+            stat = fstat(f.fileno())
+            size = stat.st_size
+            token = sha1("{}:{}:{}".format(basename(self.path), size,
+                                            stat.st_mtime_ns).encode())
+            sock.sendall(OFFER.pack(MAGIC, size, token.digest()[:16]))
+            offset, = RESUME.unpack(_recv_exactly(sock, RESUME.size))
+            if offset > size:
+                raise ValueError("Receiver asked to resume past the end.")
+            if offset:
+                getLogger(__name__).info("Resuming {} at {} of {} bytes"
+                                            .format(self.path, offset, size))
+
+            sent = offset
+            while sent < size:
+                count = min(self.chunk_size, size - sent)
+                written = sock.sendfile(f, sent, count)
+                if not written:
+                    raise EOFError("{} ended at {} of {} bytes, changed "
+                                    "while sending.".format(self.path, sent,
+                                                            size))
+                sent += written
+                if self.progress is not None:
+                    self.progress(sent, size)
+
+        received, = DONE.unpack(_recv_exactly(sock, DONE.size))
+        if received != size:
+            raise ConnectionError("Receiver has {} of {} bytes."
+                                    .format(received, size))
+        return size - offset
+
+
+class FileReceiver:
+    """
+    Receives a file from a FileSender straight into a preallocated,
+    memory-mapped, file so the data is never buffered in memory.
+
+    The file is written to path + PART_SUFFIX and moved to path once
+    complete.  The offset reached is recorded after every chunk, so a
+    transfer that is cut off resumes where it stopped when the same file is
+    sent again.  progress(received, total) is called after every chunk.
+    """
+
+    def __init__(self, path, progress = None, chunk_size = DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self.part_path = path + PART_SUFFIX
+        self.offset_path = path + OFFSET_SUFFIX
+
+    def receive_on(self, listener):
+        """
+        Accept one sender from a listening socket and receive its file.
+        """
+        sock, _ = listener.accept()
+        with sock:
+            return self.receive(sock)
+
+    def receive(self, sock):
+        """
+        Receive the file from a connected socket, returning its path.
+        """
+        magic, size, token = OFFER.unpack(_recv_exactly(sock, OFFER.size))
+        if magic != MAGIC:
+            raise ValueError("Peer is not sending a file.")
+        offset = self._resume_offset(token, size)
+        sock.sendall(RESUME.pack(offset))
+
+        mode = "r+b" if offset else "w+b"
+        with open(self.part_path, mode) as f:
+            f.truncate(size)
+            if size:
+                with mmap(f.fileno(), size) as mapped:
+                    try:
+                        offset = self._receive_into(sock, mapped, offset,
+                                                    size, token)
+                    finally:
+                        mapped.flush()
+
+        replace(self.part_path, self.path)
+        if exists(self.offset_path):
+            remove(self.offset_path)
+        sock.sendall(DONE.pack(offset))
+        return self.path
+
+    def _receive_into(self, sock, mapped, offset, size, token):
+        view = memoryview(mapped)
+        try:
+            while offset < size:
+                end = min(size, offset + self.chunk_size)
+                while offset < end:
+                    count = sock.recv_into(view[offset:end])
+                    if not count:
+                        raise ConnectionError("Transfer cut off at {} of {} "
+                                                "bytes.".format(offset, size))
+                    offset += count
+                self._record_offset(token, offset)
+                if self.progress is not None:
+                    self.progress(offset, size)
+        finally:
+            view.release()
+        return offset
+
+    def _resume_offset(self, token, size):
+        """
+        The offset reached by an earlier transfer of the same file, or 0.
+        """
+        if not (exists(self.offset_path) and exists(self.part_path) and
+                getsize(self.part_path) == size):
+            return 0
+        with open(self.offset_path, "rb") as f:
+            record = f.read()
+        if len(record) != 16 + RESUME.size or record[:16] != token:
+            return 0
+        return min(size, RESUME.unpack_from(record, 16)[0])
+
+    def _record_offset(self, token, offset):
+        with open(self.offset_path, "wb") as f:
+            f.write(token + RESUME.pack(offset))
@@ -0,0 +1,115 @@
+from struct     import Struct
+
+
+class FrameBuffer:
+    """
+    Growable receive buffer that reads from a socket with recv_into and
+    splits the bytes read into complete length-prefixed frames.
+
+    Partial frames stay in the buffer until the rest of their bytes arrive,
+    and every complete frame from a single read is decoded in one pass.
+    """
+
+    INITIAL_SIZE = 65536
+
+    def __init__(self, header_pack_str, initial_size = INITIAL_SIZE):
+        """
+        header_pack_str is the struct format of the frame header, its last
+        field must be the length of the payload that follows it.
+        """
+        self.header = Struct(header_pack_str)
+        self.buffer = bytearray(initial_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self):
+        """
+        Number of received bytes not yet returned as part of a frame.
+        """
+        return self.end - self.start
+
+    def recv_from(self, sock):
+        """
+        Read whatever the socket has available into the free space at the end
+        of the buffer, returning the number of bytes read.  Zero means the
+        peer closed the connection.
+
+        Errors from the socket, such as BlockingIOError, are not caught.
+        """
+        self._make_room()
+        count = sock.recv_into(self.view[self.end:])
+        self.end += count
+        return count
+
+    def feed(self, data):
+        """
+        Append bytes received by some other means.
+        """
+        needed = len(data)
+        if len(self.buffer) - self.end < needed:
+            self._resize(max(len(self.buffer), len(self) + needed))
+        self.view[self.end:self.end + needed] = data
+        self.end += needed
+
+    def frames(self):
+        """
+        Return a list of (header, payload) pairs for every complete frame in
+        the buffer, header being the unpacked header tuple.
+
+        Each payload is copied out of the buffer once, as bytes, so it stays 
+        valid after the buffer is reused by the next read.
+        """
+        result = []
+        header_size = self.header.size
+        start = self.start
+        end = self.end
+        while end - start >= header_size:
+            header = self.header.unpack_from(self.buffer, start)
+            frame_end = start + header_size + header[-1]
+            if frame_end > end:
+                break
+            result.append((header,
+                            bytes(self.view[start + header_size:frame_end])))
+            start = frame_end
+
+        if start == end:    # everything consumed, reuse the whole buffer
+            start = end = 0
+        self.start = start
+        self.end = end
+        return result
+
+    def payloads(self):
+        """
+        Return the payload of every complete frame in the buffer.
+        """
+        return [payload for _, payload in self.frames()]
+
+    def _make_room(self):
+        """
+        Ensure there is free space after the buffered bytes, by moving them
+        to the front of the buffer or growing it to fit a large frame.
+        """
+        needed = self.header.size
+        if len(self) >= self.header.size:
+            header = self.header.unpack_from(self.buffer, self.start)
+            needed = self.header.size + header[-1]
+
+        if len(self.buffer) - self.start < needed:
+            self._resize(max(len(self.buffer), needed))
+
+    def _resize(self, size):
+        """
+        Move the buffered bytes to the front of a buffer of the given size.
+        """
+        pending = len(self)
+        if size == len(self.buffer):
+            self.buffer[:pending] = bytes(self.view[self.start:self.end])
+        else:
+            buffer = bytearray(size)
+            buffer[:pending] = self.view[self.start:self.end]
+            self.view.release()
+            self.buffer = buffer
+            self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = pending
@@ -0,0 +1,146 @@
+from bz2        import compress as bz2_compress, decompress as bz2_decompress
+from lzma       import compress as lzma_compress, decompress as lzma_decompress
+from struct     import Struct, pack, unpack_from
+from zlib       import compress as zlib_compress, decompress as zlib_decompress
+
+
+class Codec:
+    """
+    A named payload compression scheme, identified on the wire by codec_id.
+    """
+
+    def __init__(self, codec_id, name, compress, decompress):
+        self.codec_id = codec_id
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+
+
+CODECS = {}
+
+def register_codec(codec):
+    """
+    Make a codec available to every connection, by ID and by name.  Both
+    peers must register a custom codec under the same ID.
+    """
+    if not 0 < codec.codec_id < 0x10000:
+        raise ValueError("Codec ID must fit in 16 bits and not be 0.")
+    CODECS[codec.codec_id] = codec
+    CODECS[codec.name] = codec
+
+register_codec(Codec(1, "zlib", zlib_compress, zlib_decompress))
+register_codec(Codec(2, "bz2", bz2_compress, bz2_decompress))
+register_codec(Codec(3, "lzma", lzma_compress, lzma_decompress))
+
+
+class FrameCodec:
+    """
+    Builds and reads the frame headers used by every connection type, and
+    compresses payloads with the codec agreed with the peer.
+
+    Each side opens with a handshake frame listing the codecs it can decode,
+    in its order of preference.  Payloads are then sent with the first codec
+    in our own preferences that the peer listed, and only when they are at
+    least COMPRESSION_THRESHOLD bytes and compression makes them smaller.
+    The codec used is recorded in each frame header, so the two directions
+    do not need to agree on one codec.
+
+    Heartbeat frames are consumed here too, each is passed to on_heartbeat,
+    when set, as (kind, stamp):  a PING carrying its sender's clock, or the
+    PONG echoing it.
+    """
+
+    HEADER_VERSION = 2
+    HEADER_PACK_STR = "IHHI"    # version, flags, codec, length
+    HEADER_SIZE = Struct(HEADER_PACK_STR).size
+
+    FLAG_HANDSHAKE = 0x1
+    FLAG_SHARED_MEMORY = 0x2        # payload locates data in shared memory
+    FLAG_SHARED_MEMORY_RING = 0x4   # payload names the peer's shared memory
+    FLAG_HEARTBEAT = 0x8            # payload is a HEARTBEAT
+
+    HEARTBEAT = Struct("!Bd")       # PING or PONG, sender's monotonic clock
+    PING = 0
+    PONG = 1
+
+    COMPRESSION_THRESHOLD = 1024
+
+    def __init__(self, codecs = ()):
+        """
+        codecs is a sequence of codec names or IDs in order of preference, an
+        empty sequence disables compression in both directions.
+        """
+        self.codecs = [CODECS[codec] for codec in codecs]
+        self.send_codec = None
+        self.on_heartbeat = None
+
+    def create_header(self, length, flags = 0, codec_id = 0):
+        return pack(self.HEADER_PACK_STR, self.HEADER_VERSION, flags,
+                    codec_id, length)
+
+    def handshake(self):
+        """
+        Return the buffers of the handshake frame advertising our codecs.
+        """
+        payload = pack("{}H".format(len(self.codecs)),
+                        *[codec.codec_id for codec in self.codecs])
+        return [self.create_header(len(payload), self.FLAG_HANDSHAKE), 
+                payload]
+
+    def heartbeat(self, kind, stamp):
+        """
+        Return the buffers of a heartbeat frame.
+        """
+        return [self.create_header(self.HEARTBEAT.size, self.FLAG_HEARTBEAT),
+                self.HEARTBEAT.pack(kind, stamp)]
+
+    def encode(self, data):
+        """
+        Return the header and payload buffers of the frame carrying data.
+        """
+        codec = self.send_codec
+        if codec is not None and len(data) >= self.COMPRESSION_THRESHOLD:
+            compressed = codec.compress(data)
+            if len(compressed) < len(data):
+                return [self.create_header(len(compressed), 0,
+                                            codec.codec_id), compressed]
+        return [self.create_header(len(data)), data]
+
+    def decode(self, header, payload):
+        """
+        Return the data carried by a received frame, or None for a handshake
+        or heartbeat frame, which is consumed here.
+
+        Raises ValueError for a frame from an incompatible protocol version
+        or compressed with a codec we did not advertise.
+        """
+        version, flags, codec_id, _ = header
+        if version != self.HEADER_VERSION:
+            raise ValueError("Unsupported frame version {}, expected {}."
+                                .format(version, self.HEADER_VERSION))
+        if flags & self.FLAG_HANDSHAKE:
+            self._read_handshake(payload)
+            return None
+        if flags & self.FLAG_HEARTBEAT:
+            if self.on_heartbeat is not None:
+                self.on_heartbeat(*self.HEARTBEAT.unpack(payload))
+            return None
+        if codec_id:
+            codec = CODECS.get(codec_id)
+            if codec is None or codec not in self.codecs:
+                raise ValueError("Frame uses unexpected codec {}."
+                                    .format(codec_id))
+            payload = codec.decompress(payload)
+        return payload
+
+    def _read_handshake(self, payload):
+        """
+        Pick the codec for sending from those the peer can decode.
+        """
+        count = len(payload) // 2
+        peer_codecs = set(unpack_from("{}H".format(count), payload))
+        self.send_codec = None
+        for codec in self.codecs:
+            if codec.codec_id in peer_codecs:
+                self.send_codec = codec
+                break
@@ -0,0 +1,224 @@
+from logging                       import getLogger
+from multiprocessing               import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from os                            import remove
+from os.path                       import exists, join
+from socket                        import socket, AF_UNIX
+from struct                        import Struct
+from tempfile                      import gettempdir
+
+from .connection                   import Connection
+from .frame_codec                  import FrameCodec
+
+
+_created_here = set()      # names of rings this process created
+
+
+class SharedRing:
+    """
+    Single producer, single consumer ring buffer of messages in a
+    multiprocessing.shared_memory block.
+
+    The producer writes each message contiguously and passes its position
+    and length to the consumer out of band.  The consumer copies messages
+    out in the order written and publishes how far it has read in the
+    block's first 8 bytes, which is all the producer needs to reuse space.
+    """
+
+    TAIL = Struct("Q")
+    DATA_START = 64     # keep the tail on its own cache line
+
+    def __init__(self, memory, owner):
+        self.memory = memory
+        self.owner = owner
+        self.capacity = memory.size - self.DATA_START
+        self.head = 0                   # producer's next position
+
+    @classmethod
+    def create(cls, size):
+        memory = SharedMemory(create = True, size = size + cls.DATA_START)
+        _created_here.add(memory.name)
+        return cls(memory, True)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Map a ring created by another connection, possibly in another process,
+        without letting this process' resource tracker remove it at exit.
+        """
+        try:
+            memory = SharedMemory(name, track = False)
+        except TypeError:       # before Python 3.13
+            memory = SharedMemory(name)
+            if name not in _created_here:
+                resource_tracker.unregister(memory._name, "shared_memory")
+        return cls(memory, False)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def _tail(self):
+        """
+        Read the consumer's position, twice so a torn read is never used.
+        """
+        while True:
+            first, = self.TAIL.unpack_from(self.memory.buf, 0)
+            second, = self.TAIL.unpack_from(self.memory.buf, 0)
+            if first == second:
+                return first
+
+    def write(self, data):
+        """
+        Copy data into the ring, returning its (position, length), or None if
+        there is not room for it now.
+        """
+        length = len(data)
+        offset = self.head % self.capacity
+        skip = 0
+        if offset + length > self.capacity:     # wrap to the start
+            skip = self.capacity - offset
+        if (length > self.capacity or
+                self.head + skip + length - self._tail() > self.capacity):
+            return None
+        position = self.head + skip
+        start = self.DATA_START + position % self.capacity
+        self.memory.buf[start:start + length] = data
+        self.head = position + length
+        return position, length
+
+    def read(self, position, length):
+        """
+        Copy out the message at position and release its space.
+        """
+        start = self.DATA_START + position % self.capacity
+        data = bytes(self.memory.buf[start:start + length])
+        self.TAIL.pack_into(self.memory.buf, 0, position + length)
+        return data
+
+    def close(self):
+        self.memory.close()
+        if self.owner:
+            _created_here.discard(self.memory.name)
+            self.memory.unlink()
+
+
+class SharedMemoryFrameCodec(FrameCodec):
+    """
+    Frame codec passing payloads of at least SHARED_MEMORY_THRESHOLD bytes
+    through shared memory, with only their location sent as the frame.
+    Payloads that do not fit in the ring are sent inline as usual.
+    """
+
+    DESCRIPTOR = Struct("!QQ")          # position, length
+
+    SHARED_MEMORY_THRESHOLD = 65536
+
+    def __init__(self, outgoing, codecs = ()):
+        super().__init__(codecs)
+        self.outgoing = outgoing
+        self.incoming = None
+
+    def handshake(self):
+        """
+        Follow the codec handshake with the name of our outgoing ring.
+        """
+        name = self.outgoing.name.encode()
+        return super().handshake() + [
+                self.create_header(len(name), self.FLAG_SHARED_MEMORY_RING),
+                name]
+
+    def encode(self, data):
+        if len(data) >= self.SHARED_MEMORY_THRESHOLD:
+            location = self.outgoing.write(data)
+            if location is not None:
+                return [self.create_header(self.DESCRIPTOR.size,
+                                            self.FLAG_SHARED_MEMORY),
+                        self.DESCRIPTOR.pack(*location)]
+        return super().encode(data)
+
+    def decode(self, header, payload):
+        flags = header[1]
+        if flags & self.FLAG_SHARED_MEMORY_RING:
+            self.close_incoming()
+            self.incoming = SharedRing.attach(bytes(payload).decode())
+            return None
+        if flags & self.FLAG_SHARED_MEMORY:
+            if self.incoming is None:
+                raise ValueError("Shared memory frame before the peer's ring.")
+            return self.incoming.read(*self.DESCRIPTOR.unpack(payload))
+        return super().decode(header, payload)
+
+    def close_incoming(self):
+        if self.incoming is not None:
+            self.incoming.close()
+            self.incoming = None
+
+
+class LocalConnection(Connection):
+    """
+    Connection between processes on the same host, over a Unix domain socket
+    with large payloads passed through shared memory.
+
+    Ports map to socket files in the temporary directory, or a path may be
+    given instead of a port, and the IP address to connect to is ignored.
+    Each side writes payloads of SHARED_MEMORY_THRESHOLD bytes or more into
+    its own SHARED_MEMORY_SIZE ring, so they are copied once into shared
+    memory and once out of it, never through the kernel.
+    """
+
+    SHARED_MEMORY_SIZE = 64 * 1048576
+    SOCKET_NAME = "chadlib-{}.sock"
+
+    def __init__(self, controller, send_queue, receive_queue):
+        super().__init__(controller, send_queue, receive_queue)
+        self._socket_path = None
+
+    def socket_path(self, port):
+        """
+        Path of the socket file for a port, or port itself if it is a path.
+        """
+        if isinstance(port, str):
+            return port
+        return join(gettempdir(), self.SOCKET_NAME.format(port))
+
+    def _create_new_socket(self):
+        return socket(AF_UNIX)
+
+    def _listen_address(self, port):
+        path = self.socket_path(port)
+        if exists(path):                # left by a process that died
+            remove(path)
+        self._socket_path = path
+        return path
+
+    def _peer_address(self, port, ip_address):
+        return self.socket_path(port)
+
+    def _format_address(self, addr):
+        return self._socket_path
+
+    def _close_listener(self):
+        super()._close_listener()
+        path = self._socket_path
+        self._socket_path = None
+        if path is not None and exists(path):
+            remove(path)
+
+    def _set_socket(self, socket):
+        super()._set_socket(socket)
+        self.frame_codec = SharedMemoryFrameCodec(
+                                SharedRing.create(self.SHARED_MEMORY_SIZE),
+                                self.COMPRESSION_CODECS)
+
+    def _close_socket(self):
+        """
+        Release the shared memory once the threads using it have stopped.
+        """
+        codec = self.frame_codec
+        closed = super()._close_socket()
+        if closed and isinstance(codec, SharedMemoryFrameCodec):
+            codec.close_incoming()
+            codec.outgoing.close()
+            getLogger(__name__).debug("Shared memory released.")
+        return closed
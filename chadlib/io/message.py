@@ -0,0 +1,124 @@
+from collections    import namedtuple
+from struct         import Struct
+
+
+class MessageType:
+    """
+    A fixed-layout binary message, declared once as a list of (name, format)
+    fields using struct format characters.
+
+    The fields compile to a single cached struct.Struct, prefixed by the
+    type ID, and decode straight from any buffer without slicing it.
+    """
+
+    BYTE_ORDER = "!"
+    TYPE_ID_FORMAT = "H"
+
+    def __init__(self, type_id, name, fields):
+        self.type_id = type_id
+        self.name = name
+        self.field_names = [field_name for field_name, _ in fields]
+        self.struct = Struct(self.BYTE_ORDER + self.TYPE_ID_FORMAT +
+                                "".join(fmt for _, fmt in fields))
+        self.size = self.struct.size
+        self.tuple_class = namedtuple(name, self.field_names)
+
+    def encode(self, *args, **kwargs):
+        """
+        Return the bytes of a message with the given field values.
+        """
+        return self.struct.pack(self.type_id,
+                                *self.tuple_class(*args, **kwargs))
+
+    def encode_into(self, buffer, offset, *args, **kwargs):
+        """
+        Write a message into a writable buffer at offset, returning the
+        offset just past it.
+        """
+        self.struct.pack_into(buffer, offset, self.type_id,
+                                *self.tuple_class(*args, **kwargs))
+        return offset + self.size
+
+    def decode(self, buffer, offset = 0):
+        """
+        Return the message at offset in the buffer as a named tuple.
+        """
+        return self.tuple_class._make(
+                                self.struct.unpack_from(buffer, offset)[1:])
+
+
+class MessageRegistry:
+    """
+    Set of message types known to both peers, with handlers dispatched by
+    type ID.
+
+    A frame may hold a single message or several packed back to back, so
+    dispatch can be used directly as process_received_data.
+    """
+
+    def __init__(self):
+        self.types = {}
+        self.handlers = {}
+        self._type_id = Struct(MessageType.BYTE_ORDER +
+                                MessageType.TYPE_ID_FORMAT)
+
+    def register(self, type_id, name, fields, handler = None):
+        """
+        Declare a message type, returning it for encoding.
+        """
+        if type_id in self.types or name in self.types:
+            raise ValueError("Message type {} ({}) is already registered."
+                                .format(name, type_id))
+        message_type = MessageType(type_id, name, fields)
+        self.types[type_id] = message_type
+        self.types[name] = message_type
+        if handler is not None:
+            self.set_handler(name, handler)
+        return message_type
+
+    def set_handler(self, type_key, handler):
+        """
+        Call handler(message) for every received message of the type, given
+        by name or ID.
+        """
+        self.handlers[self.types[type_key].type_id] = handler
+
+    def encode(self, type_key, *args, **kwargs):
+        return self.types[type_key].encode(*args, **kwargs)
+
+    def encode_many(self, messages):
+        """
+        Pack several (type_key, values) pairs into one bytes object.
+        """
+        message_types = [(self.types[type_key], values)
+                            for type_key, values in messages]
+        buffer = bytearray(sum(message_type.size
+                                for message_type, _ in message_types))
+        offset = 0
+        for message_type, values in message_types:
+            offset = message_type.encode_into(buffer, offset, *values)
+        return bytes(buffer)
+
+    def decode(self, data):
+        """
+        Yield (message_type, message) for every message in the data.
+        """
+        view = memoryview(data)
+        offset = 0
+        while offset < len(view):
+            type_id, = self._type_id.unpack_from(view, offset)
+            message_type = self.types.get(type_id)
+            if message_type is None:
+                raise ValueError("Unknown message type {}.".format(type_id))
+            yield message_type, message_type.decode(view, offset)
+            offset += message_type.size
+
+    def dispatch(self, data):
+        """
+        Decode the data and pass each message to its type's handler, messages
+        without a handler are dropped.
+        """
+        for message_type, message in self.decode(data):
+            handler = self.handlers.get(message_type.type_id)
+            if handler is not None:
+                handler(message)
@@ -0,0 +1,183 @@
+from bisect     import bisect_left
+from logging    import getLogger
+from threading  import Event, Thread
+from time       import monotonic
+
+
+class Histogram:
+    """
+    Fixed, power of two bucketed histogram of durations in seconds.
+    """
+
+    BOUNDS = [2 ** i / 1e6 for i in range(32)]    # 1us to about 36 minutes
+    BUCKET_COUNT = len(BOUNDS)
+
+    def __init__(self):
+        self.buckets = [0] * (self.BUCKET_COUNT + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.buckets[bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """
+        Upper bound of the bucket holding the p-th percentile, 0 to 100.
+        """
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100
+        seen = 0
+        for bound, count in zip(self.BOUNDS, self.buckets):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {"count" : self.count,
+                "mean" : self.total / self.count if self.count else 0.0,
+                "p50" : self.percentile(50),
+                "p99" : self.percentile(99),
+                "max" : self.max}
+
+
+class ConnectionMetrics:
+    """
+    Counters and histograms describing the traffic of one connection.
+
+    Each counter is only written by one of the connection's threads, reads
+    through snapshot may be slightly out of date but never block them.
+
+    send_time holds how long messages took from the send thread taking them
+    off the send queue until their bytes were written.  Time spent waiting
+    on the queue itself shows as send_queue_depth instead, the queue belongs
+    to the caller and is not instrumented.
+
+    Round trip times measured by heartbeats are smoothed as TCP does, see
+    record_rtt, rtt and rtt_variance stay None until the first sample.
+    """
+
+    RTT_ALPHA = 1 / 8       # RFC 6298 gains
+    RTT_BETA = 1 / 4
+
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.frames_in = 0
+        self.messages_in = 0
+        self.messages_out = 0
+        self.recv_calls = 0
+        self.send_calls = 0
+        self.send_time = Histogram()
+        self.rtt = None
+        self.rtt_variance = None
+        self.rtt_histogram = Histogram()
+        self.send_queue = None
+        self.receive_queue = None
+        self._started = monotonic()
+        self._log_stop = None
+
+    def watch_queues(self, send_queue, receive_queue):
+        """
+        Report the depth of both queues in snapshots.
+        """
+        self.send_queue = send_queue
+        self.receive_queue = receive_queue
+
+    def record_receive(self, byte_count, frame_count):
+        self.recv_calls += 1
+        self.bytes_in += byte_count
+        self.frames_in += frame_count
+
+    def record_send(self, byte_count):
+        self.send_calls += 1
+        self.bytes_out += byte_count
+
+    def record_written(self, taken, count = 1):
+        """
+        Record count messages taken off the send queue at monotonic time
+        taken as written.
+        """
+        wait = monotonic() - taken
+        for _ in range(count):
+            self.send_time.record(wait)
+
+    def record_rtt(self, sample):
+        """
+        Fold a round trip time sample into the smoothed RTT and its mean
+        deviation.
+        """
+        self.rtt_histogram.record(sample)
+        if self.rtt is None:
+            self.rtt = sample
+            self.rtt_variance = sample / 2
+        else:
+            self.rtt_variance += self.RTT_BETA * (abs(self.rtt - sample) -
+                                                    self.rtt_variance)
+            self.rtt += self.RTT_ALPHA * (sample - self.rtt)
+
+    def rtt_timeout(self, minimum = 0.0):
+        """
+        Time after which a reply is overdue, the smoothed RTT plus four mean
+        deviations, or None before any sample.
+        """
+        if self.rtt is None:
+            return None
+        return max(minimum, self.rtt + 4 * self.rtt_variance)
+
+    def snapshot(self):
+        """
+        Return a dictionary of the current counters and derived rates.
+        """
+        elapsed = max(monotonic() - self._started, 1e-9)
+        return {"elapsed" : elapsed,
+                "bytes_in" : self.bytes_in,
+                "bytes_out" : self.bytes_out,
+                "frames_in" : self.frames_in,
+                "messages_in" : self.messages_in,
+                "messages_out" : self.messages_out,
+                "recv_calls" : self.recv_calls,
+                "send_calls" : self.send_calls,
+                "frames_per_recv" : (self.frames_in / self.recv_calls
+                                        if self.recv_calls else 0.0),
+                "frames_per_send" : (self.messages_out / self.send_calls
+                                        if self.send_calls else 0.0),
+                "bytes_in_per_second" : self.bytes_in / elapsed,
+                "bytes_out_per_second" : self.bytes_out / elapsed,
+                "send_queue_depth" : self._depth(self.send_queue),
+                "receive_queue_depth" : self._depth(self.receive_queue),
+                "send_time" : self.send_time.snapshot(),
+                "rtt" : self.rtt,
+                "rtt_variance" : self.rtt_variance,
+                "rtt_samples" : self.rtt_histogram.snapshot()}
+
+    def _depth(self, queue):
+        try:
+            return queue.qsize()
+        except (AttributeError, NotImplementedError, TypeError):
+            return None
+
+    def start_logging(self, interval, name = __name__):
+        """
+        Log a snapshot at info level every interval seconds until
+        stop_logging is called.
+        """
+        self.stop_logging()
+        stop = Event()
+        def f():
+            while not stop.wait(interval):
+                getLogger(name).info("Connection metrics:  {}"
+                                        .format(self.snapshot()))
+        self._log_stop = stop
+        Thread(target = f, name = "ConnectionMetrics", daemon = True).start()
+
+    def stop_logging(self):
+        if self._log_stop is not None:
+            self._log_stop.set()
+            self._log_stop = None
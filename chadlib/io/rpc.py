@@ -0,0 +1,196 @@
+from asyncio            import wrap_future
+from concurrent.futures import Future
+from heapq              import heappop, heappush
+from logging            import getLogger
+from struct             import Struct
+from threading          import Condition, Lock, Thread
+from time               import monotonic
+
+
+class RpcError(Exception):
+    """
+    A call failed on the remote side, or could not complete.
+    """
+    pass
+
+
+class RpcTimeout(RpcError, TimeoutError):
+    """
+    No response arrived within the call's timeout.
+    """
+    pass
+
+
+class RpcEndpoint:
+    """
+    Request/response calls over a connection's queues, any number of which
+    may be in flight at once.
+
+    Each request carries a correlation ID that its response echoes, so
+    responses are matched to calls in whatever order they arrive.  Calls
+    return concurrent.futures.Future objects, or asyncio futures through
+    call_async.  Both sides of a connection are usually endpoints, calling
+    and serving over the same queues.
+
+    The endpoint owns the connection's traffic, pass every received payload
+    to process_received_data, which can be used directly as a controller's
+    process_received_data.
+    """
+
+    REQUEST = 0
+    RESPONSE = 1
+    ERROR = 2
+
+    REQUEST_HEADER = Struct("!BIB")     # kind, call ID, method name length
+    RESPONSE_HEADER = Struct("!BI")     # kind, call ID
+
+    MAX_CALL_ID = 0xFFFFFFFF
+
+    def __init__(self, send_queue, executor = None):
+        """
+        Responses and requests are put on send_queue.  Handlers run on the
+        thread calling process_received_data, or on the executor if given.
+        """
+        self.send_queue = send_queue
+        self.executor = executor
+        self.handlers = {}
+        self._pending = {}              # call ID -> Future
+        self._next_id = 0
+        self._lock = Lock()
+        self._deadlines = []            # heap of (deadline, call ID)
+        self._deadlines_changed = Condition(self._lock)
+        self._timeout_thread = None
+        self._closed = False
+
+    def register(self, method, handler):
+        """
+        Serve calls to method with handler(data), which returns the response
+        bytes or raises to send back an error.
+        """
+        if len(method.encode()) > 255:
+            raise ValueError("Method name is too long:  {}".format(method))
+        self.handlers[method] = handler
+
+    def call(self, method, data = b"", timeout = None):
+        """
+        Send a request, returning a Future for the response bytes.  The
+        future fails with RpcError if the handler raised, or RpcTimeout if no
+        response arrived within timeout seconds.
+        """
+        name = method.encode()
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RpcError("Endpoint is closed.")
+            call_id = self._next_id
+            self._next_id = (self._next_id + 1) & self.MAX_CALL_ID
+            self._pending[call_id] = future
+            if timeout is not None:
+                self._add_deadline(monotonic() + timeout, call_id)
+        self.send_queue.put(self.REQUEST_HEADER.pack(self.REQUEST, call_id,
+                                                        len(name)) +
+                            name + data)
+        return future
+
+    def call_async(self, method, data = b"", timeout = None):
+        """
+        As call, but return an asyncio future on the running loop.
+        """
+        return wrap_future(self.call(method, data, timeout))
+
+    def process_received_data(self, data):
+        """
+        Serve a request, or complete the call a response belongs to.
+        """
+        kind = data[0]
+        if kind == self.REQUEST:
+            _, call_id, name_length = self.REQUEST_HEADER.unpack_from(data)
+            start = self.REQUEST_HEADER.size
+            method = bytes(data[start:start + name_length]).decode()
+            body = data[start + name_length:]
+            if self.executor is None:
+                self._serve(call_id, method, body)
+            else:
+                self.executor.submit(self._serve, call_id, method, body)
+        elif kind in (self.RESPONSE, self.ERROR):
+            _, call_id = self.RESPONSE_HEADER.unpack_from(data)
+            with self._lock:
+                future = self._pending.pop(call_id, None)
+            if future is None or future.done():     # timed out or cancelled
+                return
+            body = data[self.RESPONSE_HEADER.size:]
+            if kind == self.RESPONSE:
+                future.set_result(body)
+            else:
+                future.set_exception(RpcError(bytes(body).decode()))
+        else:
+            raise ValueError("Unknown RPC message kind {}.".format(kind))
+
+    def _serve(self, call_id, method, body):
+        handler = self.handlers.get(method)
+        try:
+            if handler is None:
+                raise RpcError("No handler for method {}.".format(method))
+            response = self.RESPONSE_HEADER.pack(self.RESPONSE, call_id) + \
+                        handler(body)
+        except Exception as err:
+            getLogger(__name__).debug("Call to {} failed:  {}"
+                                        .format(method, err))
+            response = self.RESPONSE_HEADER.pack(self.ERROR, call_id) + \
+                        "{}: {}".format(type(err).__name__, err).encode()
+        self.send_queue.put(response)
+
+    def close(self, reason = "Endpoint closed."):
+        """
+        Fail every outstanding call, for example once the connection is
+        lost, and refuse new ones.
+        """
+        with self._lock:
+            self._closed = True
+            pending = self._pending
+            self._pending = {}
+            self._deadlines.clear()
+            self._deadlines_changed.notify()
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(RpcError(reason))
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    def _add_deadline(self, deadline, call_id):
+        """
+        Track a deadline, with the lock held.  A single thread per endpoint
+        expires calls in deadline order.
+        """
+        heappush(self._deadlines, (deadline, call_id))
+        if self._timeout_thread is None:
+            self._timeout_thread = Thread(target = self._expire_calls,
+                                            name = "RpcTimeouts",
+                                            daemon = True)
+            self._timeout_thread.start()
+        elif self._deadlines[0][1] == call_id:
+            self._deadlines_changed.notify()
+
+    def _expire_calls(self):
+        with self._lock:
+            while not self._closed:
+                if not self._deadlines:
+                    self._deadlines_changed.wait()
+                    continue
+                deadline, call_id = self._deadlines[0]
+                remaining = deadline - monotonic()
+                if remaining > 0:
+                    self._deadlines_changed.wait(remaining)
+                    continue
+                heappop(self._deadlines)
+                future = self._pending.pop(call_id, None)
+                if future is not None and not future.done():
+                    self._lock.release()
+                    try:
+                        future.set_exception(RpcTimeout(
+                                "No response within the call's timeout."))
+                    finally:
+                        self._lock.acquire()
+            self._timeout_thread = None
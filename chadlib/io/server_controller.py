@@ -0,0 +1,22 @@
+from abc                import ABC, abstractmethod
+
+
+class ServerController(ABC):
+    """
+    Companion class to the connection server, specifies the interface 
+    required for a controller to be told about its peers.
+    """
+
+    @abstractmethod
+    def peer_connected(self, peer_id):
+        """
+        Overridden by subclasses to trigger logic when a peer connects.
+        """
+        pass
+
+    def peer_disconnected(self, peer_id):
+        """
+        Can be overridden by subclass as a hook to act when a peer 
+        disconnects or is disconnected.
+        """
+        pass
@@ -0,0 +1,365 @@
+from collections    import deque
+from logging        import getLogger
+from struct         import Struct
+from threading      import Event, Lock, Thread, Timer
+from time           import monotonic
+from uuid           import uuid4
+
+from .connection    import Connection
+
+
+class _Signal:
+    """
+    Marker put on the send queue to wake the send thread, sized 0 so queue
+    limits and batching ignore it.
+    """
+
+    def __len__(self):
+        return 0
+
+_WAKE = _Signal()
+
+
+class SessionConnection(Connection):
+    """
+    Connection that survives brief drops of the underlying socket.
+
+    Every message carries a sequence number and stays in a bounded
+    retransmit buffer until the peer acknowledges it.  When the socket drops,
+    the connecting side reconnects with jittered exponential backoff and the
+    accepting side listens again for up to RESUME_TIMEOUT seconds.  Both then
+    exchange a hello naming their sessions and the last message received, and
+    replay only what the other side missed.  Closing sends a goodbye first,
+    so the peer disconnects at once instead of waiting to resume.
+
+    Received messages are acknowledged every ACK_INTERVAL messages, or
+    ACK_DELAY seconds after the first unacknowledged one, so a peer that
+    goes quiet still has its retransmit buffer trimmed.
+
+    If the session cannot be resumed, because the peer started a new session
+    or the messages it missed no longer fit in the retransmit buffer, the
+    controller's session_reset hook is called so the application can
+    resynchronize its state.
+    """
+
+    DATA = 0
+    ACK = 1
+    HELLO = 2
+    GOODBYE = 3
+
+    DATA_HEADER = Struct("!BQ")         # kind, sequence
+    ACK_MESSAGE = Struct("!BQ")         # kind, sequence
+    HELLO_MESSAGE = Struct("!B16s16sQ") # kind, session, peer session, received
+    GOODBYE_MESSAGE = Struct("!B")
+
+    NO_SESSION = bytes(16)
+
+    ACK_INTERVAL = 32
+    ACK_DELAY = 0.2
+    RETRANSMIT_MAX_MESSAGES = 4096
+    RETRANSMIT_MAX_BYTES = 16777216
+    RECONNECT_ATTEMPTS = 8
+    RESUME_TIMEOUT = 30.0
+    GOODBYE_TIMEOUT = 1.0
+
+    def __init__(self, controller, send_queue, receive_queue):
+        """
+        Put the connection in an uninitialized, inactive, state with a new
+        session.
+        """
+        super().__init__(controller, send_queue, receive_queue)
+        self.session_id = uuid4().bytes
+        self.peer_session_id = self.NO_SESSION
+        self.sent_seq = 0
+        self.received_seq = None        # None accepts any next sequence
+        self.retransmit = deque()       # (sequence, payload)
+        self.retransmit_bytes = 0
+
+        self._session_lock = Lock()
+        self._control = deque()
+        self._peer_ready = False
+        self._unacked_count = 0
+        self._ack_due = None            # when received messages need an ack
+        self._closed = False
+        self._goodbye = None
+        self._goodbye_sending = None
+        self._peer_left = False
+        self._resume_target = None
+        self._resume_timer = None
+        self._resuming = False
+
+    def startup_accept(self, port):
+        self._closed = False
+        self._resume_target = (self._relisten, (port,))
+        super().startup_accept(port)
+
+    def startup_connect(self, port, ip_address):
+        self._closed = False
+        self._resume_target = (self._reconnect, (port, ip_address))
+        super().startup_connect(port, ip_address)
+
+    def close(self):
+        """
+        Release resources held by the connection and stop any attempt to
+        resume the session.
+        """
+        self._say_goodbye()
+        with self._session_lock:
+            self._closed = True
+        self._cancel_resume_timer()
+        self._close_listener()
+        if self._close_socket() or self._resuming:
+            self._resuming = False
+            self.metrics.stop_logging()
+            self.receive_queue.put(None)    # release the processing thread
+
+            getLogger(__name__).info("Connection closed.")
+
+    def _connection_made(self):
+        """
+        Only a new connection starts the controller's processing, a resumed
+        one carries on with the same queues.
+        """
+        self._peer_left = False
+        if self._resuming:
+            self._resuming = False
+            self._cancel_resume_timer()
+            self.start()
+            getLogger(__name__).info("Session resumed.")
+        else:
+            super()._connection_made()
+
+    def _opening_buffers(self):
+        """
+        Follow the codec handshake with our session hello.
+        """
+        received = self.received_seq if self.received_seq is not None else 0
+        hello = self.HELLO_MESSAGE.pack(self.HELLO, self.session_id,
+                                        self.peer_session_id, received)
+        return super()._opening_buffers() + self.frame_codec.encode(hello)
+
+    def _get_batch_from_send_queue(self):
+        """
+        Number the new messages and keep them for retransmission.  Until the
+        peer's hello arrives they are only buffered, the hello decides what
+        needs to be sent.
+        """
+        batch = super()._get_batch_from_send_queue()
+        with self._session_lock:
+            payloads = list(self._control)
+            self._control.clear()
+            if self._goodbye is not None and self._goodbye_sending is None:
+                self._goodbye_sending = self._goodbye
+            for data in batch:
+                if data is _WAKE:
+                    continue
+                self.sent_seq += 1
+                payload = self.DATA_HEADER.pack(self.DATA,
+                                                self.sent_seq) + data
+                self._keep_for_retransmit(self.sent_seq, payload)
+                if self._peer_ready:
+                    payloads.append(payload)
+        return payloads
+
+    def _send_buffers(self, sock, buffers, selector):
+        """
+        Let close know once the goodbye has been written.
+        """
+        goodbye = self._goodbye_sending
+        super()._send_buffers(sock, buffers, selector)
+        if goodbye is not None:
+            goodbye.set()
+
+    def _say_goodbye(self):
+        """
+        Tell a connected peer this side is closing, waiting briefly for the
+        send thread to write it.
+        """
+        with self._session_lock:
+            if self._closed or not self.active or not self._peer_ready:
+                return
+            self._goodbye = Event()
+            self._control.append(self.GOODBYE_MESSAGE.pack(self.GOODBYE))
+        self._wake_send_thread()
+        self._goodbye.wait(self.GOODBYE_TIMEOUT)
+
+    def _keep_for_retransmit(self, seq, payload):
+        self.retransmit.append((seq, payload))
+        self.retransmit_bytes += len(payload)
+        while (len(self.retransmit) > self.RETRANSMIT_MAX_MESSAGES or
+                self.retransmit_bytes > self.RETRANSMIT_MAX_BYTES):
+            self._drop_oldest_retransmit()
+
+    def _drop_oldest_retransmit(self):
+        _, payload = self.retransmit.popleft()
+        self.retransmit_bytes -= len(payload)
+
+    def _acknowledged(self, seq):
+        while self.retransmit and self.retransmit[0][0] <= seq:
+            self._drop_oldest_retransmit()
+
+    def _put_received(self, data):
+        """
+        Handle session messages, delivering data in order and dropping
+        duplicates replayed after a resume.
+        """
+        kind = data[0]
+        if kind == self.DATA:
+            _, seq = self.DATA_HEADER.unpack_from(data)
+            if self.received_seq is not None:
+                if seq <= self.received_seq:
+                    return
+                if seq != self.received_seq + 1:
+                    getLogger(__name__).warning("Session skipped from {} to {}"
+                                            .format(self.received_seq, seq))
+            self.received_seq = seq
+            super()._put_received(data[self.DATA_HEADER.size:])
+            self._unacked_count += 1
+            if self._unacked_count >= self.ACK_INTERVAL:
+                self._send_ack()
+            elif self._ack_due is None:
+                self._ack_due = monotonic() + self.ACK_DELAY
+        elif kind == self.ACK:
+            _, seq = self.ACK_MESSAGE.unpack_from(data)
+            with self._session_lock:
+                self._acknowledged(seq)
+        elif kind == self.HELLO:
+            self._read_hello(*self.HELLO_MESSAGE.unpack_from(data)[1:])
+        elif kind == self.GOODBYE:
+            self._peer_left = True
+
+    def _send_ack(self):
+        self._unacked_count = 0
+        self._ack_due = None
+        if self.received_seq is not None:   # None after a session reset
+            self._send_control([self.ACK_MESSAGE.pack(self.ACK,
+                                                        self.received_seq)])
+
+    def _check_heartbeat(self, paused):
+        """
+        Also send an ack that has waited ACK_DELAY, on the receive thread's
+        regular checks.
+        """
+        super()._check_heartbeat(paused)
+        if self._ack_due is not None and monotonic() >= self._ack_due:
+            self._send_ack()
+
+    def _heartbeat_wait(self):
+        """
+        Wake the receive thread in time for a delayed ack too.
+        """
+        wait = super()._heartbeat_wait()
+        if self._ack_due is not None:
+            ack_wait = max(0, self._ack_due - monotonic())
+            wait = ack_wait if wait is None else min(wait, ack_wait)
+        return wait
+
+    def _read_hello(self, sender_id, known_id, last_received):
+        """
+        Resume the session if the peer is the one we had and we still hold
+        everything it missed, otherwise start over with it.
+        """
+        reset = False
+        with self._session_lock:
+            resumable = (known_id == self.session_id and
+                            sender_id == self.peer_session_id)
+            if resumable and self.retransmit:
+                resumable = self.retransmit[0][0] <= last_received + 1
+            elif resumable:
+                resumable = self.sent_seq <= last_received
+
+            if resumable:
+                self._acknowledged(last_received)
+            else:
+                reset = self.peer_session_id != self.NO_SESSION
+                self.peer_session_id = sender_id
+                self.received_seq = None
+                if reset:       # what the old session missed is obsolete
+                    self.retransmit.clear()
+                    self.retransmit_bytes = 0
+            self._control.extend(payload for _, payload in self.retransmit)
+            self._peer_ready = True
+        self._wake_send_thread()
+
+        if reset:
+            getLogger(__name__).warning("Session could not be resumed.")
+            if hasattr(self.controller, "session_reset"):
+                self.controller.session_reset()
+
+    def _send_control(self, payloads):
+        with self._session_lock:
+            self._control.extend(payloads)
+        self._wake_send_thread()
+
+    def _wake_send_thread(self):
+        getattr(self.send_queue, "force_put", self.send_queue.put)(_WAKE)
+
+    def _peer_closed(self):
+        """
+        Try to resume the session instead of disconnecting.
+        """
+        if self._closed or self._peer_left or self._resume_target is None:
+            super()._peer_closed()
+            return
+
+        getLogger(__name__).info("Connection lost, resuming session...")
+        with self._session_lock:
+            if self._closed:
+                return
+            self._resuming = True       # close now releases the queue
+            self._peer_ready = False
+            self._control.clear()
+        self._unacked_count = 0
+        self._ack_due = None
+        self._close_socket()
+        self._close_listener()
+        with self._session_lock:
+            if self._closed:
+                return
+            target, args = self._resume_target
+            try:
+                target(*args)
+            except OSError as err:
+                getLogger(__name__).warning("Could not resume session\n"
+                                            "Error: {}".format(err))
+                Thread(target = self._resume_failed).start()
+
+    def _relisten(self, port):
+        """
+        Listen again for the peer, giving up after RESUME_TIMEOUT.  The
+        listener is opened here, under the session lock, so close always
+        finds it.
+        """
+        self._listen(port)
+        self._resume_timer = Timer(self.RESUME_TIMEOUT, self._resume_failed)
+        self._resume_timer.daemon = True
+        self._resume_timer.start()
+        Thread(target = self._accept).start()
+
+    def _reconnect(self, port, ip_address):
+        Thread(target = self._connect_again, args = (port, ip_address)).start()
+
+    def _connect_again(self, port, ip_address):
+        """
+        Connect to the peer again, with backoff, to resume the session.
+        """
+        conn = self._connect_with_backoff(port, ip_address,
+                                            self.RECONNECT_ATTEMPTS)
+        if conn is not None and not self._closed:
+            self._set_socket(conn)
+            self._connection_made()
+        else:
+            if conn is not None:
+                conn.close()
+            self._resume_failed()
+
+    def _resume_failed(self):
+        if not self._closed and not self.active:
+            getLogger(__name__).warning("Session could not be resumed.")
+            self.controller.disconnect()
+            self.close()
+
+    def _cancel_resume_timer(self):
+        if self._resume_timer is not None:
+            self._resume_timer.cancel()
+            self._resume_timer = None
@@ -0,0 +1,306 @@
+from heapq          import heappop, heappush
+from itertools      import count
+from logging        import getLogger
+from queue          import Empty
+from random         import Random
+from threading      import Condition, Thread
+from time           import monotonic
+
+from .metrics       import ConnectionMetrics
+
+
+_CLOSE = object()       # delivered after the data sent before a close
+
+
+class _Link:
+    """
+    One direction between two simulated connections.
+    """
+
+    def __init__(self, receiver):
+        self.receiver = receiver
+        self.busy_until = 0.0           # end of the last transmission
+        self.last_arrival = 0.0
+
+
+class SimulatedNetwork:
+    """
+    In-memory network carrying SimulatedConnections, with configurable
+    latency, jitter, bandwidth, loss and reordering.
+
+    Each message leaves when its link has finished sending earlier ones at
+    bandwidth bytes per second, and arrives latency seconds later, plus or
+    minus up to jitter.  On an ordered link, like TCP, a lost message is
+    delivered retransmit_timeout late and holds back everything behind it,
+    and nothing is reordered.  On an unordered link, like UDP, lost messages
+    never arrive, and jitter or the reorder probability, which holds a
+    message back by another latency, can change the order.
+
+    With virtual_clock, time only moves through advance, which also takes
+    what the connections have queued, so a run is deterministic for a given
+    seed.  Otherwise messages are delivered in real time by a background
+    thread.
+    """
+
+    def __init__(self, latency = 0.0, jitter = 0.0, bandwidth = None,
+                    loss = 0.0, reorder = 0.0, ordered = True,
+                    retransmit_timeout = 0.2, virtual_clock = False,
+                    seed = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.loss = loss
+        self.reorder = reorder
+        self.ordered = ordered
+        self.retransmit_timeout = retransmit_timeout
+        self.virtual_clock = virtual_clock
+        self.random = Random(seed)
+        self.listeners = {}             # port -> SimulatedConnection
+        self.connections = []
+        self.lost = 0
+
+        self._now = 0.0
+        self._started = monotonic()
+        self._events = []               # heap of (time, order, link, data)
+        self._order = count()
+        self._changed = Condition()
+        self._delivery_thread = None
+
+    def now(self):
+        if self.virtual_clock:
+            return self._now
+        return monotonic() - self._started
+
+    def listen(self, port, connection):
+        with self._changed:
+            if port in self.listeners:
+                raise OSError("Simulated port {} is in use.".format(port))
+            self.listeners[port] = connection
+
+    def stop_listening(self, connection):
+        with self._changed:
+            for port, listener in list(self.listeners.items()):
+                if listener is connection:
+                    del self.listeners[port]
+
+    def connect(self, port, connection):
+        """
+        Join a connection to the one listening on port, returns False if
+        none is.
+        """
+        with self._changed:
+            listener = self.listeners.pop(port, None)
+            if listener is None:
+                return False
+            self.connections.extend([listener, connection])
+        listener._connected(_Link(connection))
+        connection._connected(_Link(listener))
+        return True
+
+    def forget(self, connection):
+        """
+        Stop tracking a closed connection, so a long lived network does not
+        hold on to every connection it has carried.
+        """
+        with self._changed:
+            if connection in self.connections:
+                self.connections.remove(connection)
+
+    def transmit(self, link, data):
+        """
+        Schedule the delivery of data over link.
+        """
+        with self._changed:
+            now = self.now()
+            departure = max(now, link.busy_until)
+            if self.bandwidth and data is not _CLOSE:
+                departure += len(data) / self.bandwidth
+            link.busy_until = departure
+            arrival = departure + self.latency
+            if self.jitter:
+                arrival += self.random.uniform(-self.jitter, self.jitter)
+                arrival = max(departure, arrival)
+
+            if data is not _CLOSE and self.random.random() < self.loss:
+                self.lost += 1
+                if not self.ordered:
+                    return
+                arrival += self.retransmit_timeout
+            if self.ordered:
+                arrival = max(arrival, link.last_arrival)
+            elif self.reorder and self.random.random() < self.reorder:
+                arrival += self.latency
+            link.last_arrival = max(link.last_arrival, arrival)
+
+            heappush(self._events, (arrival, next(self._order), link, data))
+            if not self.virtual_clock:
+                self._start_delivery()
+                self._changed.notify()
+
+    def advance(self, seconds):
+        """
+        With a virtual clock, send everything the connections have queued and
+        deliver what arrives within the next seconds, in order.
+        """
+        if not self.virtual_clock:
+            raise RuntimeError("Only a virtual clock can be advanced.")
+        for connection in list(self.connections):
+            connection._send_queued()
+        target = self._now + seconds
+        while self._events and self._events[0][0] <= target:
+            arrival, _, link, data = heappop(self._events)
+            self._now = max(self._now, arrival)
+            link.receiver._deliver(data)
+        self._now = target
+
+    def run_until_idle(self, step = 0.001, limit = 3600.0):
+        """
+        Advance a virtual clock until nothing is queued or in flight.
+        """
+        end = self._now + limit
+        self.advance(0)
+        while self._now < end and (self._events or any(
+                    not c.send_queue.empty() for c in self.connections
+                    if c.active)):
+            self.advance(step)
+
+    def _start_delivery(self):
+        if self._delivery_thread is None:
+            self._delivery_thread = Thread(target = self._deliver_in_time,
+                                            name = "SimulatedNetwork",
+                                            daemon = True)
+            self._delivery_thread.start()
+
+    def _deliver_in_time(self):
+        with self._changed:
+            while True:
+                if not self._events:
+                    self._changed.wait()
+                    continue
+                remaining = self._events[0][0] - self.now()
+                if remaining > 0:
+                    self._changed.wait(remaining)
+                    continue
+                _, _, link, data = heappop(self._events)
+                self._changed.release()
+                try:
+                    link.receiver._deliver(data)
+                finally:
+                    self._changed.acquire()
+
+
+shared_network = SimulatedNetwork()     # real time, without impairments
+
+
+class SimulatedConnection:
+    """
+    Drop-in replacement for Connection that runs over a SimulatedNetwork
+    instead of sockets, with the same controller and queue interface.
+
+    Without a network, connections use shared_network, so code constructing
+    a Connection only needs the class swapped.  Pass a network of your own
+    to simulate latency, loss and the rest.
+
+    Port numbers only identify listeners on the simulated network, and the
+    IP address to connect to is ignored.
+    """
+
+    def __init__(self, controller, send_queue, receive_queue, network = None):
+        """
+        Put the connection in an uninitialized, inactive, state.
+        """
+        self.controller = controller
+        self.send_queue = send_queue
+        self.receive_queue = receive_queue
+        self.network = shared_network if network is None else network
+        self.listener = None
+        self.metrics = ConnectionMetrics()
+        self.metrics.watch_queues(send_queue, receive_queue)
+        self._link = None
+        self._send_thread = None
+
+    @property
+    def active(self):
+        return self._link is not None
+
+    def startup_accept(self, port):
+        self.network.listen(port, self)
+        self.listener = port
+        getLogger(__name__).info("Waiting for connection...")
+
+    def startup_connect(self, port, ip_address):
+        getLogger(__name__).info("Attempting to connect...")
+        if not self.network.connect(port, self):
+            getLogger(__name__).warning(("No connection was established."))
+
+    def _connected(self, link):
+        self.listener = None
+        self._link = link
+        self.controller.start_processing_receive_queue()
+        if not self.network.virtual_clock:
+            self._send_thread = Thread(target = self._send, args = (link,))
+            self._send_thread.start()
+        getLogger(__name__).info("Connection established.")
+
+    def close(self):
+        """
+        Disconnect from the peer, which notices once the data already sent
+        has arrived.
+        """
+        if self.listener is not None:
+            self.network.stop_listening(self)
+            self.listener = None
+        link = self._link
+        if link is not None:
+            self._link = None
+            self.network.transmit(link, _CLOSE)
+            if self._send_thread is not None:
+                self.send_queue.put(None)   # release the send thread
+                self._send_thread.join()
+                self._send_thread = None
+            self.receive_queue.put(None)    # release the processing thread
+            self.network.forget(self)
+            getLogger(__name__).info("Connection closed.")
+
+    def get_incoming_data(self):
+        result = None
+        if self.active:
+            result = self.receive_queue.get()
+        return result
+
+    def _send(self, link):
+        while self._link is link:
+            data = self.send_queue.get()
+            if data is not None and self._link is link:
+                self._transmit(link, data)
+
+    def _send_queued(self):
+        """
+        Transmit everything queued, used by a virtual clock.
+        """
+        link = self._link
+        while link is not None:
+            try:
+                data = self.send_queue.get_nowait()
+            except Empty:
+                return
+            if data is not None:
+                self._transmit(link, data)
+
+    def _transmit(self, link, data):
+        taken = monotonic()
+        self.network.transmit(link, data)
+        self.metrics.messages_out += 1
+        self.metrics.record_send(len(data))
+        self.metrics.record_written(taken)
+
+    def _deliver(self, data):
+        if data is _CLOSE:
+            if self.active:
+                self.controller.disconnect()
+            return
+        if self.active:
+            self.metrics.record_receive(len(data), 1)
+            self.metrics.messages_in += 1
+            getattr(self.receive_queue, "force_put",
+                    self.receive_queue.put)(data)
@@ -0,0 +1,235 @@
+from collections    import OrderedDict
+from logging        import getLogger
+from struct         import Struct
+
+
+KEYFRAME = 0
+DELTA = 1
+ACK = 2
+KEYFRAME_REQUEST = 3
+
+KEYFRAME_HEADER = Struct("!BQ")     # kind, version
+DELTA_HEADER = Struct("!BQQ")       # kind, version, base version
+ACK_MESSAGE = Struct("!BQ")         # kind or KEYFRAME_REQUEST, version
+
+SET = 0
+PATCH = 1
+DELETE = 2
+
+ENTRY_HEADER = Struct("!BH")        # operation, name length
+LENGTH = Struct("!I")
+PATCH_HEADER = Struct("!II")        # offset, length
+
+
+def _target(target):
+    return getattr(target, "put", target)
+
+def block_patches(old, new, block_size):
+    """
+    Return the (offset, data) runs of new that differ from old, compared in
+    blocks of block_size bytes.  Bytes past the end of old always differ.
+    """
+    old_view = memoryview(old)
+    new_view = memoryview(new)
+    common = min(len(old), len(new))
+    patches = []
+    start = None
+    for offset in range(0, common, block_size):
+        end = min(offset + block_size, common)
+        if old_view[offset:end] != new_view[offset:end]:
+            if start is None:
+                start = offset
+        elif start is not None:
+            patches.append((start, bytes(new_view[start:offset])))
+            start = None
+    if start is not None or len(new) > common:
+        start = common if start is None else start
+        patches.append((start, bytes(new_view[start:])))
+    return patches
+
+def encode_fields(fields):
+    """
+    Encode a {name : bytes} mapping as SET entries.
+    """
+    return b"".join(_entry(SET, name, LENGTH.pack(len(value)) + value)
+                    for name, value in fields.items())
+
+def _entry(operation, name, body = b""):
+    name = name.encode()
+    return ENTRY_HEADER.pack(operation, len(name)) + name + body
+
+def apply_entries(fields, data, offset = 0):
+    """
+    Return a copy of fields with the encoded entries from data applied.
+    """
+    fields = dict(fields)
+    view = memoryview(data)
+    while offset < len(view):
+        operation, name_length = ENTRY_HEADER.unpack_from(view, offset)
+        offset += ENTRY_HEADER.size
+        name = bytes(view[offset:offset + name_length]).decode()
+        offset += name_length
+        if operation == SET:
+            length, = LENGTH.unpack_from(view, offset)
+            offset += LENGTH.size
+            fields[name] = bytes(view[offset:offset + length])
+            offset += length
+        elif operation == PATCH:
+            new_length, count = PATCH_HEADER.unpack_from(view, offset)
+            offset += PATCH_HEADER.size
+            value = bytearray(fields[name][:new_length])
+            value.extend(bytes(new_length - len(value)))
+            for _ in range(count):
+                start, length = PATCH_HEADER.unpack_from(view, offset)
+                offset += PATCH_HEADER.size
+                value[start:start + length] = view[offset:offset + length]
+                offset += length
+            fields[name] = bytes(value)
+        elif operation == DELETE:
+            fields.pop(name, None)
+        else:
+            raise ValueError("Unknown state entry operation {}."
+                                .format(operation))
+    return fields
+
+
+class StateSender:
+    """
+    Replicates application state to a peer as deltas against the last state
+    the peer acknowledged.
+
+    snapshot() returns the state as a {field name : bytes} mapping, each
+    field serialized however suits the application.  Each tick sends only
+    the fields that changed, as whole values or, when smaller, as the
+    changed blocks of block_size bytes.  A keyframe carrying every field is
+    sent every keyframe_interval ticks, before anything is acknowledged,
+    and whenever the receiver asks for one, so a lost message costs at most
+    one keyframe.
+
+    Messages go to send, a queue or callable.  Pass everything received from
+    the peer's StateReceiver to process_received_data.
+    """
+
+    def __init__(self, snapshot, send, keyframe_interval = 300,
+                    block_size = 64, history = 64):
+        self.snapshot = snapshot
+        self.send = _target(send)
+        self.keyframe_interval = keyframe_interval
+        self.block_size = block_size
+        self.history = history
+        self.version = 0
+        self.acked_version = None
+        self.bytes_sent = 0
+        self.keyframes_sent = 0
+        self.deltas_sent = 0
+        self._states = OrderedDict()    # unacknowledged version -> fields
+        self._since_keyframe = 0
+        self._keyframe_requested = False
+
+    def tick(self):
+        """
+        Snapshot the state and send it to the peer, returning the message.
+        """
+        fields = self.snapshot()
+        self.version += 1
+        base = self._states.get(self.acked_version)
+        if (base is None or self._keyframe_requested or
+                self._since_keyframe >= self.keyframe_interval):
+            message = KEYFRAME_HEADER.pack(KEYFRAME, self.version) + \
+                        encode_fields(fields)
+            self._keyframe_requested = False
+            self._since_keyframe = 0
+            self.keyframes_sent += 1
+        else:
+            message = DELTA_HEADER.pack(DELTA, self.version,
+                                        self.acked_version) + \
+                        self.encode_delta(base, fields)
+            self._since_keyframe += 1
+            self.deltas_sent += 1
+
+        self._states[self.version] = fields
+        while len(self._states) > self.history:
+            self._states.popitem(last = False)
+        self.bytes_sent += len(message)
+        self.send(message)
+        return message
+
+    def encode_delta(self, base, fields):
+        """
+        Encode the entries turning base into fields.
+        """
+        entries = []
+        for name, value in fields.items():
+            old = base.get(name)
+            if old == value:
+                continue
+            whole = LENGTH.pack(len(value)) + value
+            if old is not None:
+                patches = block_patches(old, value, self.block_size)
+                patched = PATCH_HEADER.pack(len(value), len(patches)) + \
+                            b"".join(PATCH_HEADER.pack(start, len(data)) +
+                                    data for start, data in patches)
+                if len(patched) < len(whole):
+                    entries.append(_entry(PATCH, name, patched))
+                    continue
+            entries.append(_entry(SET, name, whole))
+        entries.extend(_entry(DELETE, name) for name in base
+                        if name not in fields)
+        return b"".join(entries)
+
+    def process_received_data(self, data):
+        kind, version = ACK_MESSAGE.unpack_from(data)
+        if kind == ACK:
+            if version in self._states and (self.acked_version is None or
+                                            version > self.acked_version):
+                self.acked_version = version
+                for old in [v for v in self._states if v < version]:
+                    del self._states[old]
+        elif kind == KEYFRAME_REQUEST:
+            self._keyframe_requested = True
+        else:
+            raise ValueError("Unknown state message kind {}.".format(kind))
+
+
+class StateReceiver:
+    """
+    Rebuilds the state replicated by a StateSender, passing every new
+    {field name : bytes} state to apply and acknowledging it through send.
+
+    Recent states are kept so deltas against an older acknowledged state
+    still apply, a delta whose base is unknown asks for a keyframe.
+    """
+
+    def __init__(self, apply, send, history = 64):
+        self.apply = apply
+        self.send = _target(send)
+        self.history = history
+        self.version = 0
+        self.fields = {}
+        self._states = OrderedDict()
+
+    def process_received_data(self, data):
+        kind = data[0]
+        if kind == KEYFRAME:
+            _, version = KEYFRAME_HEADER.unpack_from(data)
+            fields = apply_entries({}, data, KEYFRAME_HEADER.size)
+        elif kind == DELTA:
+            _, version, base_version = DELTA_HEADER.unpack_from(data)
+            base = self._states.get(base_version)
+            if base is None:
+                getLogger(__name__).debug("Missing base state {}, asking for "
+                                        "a keyframe".format(base_version))
+                self.send(ACK_MESSAGE.pack(KEYFRAME_REQUEST, version))
+                return
+            fields = apply_entries(base, data, DELTA_HEADER.size)
+        else:
+            raise ValueError("Unknown state message kind {}.".format(kind))
+        if version <= self.version:
+            return      # superseded already
+        self.version = version
+        self.fields = fields
+        self._states[version] = fields
+        while len(self._states) > self.history:
+            self._states.popitem(last = False)
+        self.apply(fields)
+        self.send(ACK_MESSAGE.pack(ACK, version))
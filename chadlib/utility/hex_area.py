@@ -0,0 +1,145 @@
+"""
+Generators of the hexes in an area, produced lazily so a query can stop as
+soon as it has found what it needs.
+
+Each cubic generator has an axial equivalent.  See hex_array for versions
+returning NumPy arrays of the whole area at once.
+"""
+
+
+from bisect         import bisect_right
+
+from .hex_math      import (ADJACENT_DIRECTIONS, CUBIC_DIRECTIONS,
+                            axial_to_cubic, cubic_distance, cubic_round)
+
+
+RING_CHANGES = tuple(CUBIC_DIRECTIONS[ADJACENT_DIRECTIONS[(i + 2) % 6]]
+                        for i in range(6))     # clockwise from north corner
+NUDGE = (1e-6, 2e-6, -3e-6)     # keeps line points off hex edges
+
+
+def cubic_range(radius, x, y, z):
+    """
+    Generate every hex within radius steps of (x, y, z), column by column.
+    """
+    for dx in range(-radius, radius + 1):
+        for dy in range(max(-radius, -dx - radius),
+                        min(radius, -dx + radius) + 1):
+            yield x + dx, y + dy, z - dx - dy
+
+def cubic_ring(radius, x, y, z):
+    """
+    Generate the hexes exactly radius steps from (x, y, z), clockwise from
+    the one due north.
+    """
+    if radius == 0:
+        yield x, y, z
+        return
+    dx, dy, dz = CUBIC_DIRECTIONS["north"]
+    x, y, z = x + radius * dx, y + radius * dy, z + radius * dz
+    for dx, dy, dz in RING_CHANGES:
+        for _ in range(radius):
+            yield x, y, z
+            x, y, z = x + dx, y + dy, z + dz
+
+def cubic_spiral(radius, x, y, z):
+    """
+    Generate every hex within radius steps of (x, y, z), ring by ring
+    outward from the center.
+    """
+    for ring in range(radius + 1):
+        yield from cubic_ring(ring, x, y, z)
+
+def cubic_line(x, y, z, other_x, other_y, other_z):
+    """
+    Generate the hexes on the straight line between two hexes, both
+    included, by rounding evenly spaced points between their centers.
+    """
+    steps = cubic_distance(x, y, z, other_x, other_y, other_z)
+    x, y, z = x + NUDGE[0], y + NUDGE[1], z + NUDGE[2]
+    other_x, other_y, other_z = (other_x + NUDGE[0], other_y + NUDGE[1],
+                                    other_z + NUDGE[2])
+    for i in range(steps + 1):
+        t = i / steps if steps else 0.0
+        yield cubic_round(x + (other_x - x) * t, y + (other_y - y) * t,
+                            z + (other_z - z) * t)
+
+def cubic_field_of_view(blocks, radius, x, y, z):
+    """
+    Generate the hexes within radius steps visible from (x, y, z), nearest
+    first, where blocks(coord) tells if the hex at a cubic coordinate stops
+    sight.  Blocking hexes are visible, the hexes behind them are not.
+
+    Shadowcasting over rings:  positions around a ring are measured as
+    angles from 0 to 6, a hex of ring r covering 1 / r of them, and each
+    visible blocker casts a shadow over its angles.  A hex is visible unless
+    its center lies in a shadow.  Stops early once every angle is dark.
+    """
+    yield x, y, z
+    shadows = []            # sorted, disjoint (start, end) angles
+    for ring in range(1, radius + 1):
+        blockers = []
+        for i, coord in enumerate(cubic_ring(ring, x, y, z)):
+            center = i / ring
+            if _in_shadow(shadows, center):
+                continue
+            yield coord
+            if blocks(coord):
+                blockers.append(center)
+        for center in blockers:
+            half = 0.5 / ring
+            start, end = center - half, center + half
+            if start < 0:
+                _cast(shadows, 6 + start, 6)
+                start = 0
+            _cast(shadows, start, end)
+        if shadows == [(0, 6)]:
+            return
+
+def _in_shadow(shadows, angle):
+    if angle == 0:          # also 6, inside a shadow that wraps past it
+        return (bool(shadows) and shadows[0][0] == 0 and
+                shadows[-1][1] == 6)
+    i = bisect_right(shadows, (angle, 7)) - 1
+    return i >= 0 and shadows[i][0] < angle < shadows[i][1]
+
+def _cast(shadows, start, end):
+    """
+    Add a shadow, merging it with those it touches.
+    """
+    kept = []
+    for shadow in shadows:
+        if shadow[1] < start or shadow[0] > end:
+            kept.append(shadow)
+        else:
+            start = min(start, shadow[0])
+            end = max(end, shadow[1])
+    kept.append((start, end))
+    kept.sort()
+    shadows[:] = kept
+
+def _axial(coords):
+    for x, _, z in coords:
+        yield x, z
+
+def axial_range(radius, col, slant):
+    return _axial(cubic_range(radius, *axial_to_cubic(col, slant)))
+
+def axial_ring(radius, col, slant):
+    return _axial(cubic_ring(radius, *axial_to_cubic(col, slant)))
+
+def axial_spiral(radius, col, slant):
+    return _axial(cubic_spiral(radius, *axial_to_cubic(col, slant)))
+
+def axial_line(col, slant, other_col, other_slant):
+    return _axial(cubic_line(*axial_to_cubic(col, slant),
+                                *axial_to_cubic(other_col, other_slant)))
+
+def axial_field_of_view(blocks, radius, col, slant):
+    """
+    Axial version of cubic_field_of_view, blocks is given axial coordinates.
+    """
+    def cubic_blocks(coord):
+        return blocks((coord[0], coord[2]))
+    return _axial(cubic_field_of_view(cubic_blocks, radius,
+                                        *axial_to_cubic(col, slant)))
@@ -0,0 +1,290 @@
+"""
+Versions of the hex_math functions working on NumPy arrays of coordinates,
+for transforming whole maps or unit lists in one call.
+
+Cubic coordinates are arrays of shape (N, 3), axial coordinates arrays of
+shape (N, 2), and every function returns a new array.  Wherever a single
+coordinate is accepted in place of an array it is broadcast against the
+other argument.  Move distances, n, may be a number or an array of N
+numbers, one per coordinate.
+
+The hex_area queries are here too, each returning its whole area as one
+array in the order the generator would produce it.
+
+Requires NumPy, which the rest of chadlib does not, installed with the numpy
+extra:  pip install chadlib[numpy].
+"""
+
+
+import numpy
+
+from .hex_area      import NUDGE, RING_CHANGES
+from .hex_math      import AXIAL_DIRECTIONS, CUBIC_DIRECTIONS
+
+
+CUBIC_VECTORS = {name : numpy.array(change)
+                    for name, change in CUBIC_DIRECTIONS.items()}
+AXIAL_VECTORS = {name : numpy.array(change)
+                    for name, change in AXIAL_DIRECTIONS.items()}
+
+
+def axial_to_cubic(coords):
+    """
+    Convert axial coordinates to their cubic equivalents.
+    """
+    coords = numpy.asarray(coords)
+    x = coords[..., 0]
+    z = coords[..., 1]
+    return numpy.stack((x, -x - z, z), axis = -1)
+
+def cubic_to_axial(coords):
+    """
+    Convert cubic coordinates to their axial equivalents.
+    """
+    return numpy.asarray(coords)[..., [0, 2]]
+
+def is_valid_cubic_coord(coords):
+    """
+    Tests which cubic coordinates sum to 0, returning an array of booleans.
+    """
+    return numpy.asarray(coords).sum(axis = -1) == 0
+
+def _move(coords, change, n):
+    n = numpy.asarray(n)
+    if n.ndim:
+        n = n[..., numpy.newaxis]
+    return numpy.asarray(coords) + n * change
+
+def cubic_move(coords, direction, n = 1):
+    """
+    Return coordinates moved n hexes in the named direction, one of the
+    keys of CUBIC_DIRECTIONS.
+    """
+    return _move(coords, CUBIC_VECTORS[direction], n)
+
+def cubic_n_moves(f, n, coords):
+    """
+    Return coordinates moved n hexes by the action defined in f.
+
+    f is expected to be a cubic move function from this module.
+    """
+    return f(coords, n)
+
+def cubic_north(coords, n = 1):
+    return _move(coords, CUBIC_VECTORS["north"], n)
+
+def cubic_south(coords, n = 1):
+    return _move(coords, CUBIC_VECTORS["south"], n)
+
+def cubic_northeast(coords, n = 1):
+    return _move(coords, CUBIC_VECTORS["northeast"], n)
+
+def cubic_southeast(coords, n = 1):
+    return _move(coords, CUBIC_VECTORS["southeast"], n)
+
+def cubic_northwest(coords, n = 1):
+    return _move(coords, CUBIC_VECTORS["northwest"], n)
+
+def cubic_southwest(coords, n = 1):
+    return _move(coords, CUBIC_VECTORS["southwest"], n)
+
+def cubic_east(coords, n = 1):
+    return _move(coords, CUBIC_VECTORS["east"], n)
+
+def cubic_west(coords, n = 1):
+    return _move(coords, CUBIC_VECTORS["west"], n)
+
+def axial_move(coords, direction, n = 1):
+    """
+    Return coordinates moved n hexes in the named direction, one of the
+    keys of AXIAL_DIRECTIONS.
+    """
+    return _move(coords, AXIAL_VECTORS[direction], n)
+
+def axial_n_moves(f, n, coords):
+    """
+    Return coordinates moved n hexes by the action defined in f.
+
+    f is expected to be an axial move function from this module.
+    """
+    return f(coords, n)
+
+def axial_north(coords, n = 1):
+    return _move(coords, AXIAL_VECTORS["north"], n)
+
+def axial_south(coords, n = 1):
+    return _move(coords, AXIAL_VECTORS["south"], n)
+
+def axial_northeast(coords, n = 1):
+    return _move(coords, AXIAL_VECTORS["northeast"], n)
+
+def axial_southeast(coords, n = 1):
+    return _move(coords, AXIAL_VECTORS["southeast"], n)
+
+def axial_northwest(coords, n = 1):
+    return _move(coords, AXIAL_VECTORS["northwest"], n)
+
+def axial_southwest(coords, n = 1):
+    return _move(coords, AXIAL_VECTORS["southwest"], n)
+
+def axial_east(coords, n = 1):
+    return _move(coords, AXIAL_VECTORS["east"], n)
+
+def axial_west(coords, n = 1):
+    return _move(coords, AXIAL_VECTORS["west"], n)
+
+def cubic_distance(coords, others):
+    """
+    Number of steps between hexes along their six edges, for each pair of
+    cubic coordinates.
+    """
+    change = numpy.asarray(coords) - numpy.asarray(others)
+    return numpy.abs(change).sum(axis = -1) // 2
+
+def axial_distance(coords, others):
+    """
+    Number of steps between hexes along their six edges, for each pair of
+    axial coordinates.
+    """
+    return cubic_distance(axial_to_cubic(coords), axial_to_cubic(others))
+
+def cubic_round(coords):
+    """
+    Round fractional cubic coordinates to the hexes containing them,
+    returning integer coordinates that sum to 0.
+
+    Each component is rounded, then the one that moved furthest is reset
+    from the other two, the last of them on a tie as in hex_math.
+    """
+    coords = numpy.asarray(coords, dtype = float)
+    rounded = numpy.rint(coords)
+    error = numpy.abs(rounded - coords)
+    worst = 2 - numpy.argmax(error[..., ::-1], axis = -1)[..., numpy.newaxis]
+    total = rounded.sum(axis = -1, keepdims = True)
+    fixed = numpy.take_along_axis(rounded, worst, axis = -1) - total
+    numpy.put_along_axis(rounded, worst, fixed, axis = -1)
+    return rounded.astype(int)
+
+def axial_round(coords):
+    """
+    Round fractional axial coordinates to the hexes containing them.
+    """
+    return cubic_to_axial(cubic_round(axial_to_cubic(
+                                    numpy.asarray(coords, dtype = float))))
+
+def cubic_range(center, radius):
+    """
+    Every hex within radius steps of center, column by column.
+    """
+    steps = numpy.arange(-radius, radius + 1)
+    dx, dy = numpy.meshgrid(steps, steps, indexing = "ij")
+    dz = -dx - dy
+    inside = numpy.abs(dz) <= radius
+    return numpy.stack((dx[inside], dy[inside], dz[inside]), axis = -1) + \
+            numpy.asarray(center)
+
+def cubic_ring(center, radius):
+    """
+    The hexes exactly radius steps from center, clockwise from the one due
+    north.
+    """
+    center = numpy.asarray(center)
+    if radius == 0:
+        return center[numpy.newaxis].copy()
+    changes = numpy.array(RING_CHANGES)
+    corners = center + radius * (CUBIC_VECTORS["north"] + numpy.cumsum(
+                    numpy.vstack(((0, 0, 0), changes[:-1])), axis = 0))
+    steps = numpy.arange(radius)[numpy.newaxis, :, numpy.newaxis]
+    return (corners[:, numpy.newaxis] +
+            steps * changes[:, numpy.newaxis]).reshape(-1, 3)
+
+def cubic_spiral(center, radius):
+    """
+    Every hex within radius steps of center, ring by ring outward.
+    """
+    return numpy.concatenate([cubic_ring(center, ring)
+                                for ring in range(radius + 1)])
+
+def cubic_line(start, end):
+    """
+    The hexes on the straight line from start to end, both included.
+    """
+    start = numpy.asarray(start) + NUDGE
+    end = numpy.asarray(end) + NUDGE
+    steps = int(cubic_distance(numpy.rint(start), numpy.rint(end)))
+    t = numpy.linspace(0, 1, steps + 1)[:, numpy.newaxis]
+    return cubic_round(start + (end - start) * t)
+
+def cubic_line_of_sight(origin, targets, blocked):
+    """
+    For each target, whether no hex on the line from origin to it, ends
+    excluded, is blocked.  blocked takes an (N, 3) array of coordinates and
+    returns an array of N booleans.
+    """
+    origin = numpy.asarray(origin)
+    targets = numpy.asarray(targets)
+    distances = cubic_distance(targets, origin)
+    longest = int(distances.max(initial = 0))
+    steps = numpy.arange(1, max(longest, 1))
+    between = steps[numpy.newaxis] < distances[:, numpy.newaxis]
+    t = steps[numpy.newaxis] / numpy.maximum(distances, 1)[:, numpy.newaxis]
+    points = cubic_round(origin + NUDGE + (targets - origin)[:, numpy.newaxis]
+                            * t[..., numpy.newaxis])
+    hidden = numpy.zeros(between.shape, dtype = bool)
+    hidden[between] = blocked(points[between])
+    return ~hidden.any(axis = -1)
+
+def cubic_field_of_view(center, radius, blocked):
+    """
+    The hexes within radius steps of center visible from it, nearest first,
+    where blocked takes an (N, 3) array of coordinates and returns an array
+    of N booleans.
+
+    The ring by ring shadowcasting of hex_area.cubic_field_of_view, each
+    ring handled as a whole, so the two give the same hexes in the same
+    order.
+    """
+    center = numpy.asarray(center)
+    visible = [center[numpy.newaxis]]
+    starts = ends = numpy.empty(0)      # sorted, disjoint shadow angles
+    for ring in range(1, radius + 1):
+        angles = numpy.arange(6 * ring) / ring
+        seen = ~_in_shadow(starts, ends, angles)
+        coords = cubic_ring(center, ring)[seen]
+        visible.append(coords)
+        if not len(coords):
+            continue
+        blockers = angles[seen][numpy.asarray(blocked(coords), dtype = bool)]
+        if len(blockers):
+            half = 0.5 / ring
+            wrapped = blockers[blockers - half < 0]
+            starts = numpy.concatenate((starts, 6 + (wrapped - half),
+                                        numpy.maximum(blockers - half, 0)))
+            ends = numpy.concatenate((ends, numpy.full(len(wrapped), 6.0),
+                                        blockers + half))
+            starts, ends = _merge_shadows(starts, ends)
+        if len(starts) == 1 and starts[0] == 0 and ends[0] == 6:
+            break
+    return numpy.concatenate(visible)
+
+def _in_shadow(starts, ends, angles):
+    if not len(starts):
+        return numpy.zeros(len(angles), dtype = bool)
+    i = numpy.maximum(numpy.searchsorted(starts, angles, side = "right") - 1,
+                        0)
+    shaded = (starts[i] < angles) & (angles < ends[i])
+    shaded[angles == 0] = starts[0] == 0 and ends[-1] == 6  # wraps past 6
+    return shaded
+
+def _merge_shadows(starts, ends):
+    """
+    Merge shadows that overlap or touch, as hex_area casting them one at a
+    time does.
+    """
+    order = numpy.argsort(starts, kind = "stable")
+    starts = starts[order]
+    ends = ends[order]
+    reach = numpy.maximum.accumulate(ends)
+    firsts = numpy.flatnonzero(numpy.concatenate(([True],
+                                                    starts[1:] > reach[:-1])))
+    return starts[firsts], numpy.maximum.reduceat(ends, firsts)
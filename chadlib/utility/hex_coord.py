@@ -0,0 +1,137 @@
+"""
+Hex coordinate value type, for code that moves coordinates around in tight
+loops.  Directions are named and oriented as in hex_math.
+"""
+
+
+from .hex_math      import ADJACENT_DIRECTIONS, CUBIC_DIRECTIONS
+
+
+ADJACENT_CHANGES = tuple(CUBIC_DIRECTIONS[name] 
+                            for name in ADJACENT_DIRECTIONS)
+
+
+class HexCoord:
+    """
+    Cubic hex coordinate, whose components sum to 0.
+
+    Only the three components are stored, in __slots__.  A HexCoord hashes
+    and compares equal like the (x, y, z) tuple, and unpacks like one, so it
+    can stand in for tuples as a dictionary key or be passed to the hex_math
+    functions with *coord.  Treat it as immutable, as its hash depends on
+    its components.
+
+    Moving any number of steps is a single scale-and-add of the direction's
+    change, see move.
+    """
+
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @classmethod
+    def from_axial(cls, col, slant):
+        return cls(col, -col - slant, slant)
+
+    @property
+    def col(self):
+        return self.x
+
+    @property
+    def slant(self):
+        return self.z
+
+    def axial(self):
+        return self.x, self.z
+
+    def is_valid(self):
+        return (self.x + self.y + self.z) == 0
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def __repr__(self):
+        return "HexCoord({}, {}, {})".format(self.x, self.y, self.z)
+
+    def __eq__(self, other):
+        if isinstance(other, HexCoord):
+            return (self.x == other.x and self.y == other.y and
+                    self.z == other.z)
+        if isinstance(other, tuple):
+            return (self.x, self.y, self.z) == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.x, self.y, self.z))
+
+    def __add__(self, other):
+        x, y, z = other
+        return HexCoord(self.x + x, self.y + y, self.z + z)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        x, y, z = other
+        return HexCoord(self.x - x, self.y - y, self.z - z)
+
+    def __rsub__(self, other):
+        x, y, z = other
+        return HexCoord(x - self.x, y - self.y, z - self.z)
+
+    def __neg__(self):
+        return HexCoord(-self.x, -self.y, -self.z)
+
+    def __mul__(self, n):
+        if not isinstance(n, int):
+            return NotImplemented
+        return HexCoord(self.x * n, self.y * n, self.z * n)
+
+    __rmul__ = __mul__
+
+    def move(self, direction, n = 1):
+        """
+        Return the coordinate n hexes away in direction, a name from
+        hex_math.CUBIC_DIRECTIONS or a cubic change.
+        """
+        if isinstance(direction, str):
+            direction = CUBIC_DIRECTIONS[direction]
+        x, y, z = direction
+        return HexCoord(self.x + n * x, self.y + n * y, self.z + n * z)
+
+    def neighbor(self, direction):
+        return self.move(direction)
+
+    def neighbors(self):
+        """
+        Return the six adjacent coordinates, clockwise from north.
+        """
+        x, y, z = self.x, self.y, self.z
+        return [HexCoord(x + dx, y + dy, z + dz)
+                for dx, dy, dz in ADJACENT_CHANGES]
+
+    def distance(self, other):
+        """
+        Number of steps to other along hex edges.
+        """
+        x, y, z = other
+        return (abs(self.x - x) + abs(self.y - y) + abs(self.z - z)) // 2
+
+    def rotate(self, turns = 1, center = (0, 0, 0)):
+        """
+        Return the coordinate rotated about center by turns sixths of a
+        circle, clockwise for positive turns.
+        """
+        cx, cy, cz = center
+        x, y, z = self.x - cx, self.y - cy, self.z - cz
+        for _ in range(turns % 6):
+            x, y, z = -z, -x, -y
+        return HexCoord(x + cx, y + cy, z + cz)
+
+
+ORIGIN = HexCoord(0, 0, 0)
+
+DIRECTIONS = {name : HexCoord(*change) 
+                for name, change in CUBIC_DIRECTIONS.items()}
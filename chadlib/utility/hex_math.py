@@ -3,14 +3,31 @@ Collection of functions for adjusting hex coordinates.
 
 All directions are in reference to flat-topped hexes, as opposed to pointy.
 
-For quick reference:
-dir_changes = {"north" : (0, 1, -1), "south" : (0, -1, 1), 
-                "n_east" : (1, 0, -1), "s_east" : (1, -1, 0),
-                "n_west" : (-1, 1, 0), "s_west" : (-1, 0, 1),
-                "east" : (2, -1, -1), "west" : (-2, 1, 1)}
+The change each move makes is in CUBIC_DIRECTIONS and AXIAL_DIRECTIONS, 
+keyed by the name used in the move functions.  East and west cross a 
+vertex, two hexes away, the other six directions cross an edge into an 
+adjacent hex and are listed clockwise in ADJACENT_DIRECTIONS.
+
+See hex_coord.HexCoord for a coordinate type with these operations as 
+methods, and hex_array for versions of these functions working on NumPy 
+arrays of many coordinates at once.
 """
 
 
+CUBIC_DIRECTIONS = {"north" : (0, 1, -1), "south" : (0, -1, 1), 
+                    "northeast" : (1, 0, -1), "southeast" : (1, -1, 0),
+                    "northwest" : (-1, 1, 0), "southwest" : (-1, 0, 1),
+                    "east" : (2, -1, -1), "west" : (-2, 1, 1)}
+
+AXIAL_DIRECTIONS = {"north" : (0, -1), "south" : (0, 1), 
+                    "northeast" : (1, -1), "southeast" : (1, 0),
+                    "northwest" : (-1, 0), "southwest" : (-1, 1),
+                    "east" : (2, -1), "west" : (-2, 1)}
+
+ADJACENT_DIRECTIONS = ("north", "northeast", "southeast", 
+                        "south", "southwest", "northwest")
+
+
 def axial_to_cubic(col, slant):
     """
     Convert axial coordinate to its cubic equivalent.
@@ -33,73 +50,136 @@ def is_valid_cubic_coord(x, y, z):
     """
     return (x + y + z) == 0
 
-def _tuple_add(t1, t2):
-    return tuple([a + b for a, b in zip(t1, t2)])
+def cubic_distance(x, y, z, other_x, other_y, other_z):
+    """
+    Number of steps between two hexes along their edges.
+    """
+    return (abs(x - other_x) + abs(y - other_y) + abs(z - other_z)) // 2
+
+def axial_distance(col, slant, other_col, other_slant):
+    """
+    Number of steps between two hexes along their edges.
+    """
+    dcol = col - other_col
+    dslant = slant - other_slant
+    return (abs(dcol) + abs(dslant) + abs(dcol + dslant)) // 2
+
+def cubic_round(x, y, z):
+    """
+    Round a fractional cubic coordinate to the hex containing it.
+
+    Each component is rounded, then the one that moved furthest is reset 
+    from the other two so they still sum to 0.
+    """
+    rx, ry, rz = round(x), round(y), round(z)
+    dx, dy, dz = abs(rx - x), abs(ry - y), abs(rz - z)
+    if dx > dy and dx > dz:
+        rx = -ry - rz
+    elif dy > dz:
+        ry = -rx - rz
+    else:
+        rz = -rx - ry
+    return rx, ry, rz
+
+def axial_round(col, slant):
+    """
+    Round a fractional axial coordinate to the hex containing it.
+    """
+    return cubic_to_axial(*cubic_round(*axial_to_cubic(col, slant)))
 
 def cubic_n_moves(f, n, x, y, z):
     """
     Return coordinate moved n hexes by the action defined in f.
 
-    f is expected to be a cubic move function.
+    f is expected to be a cubic move function.  The move functions of this 
+    module are applied as a single scaled step, others are called n times.
     """
-    for _ in range(n):
-        x, y, z = f(x, y, z)
-    return x, y, z
+    change = _CUBIC_MOVES.get(f)
+    if change is None:
+        for _ in range(n):
+            x, y, z = f(x, y, z)
+        return x, y, z
+    dx, dy, dz = change
+    return x + n * dx, y + n * dy, z + n * dz
 
 def cubic_north(x, y, z):
-    return _tuple_add((x, y, z), (0, 1, -1))
+    return x, y + 1, z - 1
 
 def cubic_south(x, y, z):
-    return _tuple_add((x, y, z), (0, -1, 1))
+    return x, y - 1, z + 1
 
 def cubic_northeast(x, y, z):
-    return _tuple_add((x, y, z), (1, 0, -1))
+    return x + 1, y, z - 1
 
 def cubic_southeast(x, y, z):
-    return _tuple_add((x, y, z), (1, -1, 0))
+    return x + 1, y - 1, z
 
 def cubic_northwest(x, y, z):
-    return _tuple_add((x, y, z), (-1, 1, 0))
+    return x - 1, y + 1, z
 
 def cubic_southwest(x, y, z):
-    return _tuple_add((x, y, z), (-1, 0, 1))
+    return x - 1, y, z + 1
 
 def cubic_east(x, y, z):
-    return _tuple_add((x, y, z), (2, -1, -1))
+    return x + 2, y - 1, z - 1
 
 def cubic_west(x, y, z):
-    return _tuple_add((x, y, z), (-2, 1, 1))
+    return x - 2, y + 1, z + 1
 
 def axial_n_moves(f, n, col, slant):
     """
     Return coordinate moved n hexes by the action defined in f.
 
-    f is expected to be an axial move function.
+    f is expected to be an axial move function.  The move functions of this 
+    module are applied as a single scaled step, others are called n times.
     """
-    for _ in range(n):
-        col, slant = f(col, slant)
-    return col, slant
+    change = _AXIAL_MOVES.get(f)
+    if change is None:
+        for _ in range(n):
+            col, slant = f(col, slant)
+        return col, slant
+    dcol, dslant = change
+    return col + n * dcol, slant + n * dslant
 
 def axial_north(col, slant):
-    return _tuple_add((col, slant), (0, -1))
+    return col, slant - 1
 
 def axial_south(col, slant):
-    return _tuple_add((col, slant), (0, 1))
+    return col, slant + 1
 
 def axial_northeast(col, slant):
-    return _tuple_add((col, slant), (1, -1))
+    return col + 1, slant - 1
 
 def axial_southeast(col, slant):
-    return _tuple_add((col, slant), (1, 0))
+    return col + 1, slant
 
 def axial_northwest(col, slant):
-    return _tuple_add((col, slant), (-1, 0))
+    return col - 1, slant
 
 def axial_southwest(col, slant):
-    return _tuple_add((col, slant), (-1, 1))
+    return col - 1, slant + 1
 
 def axial_east(col, slant):
-    return _tuple_add((col, slant), (2, -1))
+    return col + 2, slant - 1
 
 def axial_west(col, slant):
-    return _tuple_add((col, slant), (-2, 1))
+    return col - 2, slant + 1
+
+
+_CUBIC_MOVES = {cubic_north : CUBIC_DIRECTIONS["north"],
+                cubic_south : CUBIC_DIRECTIONS["south"],
+                cubic_northeast : CUBIC_DIRECTIONS["northeast"],
+                cubic_southeast : CUBIC_DIRECTIONS["southeast"],
+                cubic_northwest : CUBIC_DIRECTIONS["northwest"],
+                cubic_southwest : CUBIC_DIRECTIONS["southwest"],
+                cubic_east : CUBIC_DIRECTIONS["east"],
+                cubic_west : CUBIC_DIRECTIONS["west"]}
+
+_AXIAL_MOVES = {axial_north : AXIAL_DIRECTIONS["north"],
+                axial_south : AXIAL_DIRECTIONS["south"],
+                axial_northeast : AXIAL_DIRECTIONS["northeast"],
+                axial_southeast : AXIAL_DIRECTIONS["southeast"],
+                axial_northwest : AXIAL_DIRECTIONS["northwest"],
+                axial_southwest : AXIAL_DIRECTIONS["southwest"],
+                axial_east : AXIAL_DIRECTIONS["east"],
+                axial_west : AXIAL_DIRECTIONS["west"]}
@@ -0,0 +1,279 @@
+"""
+Movement planning over hexes in axial (col, slant) coordinates, the
+coordinates HexGrid indexes by.
+
+Step costs come from cost(a, b), the cost of moving from hex a to the
+adjacent hex b, or None where that move is impossible.  Without a cost
+function every move costs 1.  Moves follow the named hex_math directions,
+the six adjacent ones by default, add "east" and "west" to allow moves
+across a vertex.
+
+Searches only end on their own when costs are None beyond the edges of the
+map.  Otherwise limit them with area, any container of the coordinates
+that may be entered such as a HexGrid, or with max_cost.
+"""
+
+
+from collections    import OrderedDict, deque
+from heapq          import heappop, heappush
+
+from .hex_math      import (ADJACENT_DIRECTIONS, AXIAL_DIRECTIONS,
+                            axial_distance)
+
+
+INFINITY = float("inf")
+
+
+def _unit_cost(a, b):
+    return 1
+
+def _changes(directions):
+    return [AXIAL_DIRECTIONS[name] for name in directions]
+
+def find_path(start, goal, cost = None, directions = ADJACENT_DIRECTIONS,
+                area = None, max_cost = None, min_cost = 1):
+    """
+    Return the cheapest list of hexes leading from start to goal, both
+    included, or None if there is none.
+
+    A* search guided by the hex distance to the goal, scaled so it never
+    overestimates:  min_cost must be at most the cost of any move, and a
+    move across a vertex is counted as covering two hexes.
+    """
+    cost = _unit_cost if cost is None else cost
+    changes = _changes(directions)
+    reach = max(axial_distance(dcol, dslant, 0, 0)
+                for dcol, dslant in changes)
+    scale = min_cost / reach
+    goal_col, goal_slant = goal
+
+    known = {start : 0}
+    previous = {}
+    frontier = [(axial_distance(*start, goal_col, goal_slant) * scale, 0,
+                    start)]
+    while frontier:
+        _, spent, here = heappop(frontier)
+        if here == goal:
+            path = [here]
+            while here in previous:
+                here = previous[here]
+                path.append(here)
+            path.reverse()
+            return path
+        if spent > known[here]:
+            continue            # reached more cheaply since queued
+        col, slant = here
+        for dcol, dslant in changes:
+            there = (col + dcol, slant + dslant)
+            if area is not None and there not in area:
+                continue
+            step = cost(here, there)
+            if step is None:
+                continue
+            total = spent + step
+            if max_cost is not None and total > max_cost:
+                continue
+            if total < known.get(there, INFINITY):
+                known[there] = total
+                previous[there] = here
+                estimate = axial_distance(*there, goal_col, goal_slant)
+                heappush(frontier, (total + estimate * scale, total, there))
+    return None
+
+
+class FlowField:
+    """
+    Cheapest way to one goal from every hex that can reach it, so any number
+    of units heading there only look up their next step.
+
+    Built by a search outward from the goal, breadth first when every move
+    costs 1 and Dijkstra's otherwise.  When the cost of some hexes changes,
+    update repairs the field, redoing only the hexes whose route went
+    through them and any that the change gives a cheaper route.  For the
+    repair to be complete, a move's cost may only depend on the two hexes
+    it joins.
+    """
+
+    def __init__(self, goal, cost = None, directions = ADJACENT_DIRECTIONS,
+                    area = None, max_cost = None):
+        if cost is None and area is None and max_cost is None:
+            raise ValueError("A flow field without costs needs an area or a "
+                                "max_cost to end.")
+        self.goal = goal
+        self.cost = _unit_cost if cost is None else cost
+        self.area = area
+        self.max_cost = max_cost
+        self._changes = _changes(directions)
+        self.distances = {goal : 0}
+        self.next_steps = {}
+        if cost is None:
+            self._breadth_first()
+        else:
+            self._settle([(0, goal)])
+
+    def __contains__(self, coord):
+        return coord in self.distances
+
+    def distance(self, coord):
+        """
+        Cost of the cheapest route from coord to the goal, None if there is
+        none.
+        """
+        return self.distances.get(coord)
+
+    def next_step(self, coord):
+        """
+        Hex to move to from coord, None at the goal or where the goal cannot
+        be reached.
+        """
+        return self.next_steps.get(coord)
+
+    def path(self, start):
+        """
+        Return the hexes leading from start to the goal, both included, or
+        None if the goal cannot be reached.
+        """
+        if start not in self.distances:
+            return None
+        path = [start]
+        while path[-1] != self.goal:
+            path.append(self.next_steps[path[-1]])
+        return path
+
+    def _breadth_first(self):
+        queue = deque([self.goal])
+        while queue:
+            here = queue.popleft()
+            total = self.distances[here] + 1
+            if self.max_cost is not None and total > self.max_cost:
+                continue
+            col, slant = here
+            for dcol, dslant in self._changes:
+                there = (col - dcol, slant - dslant)
+                if there in self.distances or (self.area is not None and
+                                                there not in self.area):
+                    continue
+                self.distances[there] = total
+                self.next_steps[there] = here
+                queue.append(there)
+
+    def _settle(self, frontier):
+        """
+        Dijkstra's search outward from the queued (distance, hex) pairs,
+        lowering any distance it improves on.
+        """
+        distances = self.distances
+        next_steps = self.next_steps
+        while frontier:
+            spent, here = heappop(frontier)
+            if spent != distances.get(here):
+                continue        # improved since queued
+            col, slant = here
+            for dcol, dslant in self._changes:
+                there = (col - dcol, slant - dslant)
+                if self.area is not None and there not in self.area:
+                    continue
+                step = self.cost(there, here)
+                if step is None:
+                    continue
+                total = spent + step
+                if self.max_cost is not None and total > self.max_cost:
+                    continue
+                if total < distances.get(there, INFINITY):
+                    distances[there] = total
+                    next_steps[there] = here
+                    heappush(frontier, (total, there))
+
+    def update(self, changed):
+        """
+        Repair the field after the cost of moving into or out of the changed
+        hexes has changed.
+        """
+        affected = set(changed)
+        queue = deque(affected)
+        while queue:            # every hex whose route ran through a change
+            col, slant = queue.popleft()
+            for dcol, dslant in self._changes:
+                there = (col - dcol, slant - dslant)
+                if (there not in affected and
+                        self.next_steps.get(there) == (col, slant)):
+                    affected.add(there)
+                    queue.append(there)
+        for coord in affected:
+            self.distances.pop(coord, None)
+            self.next_steps.pop(coord, None)
+
+        frontier = []
+        if self.goal in affected:
+            affected.discard(self.goal)
+            self.distances[self.goal] = 0
+            heappush(frontier, (0, self.goal))
+        for coord in affected:  # restart from the unaffected hexes around
+            if self.area is not None and coord not in self.area:
+                continue
+            best = INFINITY
+            col, slant = coord
+            for dcol, dslant in self._changes:
+                there = (col + dcol, slant + dslant)
+                if there not in self.distances or there in affected:
+                    continue
+                step = self.cost(coord, there)
+                if step is not None and self.distances[there] + step < best:
+                    best = self.distances[there] + step
+                    self.next_steps[coord] = there
+            if best < INFINITY and (self.max_cost is None or
+                                    best <= self.max_cost):
+                self.distances[coord] = best
+                heappush(frontier, (best, coord))
+            else:
+                self.next_steps.pop(coord, None)
+        self._settle(frontier)
+
+
+class FlowFieldCache:
+    """
+    Flow fields toward the most recently used goals, at most max_fields of
+    them, shared by every unit heading to the same goal.  Call
+    tiles_changed when costs change to repair every cached field.
+    """
+
+    def __init__(self, cost = None, directions = ADJACENT_DIRECTIONS,
+                    area = None, max_cost = None, max_fields = 64):
+        self.cost = cost
+        self.directions = directions
+        self.area = area
+        self.max_cost = max_cost
+        self.max_fields = max_fields
+        self._fields = OrderedDict()
+
+    def __len__(self):
+        return len(self._fields)
+
+    def field(self, goal):
+        """
+        The flow field toward goal, built if it is not cached.
+        """
+        field = self._fields.get(goal)
+        if field is None:
+            field = FlowField(goal, self.cost, self.directions, self.area,
+                                self.max_cost)
+            self._fields[goal] = field
+            while len(self._fields) > self.max_fields:
+                self._fields.popitem(last = False)
+        else:
+            self._fields.move_to_end(goal)
+        return field
+
+    def next_step(self, start, goal):
+        return self.field(goal).next_step(start)
+
+    def path(self, start, goal):
+        return self.field(goal).path(start)
+
+    def tiles_changed(self, changed):
+        changed = list(changed)
+        for field in self._fields.values():
+            field.update(changed)
+
+    def clear(self):
+        self._fields.clear()
@@ -27,5 +27,6 @@ setup(
     keywords = "gui io",
     python_requires = ">=3",
     packages = find_packages(),
+    extras_require = {"numpy" : ["numpy"]},
 #    test_suite = "tests"
 )
@@ -0,0 +1,97 @@
+from os.path                    import join
+from tempfile                   import TemporaryDirectory
+from unittest                   import TestCase, skipUnless
+
+from chadlib.collection         import HexGrid
+from chadlib.utility.hex_coord  import HexCoord
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestHexGrid(TestCase):
+
+    def test_shapes(self):
+        self.assertEqual(12, len(HexGrid.parallelogram(4, 3)))
+        self.assertEqual(12, len(HexGrid.rectangle(4, 3)))
+        self.assertEqual(19, len(HexGrid.hexagon(2)))
+        hexagon = HexGrid.hexagon(2)
+        for col, slant in hexagon.coords():
+            self.assertLessEqual(HexCoord.from_axial(col, slant).distance(
+                                                        (0, 0, 0)), 2)
+        self.assertNotIn((2, 1), hexagon)
+        self.assertIn((2, -1), hexagon)
+
+    def test_rectangle_rows(self):
+        grid = HexGrid.rectangle(4, 3)
+        self.assertIn((3, -1), grid)
+        self.assertNotIn((3, 2), grid)
+        self.assertEqual(0, grid.index(0, 0))
+
+    def test_index_round_trip(self):
+        grid = HexGrid.hexagon(3)
+        coords = list(grid.coords())
+        self.assertEqual(len(grid), len(set(coords)))
+        for i, coord in enumerate(coords):
+            self.assertEqual(i, grid.index(*coord))
+            self.assertEqual(coord, grid.coord(i))
+        with self.assertRaises(KeyError):
+            grid.index(4, 0)
+        with self.assertRaises(IndexError):
+            grid.coord(len(grid))
+
+    def test_typed_layers(self):
+        grid = HexGrid.parallelogram(5, 5, {"terrain" : "B", "height" : "f"})
+        grid[2, 3] = 7
+        grid.set(2, 3, 1.5, "height")
+        self.assertEqual(7, grid.get(2, 3, "terrain"))
+        self.assertEqual(1.5, grid.get(2, 3, "height"))
+        self.assertEqual(0, grid[3, 2])
+        with self.assertRaises((TypeError, ValueError)):
+            grid[0, 0] = 256
+        grid.fill(4, "terrain")
+        self.assertEqual([4] * 25, grid.layer("terrain").tolist())
+
+    def test_neighbors(self):
+        grid = HexGrid.hexagon(1)
+        self.assertEqual(6, len(list(grid.neighbors(0, 0))))
+        self.assertEqual(3, len(list(grid.neighbors(1, 0))))
+        table = grid.neighbor_indices()
+        for i, coord in enumerate(grid.coords()):
+            expected = [grid.index(*c) for c in grid.neighbors(*coord)]
+            self.assertEqual(expected, [j for j in table[6 * i:6 * i + 6]
+                                        if j >= 0])
+
+    def test_file_backed(self):
+        with TemporaryDirectory() as directory:
+            path = join(directory, "map.grid")
+            with HexGrid.hexagon(10, {"terrain" : "H"}, path) as grid:
+                grid[3, -2] = 500
+            with HexGrid.hexagon(10, {"terrain" : "H"}, path) as grid:
+                self.assertEqual(500, grid[3, -2])
+                self.assertEqual(0, grid[0, 0])
+
+    def test_file_of_another_shape_rejected(self):
+        with TemporaryDirectory() as directory:
+            path = join(directory, "map.grid")
+            with HexGrid.hexagon(10, {"terrain" : "H"}, path):
+                pass
+            with self.assertRaises(ValueError):
+                HexGrid.hexagon(11, {"terrain" : "H"}, path)
+            with self.assertRaises(ValueError):
+                HexGrid.hexagon(10, {"terrain" : "d"}, path)
+            with self.assertRaises(ValueError):
+                HexGrid.parallelogram(0, 0, path = join(directory, "empty"))
+            with HexGrid.hexagon(10, {"terrain" : "H"}, path) as grid:
+                self.assertEqual(0, grid[0, 0])
+
+    @skipUnless(numpy, "NumPy is not installed")
+    def test_numpy_view(self):
+        grid = HexGrid.rectangle(10, 10, {"height" : "d"})
+        heights = grid.array()
+        heights[:] = numpy.arange(len(grid))
+        self.assertEqual(grid.index(4, 1), grid[4, 1])
+        neighbors = numpy.asarray(grid.neighbor_indices()).reshape(-1, 6)
+        self.assertEqual((100, 6), neighbors.shape)
@@ -0,0 +1,109 @@
+from queue          import Queue
+from socket         import socket
+from time           import sleep, time
+from unittest.mock  import MagicMock
+from unittest       import TestCase
+
+from chadlib.io     import AsyncConnection, LoopQueue
+
+
+def get_free_port():
+    with socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for(predicate, timeout = 5):
+    end = time() + timeout
+    while not predicate() and time() < end:
+        sleep(0.01)
+    return predicate()
+
+
+class TestAsyncConnection(TestCase):
+
+    def setUp(self):
+        self.port = get_free_port()
+        self.host_receive = Queue()
+        self.peer_send = LoopQueue()
+        self.host = AsyncConnection(MagicMock(), LoopQueue(), 
+                                    self.host_receive)
+        self.peer = AsyncConnection(MagicMock(), self.peer_send, Queue())
+
+    def tearDown(self):
+        self.peer.close()
+        self.host.close()
+
+    def test_shared_loop(self):
+        self.assertIs(self.host.loop, self.peer.loop)
+
+    def test_send_and_receive(self):
+        self.host.startup_accept(self.port)
+        sleep(0.1)
+        self.peer.startup_connect(self.port, "127.0.0.1")
+        self.assertTrue(wait_for(lambda: self.host.active and 
+                                            self.peer.active))
+
+        messages = [b"first", b"", b"x" * 100000]
+        for message in messages:
+            self.peer_send.put(message)
+        for message in messages:
+            self.assertEqual(message, self.host_receive.get(timeout = 5))
+        self.host.controller.start_processing_receive_queue.assert_called()
+
+    def test_close_releases_receive_queue(self):
+        self.host.startup_accept(self.port)
+        sleep(0.1)
+        self.peer.startup_connect(self.port, "127.0.0.1")
+        self.assertTrue(wait_for(lambda: self.host.active))
+        self.host.close()
+        self.assertFalse(self.host.active)
+        self.assertIsNone(self.host_receive.get(timeout = 5))
+
+
+class TestAsyncConnectionPlainQueues(TestCase):
+
+    PAIR_COUNT = 8
+
+    def setUp(self):
+        self.pairs = []
+        for _ in range(self.PAIR_COUNT):
+            port = get_free_port()
+            host = AsyncConnection(MagicMock(), Queue(), Queue())
+            peer = AsyncConnection(MagicMock(), Queue(), Queue())
+            host.startup_accept(port)
+            self.pairs.append((host, peer, port))
+        sleep(0.1)
+        for _, peer, port in self.pairs:
+            peer.startup_connect(port, "127.0.0.1")
+
+    def tearDown(self):
+        for host, peer, _ in self.pairs:
+            peer.close()
+            host.close()
+
+    def test_many_pairs_with_plain_queues(self):
+        self.assertTrue(wait_for(lambda: all(host.active and peer.active 
+                                        for host, peer, _ in self.pairs)))
+        for i, (_, peer, _) in enumerate(self.pairs):
+            peer.send_queue.put(str(i).encode())
+        for i, (host, _, _) in enumerate(self.pairs):
+            self.assertEqual(str(i).encode(), 
+                                host.receive_queue.get(timeout = 5))
+
+    def test_plain_queues_left_unmodified(self):
+        self.assertTrue(wait_for(lambda: all(host.active and peer.active 
+                                        for host, peer, _ in self.pairs)))
+        for host, peer, _ in self.pairs:
+            for queue in (host.send_queue, peer.send_queue):
+                self.assertNotIn("_put", vars(queue))
+                self.assertFalse(hasattr(queue, "add_waiter"))
+
+    def test_startup_failure_is_logged(self):
+        other = AsyncConnection(MagicMock(), Queue(), Queue())
+        with socket() as taken:
+            taken.bind(("", 0))
+            taken.listen(1)
+            with self.assertLogs("chadlib.io.async_connection", "WARNING"):
+                other.startup_accept(taken.getsockname()[1])
+                wait_for(lambda: False, 0.5)
+        other.close()
@@ -0,0 +1,51 @@
+from queue          import Full
+from threading      import Thread
+from unittest       import TestCase
+
+from chadlib.io     import BoundedQueue
+
+
+class TestBoundedQueue(TestCase):
+
+    def test_watermarks(self):
+        queue = BoundedQueue(max_messages = 4)
+        for i in range(4):
+            queue.put(i)
+        self.assertTrue(queue.paused)
+        queue.get()
+        self.assertTrue(queue.paused)
+        queue.get()
+        self.assertFalse(queue.paused)
+
+    def test_byte_limit_raise(self):
+        queue = BoundedQueue(max_bytes = 10, policy = BoundedQueue.RAISE)
+        queue.put(b"x" * 10)
+        with self.assertRaises(Full):
+            queue.put(b"y")
+
+    def test_drop_oldest(self):
+        queue = BoundedQueue(max_messages = 2, 
+                                policy = BoundedQueue.DROP_OLDEST)
+        for item in (b"a", b"b", b"c"):
+            queue.put(item)
+        self.assertEqual(1, queue.dropped)
+        self.assertEqual([b"b", b"c"], [queue.get(), queue.get()])
+
+    def test_block_until_resumed(self):
+        queue = BoundedQueue(max_messages = 2)
+        queue.put(1)
+        queue.put(2)
+        with self.assertRaises(Full):
+            queue.put(3, timeout = 0.01)
+        t = Thread(target = queue.put, args = (3,))
+        t.start()
+        self.assertEqual(1, queue.get())
+        self.assertEqual(2, queue.get())
+        t.join(5)
+        self.assertEqual(3, queue.get(timeout = 5))
+
+    def test_none_is_never_limited(self):
+        queue = BoundedQueue(max_messages = 1, policy = BoundedQueue.RAISE)
+        queue.put(b"a")
+        queue.put(None)
+        self.assertEqual(2, queue.qsize())
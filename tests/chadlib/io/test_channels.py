@@ -0,0 +1,105 @@
+from queue          import Empty, Queue
+from unittest.mock  import MagicMock
+from unittest       import TestCase
+
+from chadlib.io     import ChannelRouter, ChannelScheduler, Connection
+from chadlib.io.channels    import CHUNK_HEADER
+
+from .test_async_connection import get_free_port, wait_for
+
+
+class TestChannelScheduler(TestCase):
+
+    def setUp(self):
+        self.scheduler = ChannelScheduler(chunk_size = 4)
+        self.scheduler.add_channel(1, priority = 10)
+        self.scheduler.add_channel(2, weight = 2)
+
+    def drain(self):
+        chunks = []
+        while not self.scheduler.empty():
+            chunk = self.scheduler.get_nowait()
+            channel_id, flags = CHUNK_HEADER.unpack_from(chunk)
+            chunks.append((channel_id, chunk[CHUNK_HEADER.size:]))
+        return chunks
+
+    def test_chunks(self):
+        self.scheduler.put(b"0123456789")
+        self.scheduler.put(b"")
+        self.assertEqual(2, self.scheduler.qsize())
+        self.assertEqual([(0, b"0123"), (0, b"4567"), (0, b"89"), (0, b"")],
+                            self.drain())
+        self.assertEqual(0, self.scheduler.qsize())
+        self.assertEqual(0, self.scheduler.bytes)
+        with self.assertRaises(Empty):
+            self.scheduler.get(timeout = 0.01)
+
+    def test_priority_interleaves_large_message(self):
+        self.scheduler.put(b"x" * 12)
+        self.assertEqual(CHUNK_HEADER.pack(0, 0) + b"xxxx", 
+                            self.scheduler.get())
+        self.scheduler.send(1, b"urgent")
+        self.assertEqual([(1, b"urge"), (1, b"nt"), (0, b"xxxx"), 
+                            (0, b"xxxx")], self.drain())
+
+    def test_weights(self):
+        self.scheduler.put(b"a" * 12)
+        self.scheduler.send(2, b"b" * 12)
+        self.assertEqual([0, 2, 2, 0, 2, 0], 
+                            [channel_id for channel_id, _ in self.drain()])
+
+    def test_none_wakes_get(self):
+        self.scheduler.put(b"data")
+        self.scheduler.put(None)
+        self.assertIsNone(self.scheduler.get())
+        self.assertEqual([(0, b"data")], self.drain())
+
+
+class TestChannelRouter(TestCase):
+
+    def test_reassembles_per_channel(self):
+        scheduler = ChannelScheduler(chunk_size = 3)
+        scheduler.add_channel(1)
+        scheduler.put(b"channel zero")
+        scheduler.send(1, b"one")
+        scheduler.send(1, b"channel one")
+        router = ChannelRouter()
+        zero = Queue()
+        one = []
+        router.route(0, zero)
+        router.route(1, one.append)
+        while not scheduler.empty():
+            router.process_received_data(scheduler.get())
+        self.assertEqual(b"channel zero", zero.get_nowait())
+        self.assertEqual([b"one", b"channel one"], one)
+
+
+class TestChannelsOverConnection(TestCase):
+
+    def setUp(self):
+        port = get_free_port()
+        self.scheduler = ChannelScheduler()
+        self.scheduler.add_channel(1, priority = 1)
+        self.router = ChannelRouter()
+        self.host = Connection(MagicMock(), Queue(), Queue())
+        self.peer = Connection(MagicMock(), self.scheduler, Queue())
+        self.host.startup_accept(port)
+        wait_for(lambda: self.host.listener is not None)
+        self.peer.startup_connect(port, "127.0.0.1")
+        self.assertTrue(wait_for(lambda: self.host.active and 
+                                            self.peer.active))
+
+    def tearDown(self):
+        self.peer.close()
+        self.host.close()
+
+    def test_channels(self):
+        received = []
+        self.router.route(0, received.append)
+        self.router.route(1, received.append)
+        self.scheduler.put(b"b" * 1000000)
+        self.scheduler.send(1, b"control")
+        while len(received) < 2:
+            self.router.process_received_data(
+                                    self.host.receive_queue.get(timeout = 5))
+        self.assertEqual({b"b" * 1000000, b"control"}, set(received))
@@ -1,7 +1,14 @@
+from queue          import Queue
+from socket         import create_connection
+from struct         import pack
+from time           import sleep, time
 from unittest.mock  import MagicMock
 from unittest       import TestCase
 
-from chadlib.io     import Connection
+from chadlib.io     import BoundedQueue, Connection
+from chadlib.io.connection  import advance_buffers
+
+from .test_async_connection import get_free_port, wait_for
 
 
 class TestConnection(TestCase):
@@ -11,3 +18,178 @@ class TestConnection(TestCase):
 
     def tearDown(self):
         self.connection.close()
+
+    def test_advance_buffers(self):
+        buffers = [b"abc", b"", b"defg", b"h"]
+        self.assertEqual([b"efg", b"h"], 
+                        [bytes(b) for b in advance_buffers(buffers, 4)])
+        self.assertEqual([], advance_buffers(buffers, 8))
+
+
+class TestConnectionReceive(TestCase):
+
+    def setUp(self):
+        port = get_free_port()
+        self.receive_queue = Queue()
+        self.connection = Connection(MagicMock(), Queue(), self.receive_queue)
+        self.connection.startup_accept(port)
+        sleep(0.1)
+        self.peer = create_connection(("127.0.0.1", port))
+        self.assertTrue(wait_for(lambda: self.connection.active))
+
+    def tearDown(self):
+        self.peer.close()
+        self.connection.close()
+
+    def frame(self, data):
+        return pack(Connection.HEADER_PACK_STR, Connection.HEADER_VERSION, 
+                    0, 0, len(data)) + data
+
+    def test_unsupported_version_disconnects(self):
+        self.peer.sendall(pack(Connection.HEADER_PACK_STR, 1, 0, 0, 2) + b"hi")
+        self.assertTrue(wait_for(lambda: 
+                                self.connection.controller.disconnect.called))
+
+    def test_split_frame(self):
+        frame = self.frame(b"y" * 5000)
+        for i in range(0, len(frame), 1000):
+            self.peer.sendall(frame[i:i + 1000])
+            sleep(0.01)
+        self.assertEqual(b"y" * 5000, self.receive_queue.get(timeout = 5))
+
+    def test_coalesced_frames(self):
+        messages = [b"one", b"two", b"", b"three"]
+        self.peer.sendall(b"".join(self.frame(m) for m in messages))
+        for message in messages:
+            self.assertEqual(message, self.receive_queue.get(timeout = 5))
+
+
+class TestConnectionSend(TestCase):
+
+    CODECS = ()
+
+    def setUp(self):
+        port = get_free_port()
+        self.host = Connection(MagicMock(), Queue(), Queue())
+        self.peer = Connection(MagicMock(), Queue(), Queue())
+        self.host.COMPRESSION_CODECS = self.CODECS
+        self.peer.COMPRESSION_CODECS = self.CODECS
+        self.host.startup_accept(port)
+        sleep(0.1)
+        self.peer.startup_connect(port, "127.0.0.1")
+        self.assertTrue(wait_for(lambda: self.host.active and 
+                                            self.peer.active))
+
+    def tearDown(self):
+        self.peer.close()
+        self.host.close()
+
+    def test_batched_messages_stay_separate(self):
+        messages = [str(i).encode() * (i % 7) for i in range(1000)]
+        for message in messages:
+            self.peer.send_queue.put(message)
+        for message in messages:
+            self.assertEqual(message, self.host.receive_queue.get(timeout = 5))
+
+    def test_metrics(self):
+        for i in range(10):
+            self.peer.send_queue.put(b"m" * i)
+        for i in range(10):
+            self.host.receive_queue.get(timeout = 5)
+        self.assertTrue(wait_for(lambda: self.peer.metrics.bytes_out == 
+                                            self.host.metrics.bytes_in))
+        sent = self.peer.metrics.snapshot()
+        self.assertEqual(10, sent["messages_out"])
+        self.assertEqual(10, self.host.metrics.snapshot()["messages_in"])
+        self.assertEqual(10, sent["send_time"]["count"])
+
+    def test_close_is_immediate(self):
+        start = time()
+        self.host.close()
+        self.assertLess(time() - start, Connection.SELECT_TIMEOUT_INTERVAL)
+        self.assertIsNone(self.host.receive_queue.get(timeout = 1))
+
+    def test_full_duplex(self):
+        large = b"z" * 8000000
+        self.peer.send_queue.put(large)
+        self.host.send_queue.put(b"small")
+        self.assertEqual(b"small", self.peer.receive_queue.get(timeout = 5))
+        self.assertEqual(large, self.host.receive_queue.get(timeout = 5))
+
+    def test_large_message(self):
+        message = bytes(range(256)) * 8192
+        self.peer.send_queue.put(message)
+        self.assertEqual(message, self.host.receive_queue.get(timeout = 5))
+
+
+class TestConnectionHeartbeat(TestCase):
+
+    def setUp(self):
+        self.port = get_free_port()
+        self.host = Connection(MagicMock(), Queue(), Queue())
+        self.host.HEARTBEAT_INTERVAL = 0.05
+        self.host.startup_accept(self.port)
+        sleep(0.1)
+
+    def tearDown(self):
+        self.host.close()
+
+    def test_rtt_measured(self):
+        peer = Connection(MagicMock(), Queue(), Queue())
+        peer.startup_connect(self.port, "127.0.0.1")
+        try:
+            self.assertTrue(wait_for(lambda: self.host.rtt is not None))
+            self.assertLess(self.host.rtt, 1.0)
+            self.assertIsNotNone(self.host.rtt_variance)
+            self.assertFalse(self.host.controller.disconnect.called)
+            self.assertTrue(self.host.receive_queue.empty())
+        finally:
+            peer.close()
+
+    def test_silent_peer_disconnected(self):
+        peer = create_connection(("127.0.0.1", self.port))
+        try:
+            self.assertTrue(wait_for(lambda: self.host.active))
+            self.assertTrue(wait_for(lambda: 
+                                    self.host.controller.disconnect.called))
+            self.assertIsNone(self.host.rtt)
+        finally:
+            peer.close()
+
+
+class TestCompressedConnectionSend(TestConnectionSend):
+
+    CODECS = ("lzma", "zlib")
+
+    def test_codec_agreed(self):
+        self.assertTrue(wait_for(lambda: 
+                        self.peer.frame_codec.send_codec is not None))
+        self.assertEqual("lzma", self.peer.frame_codec.send_codec.name)
+
+
+class TestConnectionBackpressure(TestCase):
+
+    def setUp(self):
+        port = get_free_port()
+        self.host = Connection(MagicMock(), Queue(), 
+                                BoundedQueue(max_messages = 10))
+        self.peer = Connection(MagicMock(), Queue(), Queue())
+        self.host.startup_accept(port)
+        sleep(0.1)
+        self.peer.startup_connect(port, "127.0.0.1")
+        self.assertTrue(wait_for(lambda: self.host.active and 
+                                            self.peer.active))
+
+    def tearDown(self):
+        self.peer.close()
+        self.host.close()
+
+    def test_reads_pause_while_full(self):
+        messages = [str(i).encode() * 10000 for i in range(200)]
+        for message in messages:
+            self.peer.send_queue.put(message)
+        self.assertTrue(wait_for(lambda: self.host.receive_queue.paused))
+        sleep(0.2)
+        self.assertLess(self.host.receive_queue.qsize(), 100)
+        for message in messages:
+            self.assertEqual(message, self.host.receive_queue.get(timeout = 5))
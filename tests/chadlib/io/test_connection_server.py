@@ -0,0 +1,96 @@
+from queue          import Queue
+from socket         import socket
+from time           import sleep
+from unittest.mock  import MagicMock
+from unittest       import TestCase
+
+from chadlib.io     import Connection, ConnectionServer, ServerController
+
+from .test_async_connection import get_free_port, wait_for
+
+
+class RecordingController(ServerController):
+
+    def __init__(self):
+        self.connected = []
+        self.disconnected = []
+
+    def peer_connected(self, peer_id):
+        self.connected.append(peer_id)
+
+    def peer_disconnected(self, peer_id):
+        self.disconnected.append(peer_id)
+
+
+class TestConnectionServer(TestCase):
+
+    PEER_COUNT = 5
+
+    def setUp(self):
+        self.port = get_free_port()
+        self.server = ConnectionServer(RecordingController())
+        self.server.startup_accept(self.port)
+        self.clients = []
+        for _ in range(self.PEER_COUNT):
+            client = Connection(MagicMock(), Queue(), Queue())
+            client.startup_connect(self.port, "127.0.0.1")
+            self.clients.append(client)
+        wait_for(lambda: all(client.active for client in self.clients) and
+                    len(self.server.controller.connected) == self.PEER_COUNT)
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.server.close()
+
+    def test_accepts_many_peers(self):
+        self.assertEqual(self.PEER_COUNT, len(self.server.peer_ids))
+        self.assertListEqual(sorted(self.server.peer_ids), 
+                                sorted(self.server.controller.connected))
+
+    def test_per_peer_receive_queues(self):
+        self.assertTrue(wait_for(lambda: all(client.active 
+                                                for client in self.clients)))
+        for i, client in enumerate(self.clients):
+            client.send_queue.put(str(i).encode())
+        received = set()
+        for peer_id in self.server.peer_ids:
+            received.add(self.server.get_incoming_data(peer_id))
+        self.assertSetEqual({str(i).encode() for i in range(self.PEER_COUNT)},
+                            received)
+
+    def test_broadcast(self):
+        self.assertTrue(wait_for(lambda: all(client.active 
+                                                for client in self.clients)))
+        self.server.broadcast(b"hello")
+        for client in self.clients:
+            self.assertEqual(b"hello", client.receive_queue.get(timeout = 5))
+
+    def test_peer_disconnect(self):
+        self.assertTrue(wait_for(lambda: self.clients[0].active))
+        self.clients[0].close()
+        self.assertTrue(wait_for(lambda: len(self.server.peer_ids) == 
+                                            self.PEER_COUNT - 1))
+        self.assertEqual(1, len(self.server.controller.disconnected))
+
+    def test_requires_server_controller(self):
+        with self.assertRaises(RuntimeError):
+            ConnectionServer(object())
+
+    def test_port_in_use(self):
+        with socket() as taken:
+            taken.bind(("", 0))
+            taken.listen(1)
+            other = ConnectionServer()
+            with self.assertRaises(OSError):
+                other.startup_accept(taken.getsockname()[1])
+            self.assertFalse(other.active)
+
+    def test_heartbeats_echoed(self):
+        client = Connection(MagicMock(), Queue(), Queue())
+        client.HEARTBEAT_INTERVAL = 0.05
+        client.startup_connect(self.port, "127.0.0.1")
+        self.clients.append(client)
+        self.assertTrue(wait_for(lambda: client.rtt is not None))
+        sleep(0.2)
+        self.assertFalse(client.controller.disconnect.called)
@@ -0,0 +1,147 @@
+from queue          import Empty, Queue
+from socket         import socket, AF_INET, SOCK_DGRAM
+from time           import sleep
+from unittest.mock  import MagicMock
+from unittest       import TestCase
+
+from chadlib.io     import DatagramConnection, Reliable
+from chadlib.io.datagram_connection import SEQ_MODULO, seq_after
+
+from .test_async_connection import get_free_port, wait_for
+
+
+class LossyDatagramConnection(DatagramConnection):
+    """
+    Loses every third packet it sends.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.packets = 0
+
+    def _write(self, sock, packets):
+        kept = []
+        for packet in packets:
+            self.packets += 1
+            if self.packets % 3:
+                kept.append(packet)
+        super()._write(sock, kept)
+
+
+class TestDatagramConnection(TestCase):
+
+    PEER_CLASS = DatagramConnection
+
+    def setUp(self):
+        port = get_free_port()
+        self.host = DatagramConnection(MagicMock(), Queue(), Queue())
+        self.peer = self.PEER_CLASS(MagicMock(), Queue(), Queue())
+        self.host.startup_accept(port)
+        wait_for(lambda: self.host.listener is not None)
+        self.peer.startup_connect(port, "127.0.0.1")
+        self.assertTrue(wait_for(lambda: self.host.active and 
+                                            self.peer.active))
+
+    def tearDown(self):
+        self.peer.close()
+        self.host.close()
+
+    def received(self, count):
+        return [self.host.receive_queue.get(timeout = 5) 
+                for _ in range(count)]
+
+    def test_messages(self):
+        for i in range(10):
+            self.peer.send_queue.put(bytes([i]))
+            sleep(0.001)
+        self.assertEqual([bytes([i]) for i in range(10)], self.received(10))
+
+    def test_fragmented_message(self):
+        data = bytes(range(256)) * 40
+        self.peer.send_queue.put(data)
+        self.assertEqual([data], self.received(1))
+
+    def test_reliable_in_order(self):
+        messages = [Reliable(str(i).encode() * 500) for i in range(50)]
+        for message in messages:
+            self.peer.send_queue.put(message)
+        self.assertEqual(messages, self.received(50))
+
+    def test_stale_dropped(self):
+        handle = self.host._handle_packet
+        for seq in (5, 3, 6):
+            handle(None, self.host._packet(DatagramConnection.DATA, seq, 
+                                            data = bytes([seq])))
+        self.assertEqual([b"\5", b"\6"], self.received(2))
+        self.assertEqual(1, self.host.stale_dropped)
+
+    def test_sequence_wraparound(self):
+        self.host._newest_seq = SEQ_MODULO - 2
+        self.peer._reliable_seq = SEQ_MODULO - 2
+        self.host._expected_reliable = SEQ_MODULO - 1
+        for i in range(4):
+            self.peer.send_queue.put(Reliable(bytes([i])))
+        self.assertEqual([bytes([i]) for i in range(4)], self.received(4))
+        handle = self.host._handle_packet
+        for seq in (SEQ_MODULO - 1, 0, SEQ_MODULO - 3, 1):
+            handle(None, self.host._packet(DatagramConnection.DATA, seq, 
+                                            data = bytes([seq % 256])))
+        self.assertEqual([b"\xff", b"\0", b"\1"], self.received(3))
+        self.assertEqual(1, self.host.stale_dropped)
+
+    def test_close_disconnects_peer(self):
+        self.peer.close()
+        self.assertTrue(wait_for(lambda: 
+                                self.host.controller.disconnect.called))
+
+
+class TestLossyDatagramConnection(TestDatagramConnection):
+
+    PEER_CLASS = LossyDatagramConnection
+
+    def test_messages(self):
+        for i in range(9):
+            self.peer.send_queue.put(bytes([i]))
+            sleep(0.001)
+        self.assertEqual(6, len(self.received(6)))
+
+    def test_fragmented_message(self):
+        self.peer.send_queue.put(bytes(range(256)) * 40)    # 9 fragments
+        self.peer.send_queue.put(b"after")
+        self.assertEqual([b"after"], self.received(1))
+        with self.assertRaises(Empty):
+            self.host.receive_queue.get(timeout = 0.2)
+
+    def test_reliable_in_order(self):
+        super().test_reliable_in_order()
+        self.assertGreater(self.peer.retransmitted, 0)
+
+
+class TestSequenceNumbers(TestCase):
+
+    def test_seq_after(self):
+        self.assertTrue(seq_after(2, 1))
+        self.assertFalse(seq_after(1, 2))
+        self.assertFalse(seq_after(1, 1))
+        self.assertTrue(seq_after(0, SEQ_MODULO - 1))
+        self.assertTrue(seq_after(5, SEQ_MODULO - 5))
+        self.assertFalse(seq_after(SEQ_MODULO - 5, 5))
+
+
+class TestHelloRetry(TestCase):
+
+    def test_lost_answer_is_repeated(self):
+        port = get_free_port()
+        host = DatagramConnection(MagicMock(), Queue(), Queue())
+        host.startup_accept(port)
+        wait_for(lambda: host.listener is not None)
+        hello = host._packet(DatagramConnection.HELLO, 0)
+        with socket(AF_INET, SOCK_DGRAM) as peer:
+            peer.settimeout(5)
+            peer.connect(("127.0.0.1", port))
+            peer.send(hello)
+            self.assertEqual(hello, peer.recv(100))     # treated as lost
+            self.assertTrue(wait_for(lambda: host.active))
+            peer.send(hello)
+            self.assertEqual(hello, peer.recv(100))
+        host.close()
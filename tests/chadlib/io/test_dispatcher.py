@@ -0,0 +1,80 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from threading          import Event, Lock
+from time               import sleep
+from unittest           import TestCase
+
+from chadlib.io         import Dispatcher
+
+
+class TestDispatcher(TestCase):
+
+    def test_per_key_order(self):
+        handled = []
+        lock = Lock()
+        def handler(data):
+            sleep(0.001 * (data[1] % 3))
+            with lock:
+                handled.append(data)
+        dispatcher = Dispatcher(handler, key = lambda data: data[0], 
+                                executor = ThreadPoolExecutor(8))
+        messages = [(key, i) for i in range(30) for key in "abcd"]
+        for message in messages:
+            dispatcher.submit(message)
+        self.assertTrue(dispatcher.join(5))
+        dispatcher.executor.shutdown()
+        self.assertEqual(len(messages), len(handled))
+        for key in "abcd":
+            self.assertEqual(list(range(30)), 
+                                [i for k, i in handled if k == key])
+
+    def test_unkeyed_messages_run_in_parallel(self):
+        release = Event()
+        started = []
+        def handler(data):
+            started.append(data)
+            release.wait(5)
+        dispatcher = Dispatcher(handler, executor = ThreadPoolExecutor(4))
+        for i in range(4):
+            dispatcher.submit(i)
+        for _ in range(100):
+            if len(started) == 4:
+                break
+            sleep(0.01)
+        self.assertEqual(4, len(started))
+        release.set()
+        dispatcher.close()
+        dispatcher.executor.shutdown()
+
+    def test_in_flight_limit(self):
+        release = Event()
+        dispatcher = Dispatcher(lambda data: release.wait(5), 
+                                max_in_flight = 2)
+        dispatcher.submit(1)
+        dispatcher.submit(2)
+        self.assertEqual(2, dispatcher.in_flight)
+        self.assertFalse(dispatcher._slots.acquire(False))
+        release.set()
+        dispatcher.close()
+        self.assertEqual(0, dispatcher.in_flight)
+
+    def test_handler_errors_are_logged(self):
+        def handler(data):
+            raise ValueError(data)
+        dispatcher = Dispatcher(handler, key = lambda data: 0)
+        with self.assertLogs("chadlib.io.dispatcher", "WARNING"):
+            dispatcher.submit(b"bad")
+            dispatcher.submit(b"bad")
+            dispatcher.close()
+        self.assertEqual(0, dispatcher.in_flight)
+
+    def test_process_pool_results(self):
+        results = []
+        with ProcessPoolExecutor(2) as executor:
+            dispatcher = Dispatcher(len, key = lambda data: 0, 
+                                    executor = executor, 
+                                    on_result = lambda data, result: 
+                                                    results.append(result))
+            for i in range(10):
+                dispatcher.submit(b"x" * i)
+            dispatcher.close()
+        self.assertEqual(list(range(10)), results)
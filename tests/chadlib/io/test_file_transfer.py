@@ -0,0 +1,115 @@
+from os             import urandom
+from os.path        import exists, join
+from socket         import socket
+from tempfile       import TemporaryDirectory
+from threading      import Thread
+from unittest       import TestCase
+
+from chadlib.io     import FileReceiver, FileSender
+
+
+class Cutoff(Exception):
+    pass
+
+def cut_off(received, total):
+    if received >= 100000:
+        raise Cutoff()
+
+
+class TestFileTransfer(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.source = join(self.directory.name, "source.doc")
+        self.target = join(self.directory.name, "target.doc")
+        self.data = urandom(300000)
+        with open(self.source, "wb") as f:
+            f.write(self.data)
+        self.listener = socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+
+    def tearDown(self):
+        self.listener.close()
+        self.directory.cleanup()
+
+    def transfer(self, receiver, sender):
+        errors = []
+        def receive():
+            try:
+                receiver.receive_on(self.listener)
+            except Exception as err:
+                errors.append(err)
+        t = Thread(target = receive)
+        t.start()
+        try:
+            return sender.send_to(self.port, "127.0.0.1")
+        finally:
+            t.join(5)
+            if errors:
+                raise errors[0]
+
+    def read_target(self):
+        with open(self.target, "rb") as f:
+            return f.read()
+
+    def test_transfer_with_progress(self):
+        progress = []
+        def record(sent, total):
+            progress.append(sent)
+        sent = self.transfer(FileReceiver(self.target, chunk_size = 65536), 
+                                FileSender(self.source, record, 100000))
+        self.assertEqual(len(self.data), sent)
+        self.assertEqual(self.data, self.read_target())
+        self.assertEqual([100000, 200000, 300000], progress)
+        self.assertFalse(exists(self.target + ".part"))
+        self.assertFalse(exists(self.target + ".part.offset"))
+
+    def test_truncated_file_fails(self):
+        def truncate(sent, total):
+            with open(self.source, "r+b") as f:
+                f.truncate(50000)
+        receiver = FileReceiver(self.target)
+        t = Thread(target = self.receive_ignoring_errors, args = (receiver,))
+        t.start()
+        with self.assertRaises(EOFError):
+            FileSender(self.source, truncate, 100000).send_to(self.port, 
+                                                                "127.0.0.1")
+        t.join(5)
+
+    def receive_ignoring_errors(self, receiver):
+        try:
+            receiver.receive_on(self.listener)
+        except Exception:
+            pass
+
+    def test_empty_file(self):
+        with open(self.source, "wb"):
+            pass
+        self.transfer(FileReceiver(self.target), FileSender(self.source))
+        self.assertEqual(b"", self.read_target())
+
+    def test_resume(self):
+        with self.assertRaises((Cutoff, ConnectionError)):
+            self.transfer(FileReceiver(self.target, cut_off, 50000), 
+                            FileSender(self.source))
+        self.assertFalse(exists(self.target))
+
+        sent = self.transfer(FileReceiver(self.target, chunk_size = 50000), 
+                                FileSender(self.source))
+        self.assertEqual(len(self.data) - 100000, sent)
+        self.assertEqual(self.data, self.read_target())
+
+    def test_changed_file_restarts(self):
+        with self.assertRaises((Cutoff, ConnectionError)):
+            self.transfer(FileReceiver(self.target, 
+                                        cut_off, 
+                                        50000), 
+                            FileSender(self.source))
+        with open(self.source, "wb") as f:
+            f.write(self.data[::-1])
+        sent = self.transfer(FileReceiver(self.target), 
+                                FileSender(self.source))
+        self.assertEqual(len(self.data), sent)
+        self.assertEqual(self.data[::-1], self.read_target())
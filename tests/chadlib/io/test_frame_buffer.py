@@ -0,0 +1,52 @@
+from socket                     import socketpair
+from struct                     import pack
+from unittest                   import TestCase
+
+from chadlib.io.frame_buffer    import FrameBuffer
+
+
+class TestFrameBuffer(TestCase):
+
+    HEADER_PACK_STR = "II"
+
+    def setUp(self):
+        self.sender, self.receiver = socketpair()
+        self.frame_buffer = FrameBuffer(self.HEADER_PACK_STR, 64)
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+
+    def frame(self, data):
+        return pack(self.HEADER_PACK_STR, 1, len(data)) + data
+
+    def test_many_frames_in_one_read(self):
+        messages = [b"a", b"", b"bcd"]
+        self.sender.sendall(b"".join(self.frame(m) for m in messages))
+        self.frame_buffer.recv_from(self.receiver)
+        self.assertListEqual(messages, self.frame_buffer.payloads())
+        self.assertEqual(0, len(self.frame_buffer))
+
+    def test_partial_frame_reassembly(self):
+        frame = self.frame(b"x" * 100)
+        for i in range(0, len(frame), 7):
+            self.sender.sendall(frame[i:i + 7])
+            self.frame_buffer.recv_from(self.receiver)
+            payloads = self.frame_buffer.payloads()
+            if i + 7 < len(frame):
+                self.assertListEqual([], payloads)
+        self.assertListEqual([b"x" * 100], payloads)
+
+    def test_frame_larger_than_buffer(self):
+        message = bytes(range(256)) * 40
+        self.sender.sendall(self.frame(message) + self.frame(b"tail"))
+        payloads = []
+        while len(payloads) < 2:
+            self.frame_buffer.recv_from(self.receiver)
+            payloads.extend(self.frame_buffer.payloads())
+        self.assertListEqual([message, b"tail"], payloads)
+
+    def test_feed(self):
+        self.frame_buffer.feed(self.frame(b"fed") + self.frame(b"more")[:5])
+        self.assertListEqual([b"fed"], self.frame_buffer.payloads())
+        self.assertEqual(5, len(self.frame_buffer))
@@ -0,0 +1,56 @@
+from struct                     import unpack
+from unittest                   import TestCase
+
+from chadlib.io.frame_codec     import FrameCodec
+
+
+class TestFrameCodec(TestCase):
+
+    def setUp(self):
+        self.sender = FrameCodec(("bz2", "zlib"))
+        self.receiver = FrameCodec(("zlib",))
+
+    def exchange(self, source, destination, buffers):
+        header, payload = buffers
+        return destination.decode(unpack(FrameCodec.HEADER_PACK_STR, header), 
+                                    payload)
+
+    def test_handshake_picks_shared_codec(self):
+        self.assertIsNone(self.exchange(self.receiver, self.sender, 
+                                        self.receiver.handshake()))
+        self.assertEqual("zlib", self.sender.send_codec.name)
+
+    def test_uncompressed_before_handshake(self):
+        data = b"a" * 10000
+        self.assertIs(data, self.sender.encode(data)[1])
+
+    def test_compressed_round_trip(self):
+        self.exchange(self.receiver, self.sender, self.receiver.handshake())
+        data = b"state" * 2000
+        buffers = self.sender.encode(data)
+        self.assertLess(len(buffers[1]), len(data))
+        self.assertEqual(data, self.exchange(self.sender, self.receiver, 
+                                                buffers))
+
+    def test_below_threshold_uncompressed(self):
+        self.exchange(self.receiver, self.sender, self.receiver.handshake())
+        data = b"a" * (FrameCodec.COMPRESSION_THRESHOLD - 1)
+        self.assertIs(data, self.sender.encode(data)[1])
+
+    def test_unexpected_codec(self):
+        self.exchange(self.sender, self.receiver, self.sender.handshake())
+        other = FrameCodec(("bz2",))
+        other.send_codec = other.codecs[0]
+        with self.assertRaises(ValueError):
+            self.exchange(other, self.receiver, other.encode(b"b" * 5000))
+
+    def test_unsupported_version(self):
+        with self.assertRaises(ValueError):
+            self.receiver.decode((1, 0, 0, 0), b"")
+
+    def test_heartbeat_consumed(self):
+        heard = []
+        self.receiver.on_heartbeat = lambda *args: heard.append(args)
+        self.assertIsNone(self.exchange(self.sender, self.receiver, 
+                            self.sender.heartbeat(FrameCodec.PING, 12.5)))
+        self.assertEqual([(FrameCodec.PING, 12.5)], heard)
@@ -0,0 +1,75 @@
+from os.path        import exists
+from queue          import Queue
+from unittest.mock  import MagicMock
+from unittest       import TestCase
+
+from chadlib.io     import LocalConnection
+from chadlib.io.local_connection    import SharedRing
+
+from .test_async_connection import get_free_port, wait_for
+
+
+class TestSharedRing(TestCase):
+
+    def setUp(self):
+        self.producer = SharedRing.create(100)
+        self.consumer = SharedRing.attach(self.producer.name)
+
+    def tearDown(self):
+        self.consumer.close()
+        self.producer.close()
+
+    def test_wraps_and_fills(self):
+        first = self.producer.write(b"a" * 60)
+        self.assertEqual((0, 60), first)
+        self.assertIsNone(self.producer.write(b"b" * 50))
+        self.assertEqual(b"a" * 60, self.consumer.read(*first))
+        second = self.producer.write(b"b" * 50)
+        self.assertEqual((100, 50), second)     # skipped the last 40 bytes
+        self.assertEqual(b"b" * 50, self.consumer.read(*second))
+        self.assertIsNone(self.producer.write(b"c" * 101))
+
+
+class TestLocalConnection(TestCase):
+
+    def setUp(self):
+        self.port = get_free_port()
+        self.host = LocalConnection(MagicMock(), Queue(), Queue())
+        self.peer = LocalConnection(MagicMock(), Queue(), Queue())
+        self.host.SHARED_MEMORY_SIZE = 1048576
+        self.peer.SHARED_MEMORY_SIZE = 1048576
+        self.path = self.host.socket_path(self.port)
+        self.host.startup_accept(self.port)
+        wait_for(lambda: exists(self.path))
+        self.peer.startup_connect(self.port, None)
+        self.assertTrue(wait_for(lambda: self.host.active and 
+                                            self.peer.active))
+
+    def tearDown(self):
+        self.peer.close()
+        self.host.close()
+
+    def test_socket_path(self):
+        self.assertTrue(self.path.endswith("chadlib-{}.sock"
+                                            .format(self.port)))
+        self.assertEqual("/tmp/x.sock", self.host.socket_path("/tmp/x.sock"))
+
+    def test_small_and_large_messages(self):
+        messages = [b"small", bytes(range(256)) * 1000, b"", b"x" * 65536]
+        for message in messages:
+            self.peer.send_queue.put(message)
+        for message in messages:
+            self.assertEqual(message, self.host.receive_queue.get(timeout = 5))
+        self.assertLess(self.peer.metrics.bytes_out, 10000)
+
+    def test_full_ring_falls_back_inline(self):
+        messages = [bytes([i]) * 300000 for i in range(20)]
+        for message in messages:
+            self.peer.send_queue.put(message)
+        for message in messages:
+            self.assertEqual(message, self.host.receive_queue.get(timeout = 5))
+
+    def test_close_removes_socket_file(self):
+        self.peer.close()
+        self.host.close()
+        self.assertFalse(exists(self.path))
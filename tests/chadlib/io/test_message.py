@@ -0,0 +1,35 @@
+from unittest       import TestCase
+
+from chadlib.io     import MessageRegistry
+
+
+class TestMessageRegistry(TestCase):
+
+    def setUp(self):
+        self.registry = MessageRegistry()
+        self.received = []
+        self.move = self.registry.register(1, "Move", 
+                                [("unit", "I"), ("col", "i"), ("slant", "i")], 
+                                self.received.append)
+        self.chat = self.registry.register(2, "Chat", [("text", "16s")])
+
+    def test_round_trip(self):
+        data = self.move.encode(7, col = -3, slant = 4)
+        _, message = next(self.registry.decode(data))
+        self.assertEqual((7, -3, 4), message)
+        self.assertEqual(-3, message.col)
+
+    def test_dispatch_many(self):
+        data = self.registry.encode_many([("Move", (1, 2, 3)), 
+                                            ("Chat", (b"hi",)), 
+                                            (1, (4, 5, 6))])
+        self.registry.dispatch(data)
+        self.assertListEqual([(1, 2, 3), (4, 5, 6)], self.received)
+
+    def test_unknown_type(self):
+        with self.assertRaises(ValueError):
+            self.registry.dispatch(b"\x00\x09")
+
+    def test_duplicate_type(self):
+        with self.assertRaises(ValueError):
+            self.registry.register(1, "Other", [])
@@ -0,0 +1,64 @@
+from queue          import Queue
+from time           import monotonic
+from unittest       import TestCase
+
+from chadlib.io     import ConnectionMetrics, Histogram
+
+
+class TestHistogram(TestCase):
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        for _ in range(99):
+            histogram.record(0.001)
+        histogram.record(1.0)
+        self.assertLess(histogram.percentile(50), 0.0021)
+        self.assertGreaterEqual(histogram.percentile(50), 0.001)
+        self.assertEqual(1.0, histogram.percentile(100))
+        self.assertEqual(100, histogram.snapshot()["count"])
+
+    def test_durations_only(self):
+        histogram = Histogram()
+        histogram.record(0.1)
+        self.assertFalse(hasattr(histogram, "record_rtt"))
+        self.assertFalse(hasattr(histogram, "rtt_timeout"))
+        self.assertEqual(0.1, histogram.snapshot()["max"])
+
+
+class TestConnectionMetrics(TestCase):
+
+    def test_snapshot(self):
+        send_queue = Queue()
+        metrics = ConnectionMetrics()
+        metrics.watch_queues(send_queue, Queue())
+        send_queue.put(b"a")
+        send_queue.put(b"b")
+        self.assertEqual(2, metrics.snapshot()["send_queue_depth"])
+        self.assertFalse(hasattr(send_queue, "_put_times"))
+        metrics.record_written(monotonic() - 0.5, 2)
+        metrics.record_receive(100, 4)
+        metrics.record_receive(50, 2)
+        snapshot = metrics.snapshot()
+        self.assertEqual(2, snapshot["send_time"]["count"])
+        self.assertGreaterEqual(snapshot["send_time"]["max"], 0.5)
+        self.assertEqual(150, snapshot["bytes_in"])
+        self.assertEqual(3.0, snapshot["frames_per_recv"])
+
+    def test_rtt_smoothing(self):
+        metrics = ConnectionMetrics()
+        self.assertIsNone(metrics.rtt_timeout())
+        metrics.record_rtt(0.1)
+        self.assertEqual(0.1, metrics.rtt)
+        self.assertEqual(0.05, metrics.rtt_variance)
+        metrics.record_rtt(0.2)
+        self.assertAlmostEqual(0.1125, metrics.rtt)
+        self.assertAlmostEqual(0.0625, metrics.rtt_variance)
+        self.assertAlmostEqual(0.3625, metrics.rtt_timeout())
+        self.assertEqual(2, metrics.snapshot()["rtt_samples"]["count"])
+
+    def test_periodic_logging(self):
+        metrics = ConnectionMetrics()
+        with self.assertLogs("chadlib.io.metrics", "INFO"):
+            metrics.start_logging(0.01)
+            metrics._log_stop.wait(0.2)
+        metrics.stop_logging()
@@ -0,0 +1,128 @@
+from asyncio            import new_event_loop, wait_for as async_wait_for
+from concurrent.futures import ThreadPoolExecutor
+from queue              import Queue
+from threading          import Event, Thread
+from unittest.mock      import MagicMock
+from unittest           import TestCase
+
+from chadlib.io         import (Connection, RpcEndpoint, RpcError, 
+                                RpcTimeout)
+
+from .test_async_connection import get_free_port, wait_for
+
+
+def pump(queue, endpoint):
+    """
+    Deliver everything put on queue to endpoint, as a connection would.
+    """
+    def f():
+        data = queue.get()
+        while data is not None:
+            endpoint.process_received_data(data)
+            data = queue.get()
+    t = Thread(target = f, daemon = True)
+    t.start()
+    return t
+
+
+class TestRpcEndpoint(TestCase):
+
+    def setUp(self):
+        self.client_queue = Queue()
+        self.server_queue = Queue()
+        self.client = RpcEndpoint(self.client_queue)
+        self.executor = ThreadPoolExecutor(4)
+        self.server = RpcEndpoint(self.server_queue, self.executor)
+        self.server.register("echo", lambda data: data)
+        self.server.register("upper", lambda data: bytes(data).upper())
+        self.pumps = [pump(self.client_queue, self.server), 
+                        pump(self.server_queue, self.client)]
+
+    def tearDown(self):
+        self.client_queue.put(None)
+        self.server_queue.put(None)
+        for t in self.pumps:
+            t.join()
+        self.client.close()
+        self.server.close()
+        self.executor.shutdown()
+
+    def test_pipelined_calls(self):
+        futures = [self.client.call("echo", str(i).encode()) 
+                    for i in range(200)]
+        self.assertEqual([str(i).encode() for i in range(200)], 
+                            [bytes(f.result(5)) for f in futures])
+        self.assertEqual(0, self.client.pending_count)
+
+    def test_out_of_order_responses(self):
+        release = Event()
+        self.server.register("slow", lambda data: release.wait(5) and data)
+        slow = self.client.call("slow", b"slow")
+        fast = self.client.call("upper", b"fast")
+        self.assertEqual(b"FAST", fast.result(5))
+        self.assertFalse(slow.done())
+        release.set()
+        self.assertEqual(b"slow", slow.result(5))
+
+    def test_handler_error(self):
+        def fail(data):
+            raise KeyError("missing")
+        self.server.register("fail", fail)
+        with self.assertRaisesRegex(RpcError, "KeyError"):
+            self.client.call("fail").result(5)
+        with self.assertRaisesRegex(RpcError, "No handler"):
+            self.client.call("unknown").result(5)
+
+    def test_timeout(self):
+        self.server.register("never", lambda data: Event().wait(1) and b"")
+        future = self.client.call("never", timeout = 0.05)
+        with self.assertRaises(RpcTimeout):
+            future.result(5)
+        self.assertEqual(b"x", self.client.call("echo", b"x", 5).result(5))
+
+    def test_close_fails_pending(self):
+        self.server.register("never", lambda data: Event().wait(1) and b"")
+        future = self.client.call("never")
+        self.client.close()
+        with self.assertRaises(RpcError):
+            future.result(5)
+        with self.assertRaises(RpcError):
+            self.client.call("echo")
+
+    def test_call_async(self):
+        loop = new_event_loop()
+        async def f():
+            return await async_wait_for(self.client.call_async("upper", 
+                                                                b"async"), 5)
+        try:
+            self.assertEqual(b"ASYNC", bytes(loop.run_until_complete(f())))
+        finally:
+            loop.close()
+
+
+class TestRpcOverConnection(TestCase):
+
+    def setUp(self):
+        port = get_free_port()
+        self.host = Connection(MagicMock(), Queue(), Queue())
+        self.peer = Connection(MagicMock(), Queue(), Queue())
+        self.host.startup_accept(port)
+        wait_for(lambda: self.host.listener is not None)
+        self.peer.startup_connect(port, "127.0.0.1")
+        self.assertTrue(wait_for(lambda: self.host.active and 
+                                            self.peer.active))
+        self.server = RpcEndpoint(self.host.send_queue)
+        self.server.register("upper", lambda data: bytes(data).upper())
+        self.client = RpcEndpoint(self.peer.send_queue)
+        pump(self.host.receive_queue, self.server)
+        pump(self.peer.receive_queue, self.client)
+
+    def tearDown(self):
+        self.peer.close()
+        self.host.close()
+        self.client.close()
+
+    def test_calls(self):
+        futures = [self.client.call("upper", b"abc" * i) for i in range(50)]
+        self.assertEqual([b"ABC" * i for i in range(50)], 
+                            [f.result(5) for f in futures])
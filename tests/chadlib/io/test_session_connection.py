@@ -0,0 +1,111 @@
+from queue          import Queue
+from socket         import SHUT_RDWR
+from time           import sleep
+from unittest.mock  import MagicMock
+from unittest       import TestCase
+
+from chadlib.io     import SessionConnection
+
+from .test_async_connection import get_free_port, wait_for
+
+
+class TestSessionConnection(TestCase):
+
+    def setUp(self):
+        port = get_free_port()
+        self.host = SessionConnection(MagicMock(), Queue(), Queue())
+        self.peer = SessionConnection(MagicMock(), Queue(), Queue())
+        self.peer.CONNECT_BACKOFF_BASE = 0.05
+        self.host.startup_accept(port)
+        sleep(0.1)
+        self.peer.startup_connect(port, "127.0.0.1")
+        self.assertTrue(wait_for(lambda: self.host.active and 
+                                            self.peer.active))
+
+    def tearDown(self):
+        self.peer.close()
+        self.host.close()
+
+    def drop(self):
+        socket = self.peer.socket
+        socket.shutdown(SHUT_RDWR)
+        self.assertTrue(wait_for(lambda: self.peer.socket not in 
+                                            (None, socket) and 
+                                            self.host.active))
+
+    def received(self, connection, count):
+        return [connection.receive_queue.get(timeout = 5) 
+                for _ in range(count)]
+
+    def test_messages_delivered(self):
+        messages = [str(i).encode() for i in range(100)]
+        for message in messages:
+            self.peer.send_queue.put(message)
+        self.assertEqual(messages, self.received(self.host, 100))
+        self.assertTrue(wait_for(lambda: len(self.peer.retransmit) < 
+                                            SessionConnection.ACK_INTERVAL))
+
+    def test_resume_without_loss_or_duplicates(self):
+        for i in range(10):
+            self.peer.send_queue.put(b"before" + bytes([i]))
+        self.received(self.host, 10)
+        self.drop()
+        for i in range(10):
+            self.peer.send_queue.put(b"after" + bytes([i]))
+            self.host.send_queue.put(b"reply" + bytes([i]))
+        self.assertEqual([b"after" + bytes([i]) for i in range(10)], 
+                            self.received(self.host, 10))
+        self.assertEqual([b"reply" + bytes([i]) for i in range(10)], 
+                            self.received(self.peer, 10))
+        self.assertTrue(self.host.receive_queue.empty())
+        self.assertFalse(self.host.controller.disconnect.called)
+        self.assertEqual(1, 
+            self.host.controller.start_processing_receive_queue.call_count)
+
+    def test_quiet_peer_acknowledged(self):
+        for i in range(3):
+            self.peer.send_queue.put(bytes([i]))
+        self.received(self.host, 3)
+        self.assertTrue(wait_for(lambda: not self.peer.retransmit))
+
+    def test_unacknowledged_messages_replayed(self):
+        self.host.ACK_INTERVAL = 1000
+        self.host.ACK_DELAY = 1000
+        for i in range(5):
+            self.peer.send_queue.put(bytes([i]))
+        self.received(self.host, 5)
+        self.assertTrue(wait_for(lambda: len(self.peer.retransmit) == 5))
+        self.drop()
+        self.peer.send_queue.put(b"next")
+        self.assertEqual(b"next", self.host.receive_queue.get(timeout = 5))
+        self.assertTrue(wait_for(lambda: len(self.peer.retransmit) <= 1))
+
+    def test_new_peer_session_resets(self):
+        self.peer.send_queue.put(b"old")
+        self.received(self.host, 1)
+        port = self.peer.socket.getpeername()[1]
+        self.peer.RECONNECT_ATTEMPTS = 0    # crashed, it will not reconnect
+        self.peer.socket.shutdown(SHUT_RDWR)
+        self.assertTrue(wait_for(lambda: self.host.listener is not None and
+                                            not self.host.active))
+        self.assertTrue(wait_for(lambda: 
+                                self.peer.controller.disconnect.called))
+        self.peer = SessionConnection(MagicMock(), Queue(), Queue())
+        self.peer.startup_connect(port, "127.0.0.1")
+        self.assertTrue(wait_for(lambda: 
+                                self.host.controller.session_reset.called))
+        self.peer.send_queue.put(b"new")
+        self.assertEqual(b"new", self.host.receive_queue.get(timeout = 5))
+
+    def test_close_disconnects_peer(self):
+        self.peer.close()
+        self.assertTrue(wait_for(lambda: 
+                                self.host.controller.disconnect.called))
+
+    def test_close_while_resuming(self):
+        self.host.socket.shutdown(SHUT_RDWR)
+        self.peer.close()
+        self.assertTrue(wait_for(lambda: not self.host.active))
+        self.host.close()
+        self.assertIsNone(self.host.listener)
+        self.assertIsNone(self.host.receive_queue.get(timeout = 5))
@@ -0,0 +1,122 @@
+from queue          import Queue
+from unittest.mock  import MagicMock
+from unittest       import TestCase
+
+from chadlib.io     import SimulatedConnection, SimulatedNetwork
+from chadlib.io.simulated_connection import shared_network
+
+
+class TestSimulatedConnection(TestCase):
+
+    def connect(self, **settings):
+        self.network = SimulatedNetwork(virtual_clock = True, seed = 1, 
+                                        **settings)
+        self.host = SimulatedConnection(MagicMock(), Queue(), Queue(), 
+                                        self.network)
+        self.peer = SimulatedConnection(MagicMock(), Queue(), Queue(), 
+                                        self.network)
+        self.host.startup_accept(5000)
+        self.peer.startup_connect(5000, "127.0.0.1")
+        self.assertTrue(self.host.active and self.peer.active)
+
+    def drain(self, connection):
+        received = []
+        while not connection.receive_queue.empty():
+            received.append(connection.receive_queue.get_nowait())
+        return received
+
+    def test_latency(self):
+        self.connect(latency = 0.05)
+        self.peer.send_queue.put(b"hello")
+        self.network.advance(0.04)
+        self.assertEqual([], self.drain(self.host))
+        self.network.advance(0.02)
+        self.assertEqual([b"hello"], self.drain(self.host))
+
+    def test_bandwidth(self):
+        self.connect(latency = 0.1, bandwidth = 1000)
+        self.peer.send_queue.put(bytes(500))
+        self.peer.send_queue.put(bytes(500))
+        self.network.advance(0.65)
+        self.assertEqual(1, len(self.drain(self.host)))
+        self.network.advance(0.5)
+        self.assertEqual(1, len(self.drain(self.host)))
+
+    def test_ordered_loss_delays_in_order(self):
+        self.connect(latency = 0.01, loss = 0.3)
+        for i in range(100):
+            self.peer.send_queue.put(bytes([i]))
+        self.network.run_until_idle()
+        self.assertEqual([bytes([i]) for i in range(100)], 
+                            self.drain(self.host))
+        self.assertGreater(self.network.lost, 0)
+        self.assertGreaterEqual(self.network.now(), 0.2)
+
+    def test_unordered_loss_and_reordering(self):
+        self.connect(latency = 0.01, jitter = 0.01, loss = 0.2, 
+                        ordered = False)
+        for i in range(100):
+            self.peer.send_queue.put(bytes([i]))
+        self.network.run_until_idle()
+        received = self.drain(self.host)
+        self.assertEqual(100 - self.network.lost, len(received))
+        self.assertNotEqual(sorted(received), received)
+
+    def test_deterministic(self):
+        runs = []
+        for _ in range(2):
+            self.connect(latency = 0.01, jitter = 0.01, loss = 0.2, 
+                            ordered = False)
+            for i in range(50):
+                self.peer.send_queue.put(bytes([i]))
+            self.network.run_until_idle()
+            runs.append(self.drain(self.host))
+        self.assertEqual(runs[0], runs[1])
+
+    def test_close_notifies_peer_after_data(self):
+        self.connect(latency = 0.01)
+        self.peer.send_queue.put(b"last")
+        self.network.advance(0)
+        self.peer.close()
+        self.assertIsNone(self.peer.receive_queue.get_nowait())
+        self.network.advance(0.02)
+        self.assertEqual([b"last"], self.drain(self.host))
+        self.assertTrue(self.host.controller.disconnect.called)
+
+    def test_connect_without_listener(self):
+        network = SimulatedNetwork(virtual_clock = True)
+        peer = SimulatedConnection(MagicMock(), Queue(), Queue(), network)
+        peer.startup_connect(5000, "127.0.0.1")
+        self.assertFalse(peer.active)
+
+
+class TestSimulatedConnectionRealTime(TestCase):
+
+    def test_messages(self):
+        network = SimulatedNetwork(latency = 0.01)
+        host = SimulatedConnection(MagicMock(), Queue(), Queue(), network)
+        peer = SimulatedConnection(MagicMock(), Queue(), Queue(), network)
+        host.startup_accept(5000)
+        peer.startup_connect(5000, "127.0.0.1")
+        try:
+            for i in range(10):
+                peer.send_queue.put(bytes([i]))
+            self.assertEqual([bytes([i]) for i in range(10)], 
+                    [host.receive_queue.get(timeout = 5) for _ in range(10)])
+        finally:
+            peer.close()
+            host.close()
+
+    def test_shared_network_by_default(self):
+        host = SimulatedConnection(MagicMock(), Queue(), Queue())
+        peer = SimulatedConnection(MagicMock(), Queue(), Queue())
+        self.assertIs(shared_network, host.network)
+        host.startup_accept(5001)
+        peer.startup_connect(5001, "127.0.0.1")
+        try:
+            peer.send_queue.put(b"hello")
+            self.assertEqual(b"hello", host.receive_queue.get(timeout = 5))
+        finally:
+            peer.close()
+            host.close()
+        self.assertNotIn(host, shared_network.connections)
@@ -0,0 +1,106 @@
+from unittest       import TestCase
+
+from chadlib.io     import StateReceiver, StateSender
+from chadlib.io.state_sync  import ACK, ACK_MESSAGE, block_patches
+
+
+class TestBlockPatches(TestCase):
+
+    def test_patches(self):
+        old = bytes(256)
+        new = bytearray(old)
+        new[10] = 1
+        new[200] = 2
+        self.assertEqual([(0, bytes(new[:16])), (192, bytes(new[192:208]))], 
+                            block_patches(old, bytes(new), 16))
+        self.assertEqual([(256, b"tail")], 
+                            block_patches(old, old + b"tail", 16))
+        self.assertEqual([], block_patches(old, old[:100], 16))
+
+
+class TestStateSync(TestCase):
+
+    def setUp(self):
+        self.state = {"map" : bytes(10000), "turn" : b"\0", "name" : b"game"}
+        self.applied = []
+        self.to_receiver = []
+        self.to_sender = []
+        self.sender = StateSender(lambda: dict(self.state), 
+                                    self.to_receiver.append, 
+                                    keyframe_interval = 10)
+        self.receiver = StateReceiver(self.applied.append, 
+                                        self.to_sender.append)
+
+    def deliver(self, lose_to_receiver = False):
+        for message in self.to_receiver:
+            if not lose_to_receiver:
+                self.receiver.process_received_data(message)
+        for message in self.to_sender:
+            self.sender.process_received_data(message)
+        self.to_receiver.clear()
+        self.to_sender.clear()
+
+    def change(self, turn):
+        tiles = bytearray(self.state["map"])
+        tiles[turn * 7] = turn
+        self.state["map"] = bytes(tiles)
+        self.state["turn"] = bytes([turn])
+
+    def test_keyframe_then_small_deltas(self):
+        keyframe = self.sender.tick()
+        self.deliver()
+        self.assertEqual(self.state, self.applied[-1])
+        for turn in range(1, 6):
+            self.change(turn)
+            delta = self.sender.tick()
+            self.deliver()
+            self.assertEqual(self.state, self.applied[-1])
+            self.assertLess(len(delta), len(keyframe) / 50)
+        self.assertEqual(1, self.sender.keyframes_sent)
+
+    def test_added_and_deleted_fields(self):
+        self.sender.tick()
+        self.deliver()
+        del self.state["name"]
+        self.state["score"] = b"12"
+        self.sender.tick()
+        self.deliver()
+        self.assertEqual(self.state, self.applied[-1])
+
+    def test_lost_deltas_recover(self):
+        self.sender.tick()
+        self.deliver()
+        for turn in range(1, 4):
+            self.change(turn)
+            self.sender.tick()
+            self.deliver(lose_to_receiver = True)
+        self.change(4)
+        self.sender.tick()
+        self.deliver()
+        self.assertEqual(self.state, self.applied[-1])
+        self.assertEqual(1, self.sender.keyframes_sent)
+
+    def test_periodic_keyframes(self):
+        for turn in range(25):
+            self.change(turn)
+            self.sender.tick()
+            self.deliver()
+        self.assertEqual(3, self.sender.keyframes_sent)
+        self.assertEqual(self.state, self.receiver.fields)
+
+    def test_unknown_base_requests_keyframe(self):
+        self.sender.tick()
+        self.deliver(lose_to_receiver = True)
+        self.sender.process_received_data(ACK_MESSAGE.pack(ACK, 1))
+        self.change(1)
+        delta = self.sender.tick()
+        self.receiver.process_received_data(delta)
+        self.assertEqual([], self.applied)
+        for message in self.to_sender:
+            self.sender.process_received_data(message)
+        self.to_sender.clear()
+        self.to_receiver.clear()
+        self.sender.tick()
+        self.deliver()
+        self.assertEqual(self.state, self.applied[-1])
+        self.assertEqual(2, self.sender.keyframes_sent)
@@ -0,0 +1,89 @@
+from itertools                  import islice
+from unittest                   import TestCase
+
+from chadlib.utility.hex_area   import *
+from chadlib.utility.hex_math   import (cubic_distance, cubic_to_axial,
+                                        is_valid_cubic_coord)
+
+
+class TestHexArea(TestCase):
+
+    def setUp(self):
+        self.center = (3, 2, -5)
+
+    def test_range(self):
+        for radius in range(4):
+            coords = list(cubic_range(radius, *self.center))
+            self.assertEqual(1 + 3 * radius * (radius + 1), len(set(coords)))
+            for coord in coords:
+                self.assertTrue(is_valid_cubic_coord(*coord))
+                self.assertLessEqual(cubic_distance(*coord, *self.center),
+                                        radius)
+
+    def test_ring_and_spiral(self):
+        self.assertEqual([self.center], list(cubic_ring(0, *self.center)))
+        for radius in range(1, 4):
+            ring = list(cubic_ring(radius, *self.center))
+            self.assertEqual(6 * radius, len(set(ring)))
+            for a, b in zip(ring, ring[1:] + ring[:1]):
+                self.assertEqual(1, cubic_distance(*a, *b))
+            for coord in ring:
+                self.assertEqual(radius, cubic_distance(*coord,
+                                                        *self.center))
+            self.assertSetEqual(set(cubic_range(radius, *self.center)),
+                                set(cubic_spiral(radius, *self.center)))
+
+    def test_lazy(self):
+        first = list(islice(cubic_spiral(10 ** 9, 0, 0, 0), 7))
+        self.assertEqual((0, 0, 0), first[0])
+        self.assertEqual(7, len(first))
+
+    def test_line(self):
+        end = (-2, 6, -4)
+        line = list(cubic_line(*self.center, *end))
+        self.assertEqual(self.center, line[0])
+        self.assertEqual(end, line[-1])
+        self.assertEqual(cubic_distance(*self.center, *end) + 1, len(line))
+        for a, b in zip(line, line[1:]):
+            self.assertEqual(1, cubic_distance(*a, *b))
+        self.assertEqual([self.center],
+                            list(cubic_line(*self.center, *self.center)))
+
+    def test_open_field_of_view(self):
+        visible = list(cubic_field_of_view(lambda coord: False, 4,
+                                            *self.center))
+        self.assertSetEqual(set(cubic_range(4, *self.center)), set(visible))
+        self.assertEqual(self.center, visible[0])
+
+    def test_blocker_casts_shadow(self):
+        wall = (0, 1, -1)
+        visible = set(cubic_field_of_view(lambda coord: coord == wall, 4,
+                                            0, 0, 0))
+        self.assertIn(wall, visible)
+        self.assertNotIn((0, 2, -2), visible)
+        self.assertNotIn((0, 4, -4), visible)
+        self.assertIn((1, 1, -2), visible)
+        self.assertIn((0, -4, 4), visible)
+
+    def test_enclosed_stops_early(self):
+        checked = []
+        def blocks(coord):
+            checked.append(coord)
+            return True
+        visible = list(cubic_field_of_view(blocks, 10 ** 6, 0, 0, 0))
+        self.assertEqual(7, len(visible))
+        self.assertEqual(6, len(checked))
+
+    def test_axial(self):
+        center = cubic_to_axial(*self.center)
+        self.assertEqual([cubic_to_axial(*c) for c in
+                            cubic_spiral(2, *self.center)],
+                            list(axial_spiral(2, *center)))
+        self.assertEqual([cubic_to_axial(*c) for c in
+                            cubic_line(*self.center, 0, 0, 0)],
+                            list(axial_line(*center, 0, 0)))
+        wall = cubic_to_axial(3, 3, -6)
+        visible = set(axial_field_of_view(lambda coord: coord == wall, 3,
+                                            *center))
+        self.assertIn(wall, visible)
+        self.assertNotIn(cubic_to_axial(3, 4, -7), visible)
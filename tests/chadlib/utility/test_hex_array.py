@@ -0,0 +1,129 @@
+from random                     import Random
+from unittest                   import TestCase, skipUnless
+
+from chadlib.utility            import hex_area, hex_math
+from chadlib.utility.hex_math   import AXIAL_DIRECTIONS, CUBIC_DIRECTIONS
+
+try:
+    import numpy
+    from chadlib.utility        import hex_array
+except ImportError:
+    numpy = None
+
+
+@skipUnless(numpy, "NumPy is not installed")
+class TestHexArray(TestCase):
+
+    def setUp(self):
+        self.cubic = numpy.array([(0, 0, 0), (3, 2, -5), (-4, 1, 3)])
+        self.axial = numpy.array([hex_math.cubic_to_axial(*pos)
+                                    for pos in self.cubic])
+
+    def test_conversion_matches_scalar(self):
+        self.assertTrue((self.axial ==
+                            hex_array.cubic_to_axial(self.cubic)).all())
+        self.assertTrue((self.cubic ==
+                            hex_array.axial_to_cubic(self.axial)).all())
+
+    def test_validity(self):
+        coords = numpy.array([(0, 0, 0), (1, 1, 1), (2, -1, -1)])
+        self.assertListEqual([True, False, True],
+                            hex_array.is_valid_cubic_coord(coords).tolist())
+
+    def test_moves_match_scalar(self):
+        n = 4
+        for name in CUBIC_DIRECTIONS:
+            scalar = getattr(hex_math, "cubic_" + name)
+            expected = [hex_math.cubic_n_moves(scalar, n, *pos)
+                        for pos in self.cubic.tolist()]
+            moved = getattr(hex_array, "cubic_" + name)(self.cubic, n)
+            self.assertListEqual(expected, [tuple(c) for c in moved.tolist()])
+            self.assertTrue((moved ==
+                        hex_array.cubic_move(self.cubic, name, n)).all())
+        for name in AXIAL_DIRECTIONS:
+            scalar = getattr(hex_math, "axial_" + name)
+            expected = [hex_math.axial_n_moves(scalar, n, *pos)
+                        for pos in self.axial.tolist()]
+            moved = hex_array.axial_n_moves(
+                            getattr(hex_array, "axial_" + name), n, self.axial)
+            self.assertListEqual(expected, [tuple(c) for c in moved.tolist()])
+
+    def test_per_coordinate_steps(self):
+        moved = hex_array.cubic_north(self.cubic, numpy.array([0, 1, 2]))
+        self.assertListEqual([[0, 0, 0], [3, 3, -6], [-4, 3, 1]],
+                                moved.tolist())
+
+    def test_distance(self):
+        self.assertListEqual([0, 5, 4],
+                    hex_array.cubic_distance(self.cubic, (0, 0, 0)).tolist())
+        self.assertListEqual([0, 5, 4],
+                    hex_array.axial_distance(self.axial, (0, 0)).tolist())
+        self.assertEqual(2, hex_array.cubic_distance((0, 0, 0),
+                                                CUBIC_DIRECTIONS["east"]))
+
+    def test_round(self):
+        fractional = numpy.array([(0.4, 0.3, -0.7), (2.1, -1.3, -0.8),
+                                    (-0.1, -0.1, 0.2), (1.5, -0.5, -1),
+                                    (0.5, 0, -0.5), (-0.5, 1, -0.5)])
+        rounded = hex_array.cubic_round(fractional)
+        self.assertListEqual([[1, 0, -1], [2, -1, -1], [0, 0, 0],
+                                [2, -1, -1], [0, 0, 0], [0, 1, -1]],
+                                rounded.tolist())
+        self.assertListEqual([list(hex_math.cubic_round(*coord))
+                                for coord in fractional.tolist()],
+                                rounded.tolist())
+        self.assertTrue(hex_array.is_valid_cubic_coord(rounded).all())
+        self.assertListEqual([[1, -1], [2, -1], [0, 0], [2, -1], [0, 0],
+                                [0, -1]],
+                    hex_array.axial_round(fractional[:, [0, 2]]).tolist())
+
+    def test_areas_match_generators(self):
+        center = (2, -5, 3)
+        for radius in range(4):
+            for name in ["cubic_range", "cubic_ring", "cubic_spiral"]:
+                expected = list(getattr(hex_area, name)(radius, *center))
+                area = getattr(hex_array, name)(center, radius)
+                self.assertListEqual(expected,
+                                        [tuple(c) for c in area.tolist()])
+        for end in [(0, 0, 0), (7, -2, -5), (2, -5, 3)]:
+            self.assertListEqual(list(hex_area.cubic_line(*center, *end)),
+                    [tuple(c) for c in hex_array.cubic_line(center, 
+                                                            end).tolist()])
+
+    def test_field_of_view(self):
+        wall = numpy.array((0, 1, -1))
+        def blocked(coords):
+            return (coords == wall).all(axis = -1)
+        visible = {tuple(c) for c in hex_array.cubic_field_of_view(
+                                            (0, 0, 0), 4, blocked).tolist()}
+        self.assertIn((0, 1, -1), visible)
+        self.assertNotIn((0, 2, -2), visible)
+        self.assertIn((0, -4, 4), visible)
+        self.assertEqual(len(hex_array.cubic_range((0, 0, 0), 4)),
+                len(hex_array.cubic_field_of_view((0, 0, 0), 4,
+                        lambda coords: numpy.zeros(len(coords), bool))))
+
+    def test_field_of_view_matches_shadowcasting(self):
+        random = Random(11)
+        center = (1, -3, 2)
+        for _ in range(50):
+            walls = {coord for coord in hex_area.cubic_range(6, *center)
+                        if random.random() < 0.15}
+            def blocked(coords):
+                return numpy.array([tuple(c) in walls
+                                    for c in coords.tolist()], dtype = bool)
+            expected = list(hex_area.cubic_field_of_view(
+                                    lambda coord: coord in walls, 6, *center))
+            self.assertListEqual(expected, [tuple(c) for c in
+                    hex_array.cubic_field_of_view(center, 6,
+                                                    blocked).tolist()])
+
+    def test_line_of_sight(self):
+        wall = numpy.array((0, 1, -1))
+        def blocked(coords):
+            return (coords == wall).all(axis = -1)
+        targets = numpy.array([(0, 2, -2), (0, 1, -1), (2, -1, -1),
+                                (0, 0, 0)])
+        self.assertListEqual([False, True, True, True],
+                hex_array.cubic_line_of_sight((0, 0, 0), targets,
+                                                blocked).tolist())
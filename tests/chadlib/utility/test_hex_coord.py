@@ -0,0 +1,68 @@
+from unittest                   import TestCase
+
+from chadlib.utility            import hex_math
+from chadlib.utility.hex_coord  import DIRECTIONS, ORIGIN, HexCoord
+from chadlib.utility.hex_math   import ADJACENT_DIRECTIONS, CUBIC_DIRECTIONS
+
+
+class TestHexCoord(TestCase):
+
+    def setUp(self):
+        self.position = HexCoord(3, 2, -5)
+
+    def test_behaves_like_tuple(self):
+        self.assertEqual((3, 2, -5), self.position)
+        self.assertEqual(hash((3, 2, -5)), hash(self.position))
+        self.assertEqual("found", {(3, 2, -5) : "found"}[self.position])
+        self.assertTupleEqual((3, 3, -6), 
+                                hex_math.cubic_north(*self.position))
+        self.assertFalse(hasattr(self.position, "__dict__"))
+
+    def test_axial(self):
+        self.assertEqual((3, -5), self.position.axial())
+        self.assertEqual(self.position, HexCoord.from_axial(3, -5))
+
+    def test_arithmetic(self):
+        east = DIRECTIONS["east"]
+        self.assertEqual(HexCoord(5, 1, -6), self.position + east)
+        self.assertEqual(HexCoord(5, 1, -6), self.position + (2, -1, -1))
+        self.assertEqual(self.position, self.position + east - east)
+        self.assertEqual(HexCoord(6, -3, -3), 3 * east)
+        self.assertEqual(-east, DIRECTIONS["west"])
+        self.assertTrue((self.position * 7).is_valid())
+
+    def test_move_matches_n_moves(self):
+        for name, change in CUBIC_DIRECTIONS.items():
+            f = getattr(hex_math, "cubic_" + name)
+            self.assertEqual(hex_math.cubic_n_moves(f, 12, *self.position),
+                                self.position.move(name, 12))
+            self.assertEqual(self.position.move(name),
+                                self.position.neighbor(change))
+
+    def test_n_moves_with_other_functions(self):
+        def north_twice(x, y, z):
+            return hex_math.cubic_north(*hex_math.cubic_north(x, y, z))
+        self.assertTupleEqual((0, 6, -6),
+                            hex_math.cubic_n_moves(north_twice, 3, 0, 0, 0))
+        self.assertTupleEqual((0, 5), hex_math.axial_n_moves(
+                                            hex_math.axial_south, 5, 0, 0))
+
+    def test_neighbors(self):
+        neighbors = self.position.neighbors()
+        self.assertEqual([self.position.move(name)
+                            for name in ADJACENT_DIRECTIONS], neighbors)
+        for neighbor in neighbors:
+            self.assertEqual(1, self.position.distance(neighbor))
+        self.assertEqual(2, ORIGIN.distance(DIRECTIONS["east"]))
+        self.assertEqual(5, self.position.distance((0, 0, 0)))
+
+    def test_rotate(self):
+        north = DIRECTIONS["north"]
+        self.assertEqual(DIRECTIONS["northeast"], north.rotate())
+        self.assertEqual(DIRECTIONS["northwest"], north.rotate(-1))
+        self.assertEqual(DIRECTIONS["south"], north.rotate(3))
+        self.assertEqual(north, north.rotate(6))
+        rotated = self.position.rotate(2, center = (1, 1, -2))
+        self.assertEqual(self.position.distance((1, 1, -2)),
+                            rotated.distance((1, 1, -2)))
+        self.assertEqual(self.position, rotated.rotate(-2, (1, 1, -2)))
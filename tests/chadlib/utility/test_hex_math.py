@@ -64,3 +64,17 @@ class TestHexMath(TestCase):
     def test_cubic_validation(self):
         for pos in self.cubic_positions:
             self.assertTrue(is_valid_cubic_coord(*pos))
+
+    def test_distance(self):
+        self.assertEqual(5, cubic_distance(*self.position0, *self.position1))
+        self.assertEqual(5, axial_distance(*self.axial_positions[0], 
+                                            *self.axial_positions[1]))
+        self.assertEqual(2, cubic_distance(*self.position0, 
+                                            *cubic_east(*self.position0)))
+
+    def test_round(self):
+        self.assertTupleEqual((1, 0, -1), cubic_round(0.4, 0.3, -0.7))
+        self.assertTupleEqual((2, -1, -1), cubic_round(2.1, -1.3, -0.8))
+        self.assertTupleEqual((2, -1, -1), cubic_round(1.5, -0.5, -1))
+        self.assertTupleEqual((0, 1, -1), cubic_round(-0.5, 1, -0.5))
+        self.assertTupleEqual((1, -1), axial_round(0.6, -0.7))
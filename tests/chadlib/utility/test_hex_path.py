@@ -0,0 +1,107 @@
+from random                     import Random
+from unittest                   import TestCase
+
+from chadlib.collection         import HexGrid
+from chadlib.utility.hex_math   import ADJACENT_DIRECTIONS, axial_distance
+from chadlib.utility.hex_path   import FlowField, FlowFieldCache, find_path
+
+
+class TestHexPath(TestCase):
+
+    def setUp(self):
+        self.grid = HexGrid.hexagon(6, {"cost" : "B"})
+        random = Random(7)
+        for coord in self.grid.coords():
+            self.grid[coord] = random.choice([1, 1, 1, 2, 5, 0])
+        self.grid[0, 0] = 1
+        self.grid[4, -4] = 1
+
+    def cost(self, a, b):
+        if b in self.grid:
+            return self.grid[b] or None     # 0 is a wall
+        return None
+
+    def path_cost(self, path):
+        return sum(self.cost(a, b) for a, b in zip(path, path[1:]))
+
+    def test_straight_path(self):
+        path = find_path((0, 0), (3, 0), area = self.grid)
+        self.assertEqual([(0, 0), (1, 0), (2, 0), (3, 0)], path)
+
+    def test_walls_avoided(self):
+        self.grid.fill(1)
+        for slant in range(-5, 4):
+            self.grid[1, slant] = 0
+        path = find_path((0, 0), (2, 0), self.cost, area = self.grid)
+        self.assertTrue(all(self.grid[coord] for coord in path))
+        self.assertGreater(len(path), 3)
+        for a, b in zip(path, path[1:]):
+            self.assertEqual(1, axial_distance(*a, *b))
+
+    def test_unreachable(self):
+        self.grid.fill(1)
+        for coord in self.grid.neighbors(0, 0):
+            self.grid[coord] = 0
+        self.assertIsNone(find_path((3, 0), (0, 0), self.cost,
+                                    area = self.grid))
+        self.assertIsNone(FlowField((0, 0), self.cost).path((3, 0)))
+
+    def test_a_star_matches_flow_field(self):
+        field = FlowField((0, 0), self.cost)
+        for start in [(4, -4), (-3, 5), (6, -6), (-6, 0)]:
+            path = find_path(start, (0, 0), self.cost, area = self.grid)
+            if path is None:
+                self.assertIsNone(field.distance(start))
+                continue
+            self.assertEqual(field.distance(start), self.path_cost(path))
+            self.assertEqual(field.distance(start),
+                                self.path_cost(field.path(start)))
+
+    def test_vertex_moves(self):
+        directions = ADJACENT_DIRECTIONS + ("east", "west")
+        path = find_path((-4, 2), (4, -2), directions = directions,
+                            area = self.grid)
+        self.assertEqual(5, len(path))
+        field = FlowField((4, -2), directions = directions, area = self.grid)
+        self.assertEqual(4, field.distance((-4, 2)))
+
+    def test_breadth_first_field(self):
+        field = FlowField((0, 0), area = self.grid)
+        self.assertEqual(len(self.grid), len(field.distances))
+        for coord in self.grid.coords():
+            self.assertEqual(axial_distance(*coord, 0, 0),
+                                field.distance(coord))
+        with self.assertRaises(ValueError):
+            FlowField((0, 0))
+
+    def test_incremental_update_matches_rebuild(self):
+        random = Random(3)
+        coords = list(self.grid.coords())
+        for goal in [(0, 0), (4, -4)]:
+            field = FlowField(goal, self.cost)
+            for _ in range(30):
+                changed = random.sample(coords, random.randint(1, 6))
+                for coord in changed:
+                    self.grid[coord] = random.choice([0, 1, 1, 3, 9])
+                field.update(changed)
+                fresh = FlowField(goal, self.cost)
+                self.assertDictEqual(fresh.distances, field.distances)
+                for start in field.distances:
+                    self.assertEqual(field.distance(start),
+                                        self.path_cost(field.path(start)))
+
+    def test_cache(self):
+        cache = FlowFieldCache(self.cost, max_fields = 2)
+        field = cache.field((0, 0))
+        self.assertIs(field, cache.field((0, 0)))
+        cache.field((4, -4))
+        cache.field((0, 0))
+        cache.field((1, 0))
+        self.assertEqual(2, len(cache))
+        self.assertIs(field, cache.field((0, 0)))
+
+        step = cache.next_step((2, 0), (0, 0))
+        self.assertEqual(1, axial_distance(*step, 2, 0))
+        self.grid[step] = 0
+        cache.tiles_changed([step])
+        self.assertNotIn(step, cache.path((2, 0), (0, 0)) or [])
@@ -0,0 +1,13 @@
+from unittest                   import TestCase
+
+from benchmarks.io_loopback     import run
+
+
+class TestIOLoopbackBenchmark(TestCase):
+
+    def test_quick_run(self):
+        results = run(["thread", "async"], [64, 4096], 65536, 100, 10, 2)
+        for result in results["connections"].values():
+            self.assertEqual(2, len(result["throughput"]))
+            self.assertEqual(10, result["latency"]["round_trips"])
+            self.assertEqual(2, result["connect"]["connections"])